@@ -1,3 +1,58 @@
+from django.conf import settings
 from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.urls import path
 
-# Register your models here.
+from .profiling import list_profiles, load_profile, profile_dir
+
+LIST_LIMIT = 100
+LIST_TOP = 3
+DETAIL_QUERIES = 50
+
+
+def _slowest(queries, limit):
+    return sorted(queries, key=lambda query: query['ms'], reverse=True)[:limit]
+
+
+def profile_list_view(request):
+    profiles = list_profiles(limit=LIST_LIMIT)
+    project = str(settings.BASE_DIR)
+    for profile in profiles:
+        # The framework frames every request shares would crowd out our own code.
+        profile['top_functions'] = [
+            row for row in profile['top_functions'] if project in row['function']
+        ][:LIST_TOP]
+        profile['slowest_queries'] = _slowest(profile.pop('queries'), LIST_TOP)
+    context = {**admin.site.each_context(request), 'title': 'Request profiles', 'profiles': profiles}
+    return TemplateResponse(request, 'admin/booking_api/profile_list.html', context)
+
+
+def profile_detail_view(request, profile_id):
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise Http404('No such profile')
+    context = {
+        **admin.site.each_context(request),
+        'title': f'{profile["method"]} {profile["path"]}',
+        'profile': profile,
+        'slowest_queries': _slowest(profile['queries'], DETAIL_QUERIES),
+    }
+    return TemplateResponse(request, 'admin/booking_api/profile_detail.html', context)
+
+
+def profile_download_view(request, profile_id):
+    if load_profile(profile_id) is None:
+        raise Http404('No such profile')
+    path = profile_dir() / f'{profile_id}.prof'
+    if not path.exists():
+        raise Http404('No such profile')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
+
+
+# Mounted before admin.site.urls; admin_view limits them to staff.
+profile_urls = [
+    path('', admin.site.admin_view(profile_list_view), name='profile-list'),
+    path('<str:profile_id>/', admin.site.admin_view(profile_detail_view), name='profile-detail'),
+    path('<str:profile_id>/download/', admin.site.admin_view(profile_download_view), name='profile-download'),
+]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BookingApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "booking_api"
+
+    def ready(self):
+        from . import signals  # noqa: F401
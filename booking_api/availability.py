@@ -0,0 +1,96 @@
+"""
+Multi-day availability matrix for an area, encoded as bitsets.
+
+The matrix has one row per day and one column per desk (in the order of
+the returned `desks` list). Each state gets its own bitset, flattened
+day-major (bit index = day * len(desks) + desk) with the most significant
+bit first, then base64 encoded. An area with 500 desks over 21 days needs
+about 1.8 KB per state.
+"""
+import base64
+from datetime import timedelta
+
+from core.booking_rules import ACTIVE_STATUSES
+from core.models import Desk, Reservation
+from core.series import pending_claims
+from core.sharding import shard_for_area
+
+MAX_MATRIX_DAYS = 62
+
+# free:        bookable (desk available, no reservation row that day)
+# reserved:    confirmed, pending approval or checked in
+# released:    cancelled or no-show booking still holding the desk/date row
+# unavailable: permanently assigned or disabled desk
+MATRIX_STATES = ('free', 'reserved', 'released', 'unavailable')
+
+
+class BitMatrix:
+    """Fixed-size bitset addressed by (row, column)."""
+
+    def __init__(self, rows, columns):
+        self.columns = columns
+        self.bits = bytearray((rows * columns + 7) // 8)
+
+    def set(self, row, column):
+        index = row * self.columns + column
+        self.bits[index >> 3] |= 0x80 >> (index & 7)
+
+    def clear(self, row, column):
+        index = row * self.columns + column
+        self.bits[index >> 3] &= ~(0x80 >> (index & 7))
+
+    def get(self, row, column):
+        index = row * self.columns + column
+        return bool(self.bits[index >> 3] & (0x80 >> (index & 7)))
+
+    def encode(self):
+        return base64.b64encode(bytes(self.bits)).decode('ascii')
+
+
+def build_availability_matrix(area, start, days):
+    desks = list(
+        Desk.objects.filter(room__area=area).order_by('id').values_list('id', 'status')
+    )
+    column_of = {desk_id: column for column, (desk_id, _) in enumerate(desks)}
+    matrices = {state: BitMatrix(days, len(desks)) for state in MATRIX_STATES}
+
+    # Every desk/day starts as free or unavailable; reservations then move
+    # free cells to reserved/released. Unavailable desks stay unavailable.
+    for column, (_, desk_status) in enumerate(desks):
+        state = 'free' if desk_status == 'available' else 'unavailable'
+        for row in range(days):
+            matrices[state].set(row, column)
+
+    db = shard_for_area(area.id)
+    last = start + timedelta(days=days - 1)
+    booked = list(Reservation.objects.using(db).filter(
+        desk__room__area=area, date__gte=start, date__lte=last
+    ).values_list('desk_id', 'date', 'status'))
+    # Recurring bookings not yet materialized reserve their dates too.
+    booked += [
+        (desk_id, day, 'confirmed')
+        for desk_id, day in pending_claims(start, last, using=db, desk__room__area=area)
+    ]
+    # Released bookings stay on record next to the desk's active one, which wins.
+    booked.sort(key=lambda row: row[2] not in ACTIVE_STATUSES)
+    free = matrices['free']
+    bookable = sum(1 for _, desk_status in desks if desk_status == 'available')
+    free_counts = [bookable] * days
+    for desk_id, day, reservation_status in booked:
+        row, column = (day - start).days, column_of[desk_id]
+        if not free.get(row, column):
+            continue
+        free.clear(row, column)
+        free_counts[row] -= 1
+        state = 'reserved' if reservation_status in ACTIVE_STATUSES else 'released'
+        matrices[state].set(row, column)
+
+    return {
+        'area': area.id,
+        'from': start.isoformat(),
+        'days': days,
+        'desks': [desk_id for desk_id, _ in desks],
+        'encoding': 'base64, day-major, MSB first: bit = day * len(desks) + desk',
+        'states': {state: matrix.encode() for state, matrix in matrices.items()},
+        'free_counts': free_counts,
+    }
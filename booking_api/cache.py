@@ -0,0 +1,288 @@
+"""
+Versioned response cache for the read-only API endpoints.
+
+Every cache entry is keyed by a version token. Area-scoped endpoints
+(e.g. /api/areas/{id}/desks/) use that area's version, everything else
+uses the global version; reports over bookings add the bookings version.
+Writes bump the affected area's version and, depending on what they
+change, the global version (areas, rooms, desks, permissions, users) or
+the bookings version (reservations, see signals.py), so stale entries are
+never read again and simply expire. Bodies are stored pre-rendered as bytes, so a hit skips both
+the ORM and the renderer.
+
+Identical misses are coalesced (single flight): while one request computes
+a body, others for the same key wait for it instead of running the same
+queries. Within a process they wait on the computation itself; across
+processes the computing request holds a short-lived lock entry in the
+cache and the others poll for the body it stores. A waiter that isn't
+served within BOOKING_COALESCE_WAIT seconds, or whose leader's response
+isn't cacheable, computes the response itself.
+"""
+import functools
+import hashlib
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+KEY_PREFIX = 'booking_api'
+GLOBAL_VERSION_KEY = f'{KEY_PREFIX}:ver:global'
+BOOKINGS_VERSION_KEY = f'{KEY_PREFIX}:ver:bookings'
+HITS_KEY = f'{KEY_PREFIX}:stats:hits'
+MISSES_KEY = f'{KEY_PREFIX}:stats:misses'
+COALESCED_KEY = f'{KEY_PREFIX}:stats:coalesced'
+LOCK_TIMEOUT = 10  # longest a computation holds off other processes
+POLL_INTERVAL = 0.02
+
+
+def _area_version_key(area_id):
+    return f'{KEY_PREFIX}:ver:area:{area_id}'
+
+
+def _fresh_version(key):
+    """
+    A starting version for key that no earlier value of it can equal, in
+    case it was evicted: versions start from the clock in microseconds, and
+    no key is bumped a million times a second.
+    """
+    return time.time_ns() // 1000
+
+
+def _get_version(key):
+    """Return the current version for key, initialising it on first use."""
+    version = cache.get(key)
+    if version is None:
+        fresh = _fresh_version(key)
+        cache.add(key, fresh, timeout=None)
+        version = cache.get(key, fresh)
+    return version
+
+
+def _bump(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key evicted or never set.
+        cache.set(key, _fresh_version(key), timeout=None)
+        return cache.get(key)
+
+
+def get_global_version():
+    return _get_version(GLOBAL_VERSION_KEY)
+
+
+def get_area_version(area_id):
+    return _get_version(_area_version_key(area_id))
+
+
+def get_bookings_version():
+    return _get_version(BOOKINGS_VERSION_KEY)
+
+
+def bump_global_version():
+    """Invalidate every non area-scoped cached response."""
+    return _bump(GLOBAL_VERSION_KEY)
+
+
+def bump_bookings_version():
+    """Invalidate the cached responses that report over bookings."""
+    return _bump(BOOKINGS_VERSION_KEY)
+
+
+def bump_area_version(area_id):
+    """Invalidate responses for one area."""
+    if area_id is not None:
+        return _bump(_area_version_key(area_id))
+
+
+def _incr_stat(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def cache_stats():
+    """
+    Counters and ratios of the response cache. Misses are the bodies
+    computed; coalesced requests shared another request's computation, and
+    coalescing_ratio is their share of the requests that found no body.
+    ratio is the hit ratio over all requests.
+    """
+    stats = cache.get_many([HITS_KEY, MISSES_KEY, COALESCED_KEY])
+    hits = stats.get(HITS_KEY, 0)
+    misses = stats.get(MISSES_KEY, 0)
+    coalesced = stats.get(COALESCED_KEY, 0)
+    total = hits + misses + coalesced
+    return {
+        'hits': hits,
+        'misses': misses,
+        'coalesced': coalesced,
+        'ratio': hits / total if total else 0.0,
+        'coalescing_ratio': coalesced / (misses + coalesced) if misses + coalesced else 0.0,
+    }
+
+
+def reset_cache_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY, COALESCED_KEY])
+
+
+def build_cache_key(request, version_token):
+    """
+    Key on version, negotiated media type, the full request path and today's
+    date, which dated endpoints default to when the path has none.
+    """
+    raw = f'{request.accepted_media_type}|{request.get_full_path()}|{date.today().isoformat()}'
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:resp:{version_token}:{digest}'
+
+
+class _Flight:
+    """A body being computed in this process, for identical requests to wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.body = None
+        self.locked = False  # holds the cross-process lock
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _join_flight(key):
+    """Return (flight, True) if the caller computes key, or another request's (flight, False)."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = _flights[key] = _Flight()
+        return flight, True
+
+
+def _land(key, body):
+    """End the flight for key, handing body (None: not cacheable) to its waiters."""
+    with _flights_lock:
+        flight = _flights.pop(key, None)
+    if flight is not None:
+        if flight.locked:
+            cache.delete(_lock_key(key))
+        flight.body = body
+        flight.done.set()
+
+
+def _await_other_process(key, flight, deadline):
+    """
+    Take the cross-process lock for key, or return the body the process
+    holding it stored meanwhile. Past the deadline, go ahead without it.
+    """
+    while not cache.add(_lock_key(key), 1, LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(POLL_INTERVAL)
+        body = cache.get(key)
+        if body is not None:
+            return body
+    flight.locked = True
+    return None
+
+
+def _coalesced(request, body):
+    _incr_stat(COALESCED_KEY)
+    response = HttpResponse(body, content_type=request.accepted_media_type)
+    response['X-Cache'] = 'COALESCED'
+    return response
+
+
+def cache_response(area_scoped=False, bookings=False):
+    """
+    Decorator for viewset handlers returning cacheable GET responses.
+
+    With area_scoped=True the view's `pk` kwarg is treated as an area id and
+    its version is used instead of the global one. With bookings=True the
+    bookings version is added, for responses built from reservations. Only JSON responses are
+    cached; the browsable API always renders fresh. Concurrent misses for
+    the same key are coalesced (see the module docstring).
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            if (not getattr(settings, 'BOOKING_RESPONSE_CACHE_ENABLED', True)
+                    or request.method != 'GET'
+                    or request.accepted_renderer.format != 'json'):
+                return handler(self, request, *args, **kwargs)
+
+            if area_scoped:
+                token = f"a{kwargs.get('pk')}-{get_area_version(kwargs.get('pk'))}"
+            else:
+                token = f'g{get_global_version()}'
+            if bookings:
+                token = f'{token}-b{get_bookings_version()}'
+            key = build_cache_key(request, token)
+
+            body = cache.get(key)
+            if body is not None:
+                _incr_stat(HITS_KEY)
+                response = HttpResponse(body, content_type=request.accepted_media_type)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            deadline = time.monotonic() + getattr(settings, 'BOOKING_COALESCE_WAIT', 5)
+            flight, leader = _join_flight(key)
+            if not leader:
+                flight.done.wait(max(deadline - time.monotonic(), 0))
+                if flight.body is not None:
+                    return _coalesced(request, flight.body)
+                # The leader failed or is slow: compute alongside it.
+                _incr_stat(MISSES_KEY)
+                response = handler(self, request, *args, **kwargs)
+                response['X-Cache'] = 'MISS'
+                return response
+
+            body = _await_other_process(key, flight, deadline)
+            if body is not None:
+                _land(key, body)
+                return _coalesced(request, body)
+
+            _incr_stat(MISSES_KEY)
+            try:
+                response = handler(self, request, *args, **kwargs)
+            except BaseException:
+                _land(key, None)
+                raise
+            response['X-Cache'] = 'MISS'
+            if response.status_code == 200:
+                # Stored and handed to the waiters once rendered.
+                self._response_cache_key = key
+            else:
+                _land(key, None)
+            return response
+        return wrapper
+    return decorator
+
+
+class CachedResponseMixin:
+    """Stores rendered bodies of responses marked by @cache_response."""
+    _response_cache_key = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = self._response_cache_key
+        if key is not None:
+            self._response_cache_key = None
+            body = None
+            try:
+                response.render()
+                body = response.content
+                cache.set(key, body, timeout=getattr(settings, 'BOOKING_RESPONSE_CACHE_TIMEOUT', 300))
+            finally:
+                _land(key, body)
+        return response
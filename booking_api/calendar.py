@@ -0,0 +1,139 @@
+"""
+iCalendar (RFC 5545) feeds of a user's desk bookings.
+
+Feeds are addressed by a signed token, so checking one needs no database
+access. Each user has a feed version in the cache, set to the time of
+their last reservation change and dropped by signals.py whenever one of
+their reservations changes. The version is the feed's ETag and
+Last-Modified, so a conditional poll is answered from the cache alone.
+
+A missed feed is streamed from the user's reservations via the
+(user, date) index and saved under its version once fully sent. Polls
+before the next change are then served from that copy.
+"""
+import time
+from datetime import date, timedelta
+
+from django.core import signing
+from django.core.cache import cache
+
+from core.models import Reservation
+from core.sharding import merge_across_shards
+from .cache import KEY_PREFIX
+
+TOKEN_SALT = 'booking_api.calendar'
+PAST_DAYS = 30
+FEED_TIMEOUT = 24 * 60 * 60
+PRODID = '-//corp-booking//Desk bookings//EN'
+
+EVENT_STATUS = {
+    'confirmed': 'CONFIRMED',
+    'checked_in': 'CONFIRMED',
+    'pending_approval': 'TENTATIVE',
+    'cancelled': 'CANCELLED',
+    'no_show': 'CANCELLED',
+}
+
+
+def make_token(user_id):
+    return signing.Signer(salt=TOKEN_SALT).sign(str(user_id))
+
+
+def read_token(token):
+    """The user id a token was issued for, or None if it is not valid."""
+    try:
+        return int(signing.Signer(salt=TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def _version_key(user_id):
+    return f'{KEY_PREFIX}:ics:ver:{user_id}'
+
+
+def _feed_key(user_id, version):
+    return f'{KEY_PREFIX}:ics:feed:{user_id}:{version}'
+
+
+def get_feed_version(user_id):
+    """Millisecond timestamp of the user's last change (or first feed request)."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_feed(user_id):
+    cache.delete(_version_key(user_id))
+
+
+def get_cached_feed(user_id, version):
+    return cache.get(_feed_key(user_id, version))
+
+
+def _escape(text):
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces (RFC 5545 3.1)."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    pieces, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Don't split a multi-byte character.
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        pieces.append(encoded[start:end].decode('utf-8'))
+        start, limit = end, 74  # continuation lines start with a space
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def _event(row):
+    day = row['date']
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:reservation-{row['id']}@corp-booking",
+        f"DTSTAMP:{row['created_at']:%Y%m%dT%H%M%SZ}",
+        f'DTSTART;VALUE=DATE:{day:%Y%m%d}',
+        f'DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}',
+        f"SUMMARY:{_escape('Desk ' + row['desk__identifier'])}",
+        f"LOCATION:{_escape(row['desk__room__area__name'] + ' - ' + row['desk__room__name'])}",
+        f"STATUS:{EVENT_STATUS.get(row['status'], 'CONFIRMED')}",
+        'TRANSP:TRANSPARENT',
+    ]
+    if row['notes']:
+        lines.append(f"DESCRIPTION:{_escape(row['notes'])}")
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def stream_feed(user_id, version, today=None):
+    """Yield the feed in chunks; the complete feed is cached under version."""
+    since = (today or date.today()) - timedelta(days=PAST_DAYS)
+    rows = merge_across_shards(
+        lambda db: Reservation.objects.using(db).filter(user_id=user_id, date__gte=since)
+        .order_by('date')
+        .values(
+            'id', 'date', 'status', 'notes', 'created_at',
+            'desk__identifier', 'desk__room__name', 'desk__room__area__name',
+        )
+        .iterator(chunk_size=500),
+        key=lambda row: row['date'],
+    )
+    chunks = ['BEGIN:VCALENDAR\r\nVERSION:2.0\r\n' + _fold(f'PRODID:{PRODID}')
+              + 'CALSCALE:GREGORIAN\r\nX-WR-CALNAME:Desk bookings\r\n']
+    yield chunks[0]
+    for row in rows:
+        chunk = _event(row)
+        chunks.append(chunk)
+        yield chunk
+    chunks.append('END:VCALENDAR\r\n')
+    yield chunks[-1]
+    cache.set(_feed_key(user_id, version), ''.join(chunks).encode('utf-8'), FEED_TIMEOUT)
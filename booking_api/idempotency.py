@@ -0,0 +1,126 @@
+"""
+Idempotency-Key support for booking writes.
+
+A client may send `Idempotency-Key: <unique string>` with any write. The
+first request with a key runs normally and its rendered response is stored
+in the cache for BOOKING_IDEMPOTENCY_TTL seconds; replays get the stored
+response back without touching the booking path. A duplicate that arrives
+while the first is still running waits for it and replays its response.
+Keys are scoped per user and endpoint, and reusing a key with a different
+payload is rejected.
+"""
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from .cache import KEY_PREFIX
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+LOCK_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+
+def _store():
+    return caches[getattr(settings, 'BOOKING_IDEMPOTENCY_CACHE', 'default')]
+
+
+def _fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    raw = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _storage_key(request, key):
+    user = request.user.pk if request.user.is_authenticated else 'anon'
+    scope = f'{user}:{request.method}:{request.path}:{key}'
+    return f'{KEY_PREFIX}:idem:{hashlib.sha256(scope.encode("utf-8")).hexdigest()}'
+
+
+def _replay(record):
+    response = HttpResponse(record['content'], status=record['status'], content_type=record['content_type'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _error(message, status_code):
+    return Response({'error': message}, status=status_code)
+
+
+def idempotent(handler):
+    """Decorator for viewset write handlers honouring the Idempotency-Key header."""
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or request.method in SAFE_METHODS:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(f'{HEADER} must be at most {MAX_KEY_LENGTH} characters',
+                          status.HTTP_400_BAD_REQUEST)
+
+        store = _store()
+        storage_key = _storage_key(request, key)
+        lock_key = f'{storage_key}:lock'
+        fingerprint = _fingerprint(request)
+        wait_timeout = getattr(settings, 'BOOKING_IDEMPOTENCY_WAIT', 5)
+
+        deadline = time.monotonic() + wait_timeout
+        while True:
+            record = store.get(storage_key)
+            if record is not None:
+                if record['fingerprint'] != fingerprint:
+                    return _error(f'{HEADER} was already used with a different request',
+                                  status.HTTP_422_UNPROCESSABLE_ENTITY)
+                return _replay(record)
+            if store.add(lock_key, fingerprint, LOCK_TIMEOUT):
+                break
+            # Another request with this key is in flight: wait for its result.
+            if time.monotonic() >= deadline:
+                return _error(f'A request with this {HEADER} is still in progress',
+                              status.HTTP_409_CONFLICT)
+            time.sleep(POLL_INTERVAL)
+
+        self._idempotency = (storage_key, lock_key, fingerprint)
+        try:
+            return handler(self, request, *args, **kwargs)
+        except BaseException:
+            # Unhandled errors skip finalize_response: free the key for a retry
+            # now rather than after LOCK_TIMEOUT. Responses, error ones too,
+            # keep it until they are recorded.
+            self._idempotency = None
+            store.delete(lock_key)
+            raise
+    return wrapper
+
+
+class IdempotencyMixin:
+    """Stores responses of @idempotent handlers once they are rendered."""
+    _idempotency = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self._idempotency is not None:
+            storage_key, lock_key, fingerprint = self._idempotency
+            self._idempotency = None
+            store = _store()
+            # Server errors aren't recorded so that the client can retry.
+            if response.status_code < 500:
+                response.render()
+                store.set(storage_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'content': response.content,
+                    'content_type': response.get('Content-Type'),
+                }, getattr(settings, 'BOOKING_IDEMPOTENCY_TTL', 24 * 60 * 60))
+            store.delete(lock_key)
+        return response
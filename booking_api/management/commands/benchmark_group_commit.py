@@ -0,0 +1,101 @@
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from booking_api.views import ReservationViewSet
+from core.models import Area, Room, Desk, ReservationEvent
+
+User = get_user_model()
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark concurrent quick_book requests with one transaction per '
+        'booking vs group commit (BOOKING_GROUP_COMMIT): bookings/s and latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--bookings', type=int, default=100, help='Bookings per client')
+        parser.add_argument('--window-ms', type=float, default=2, help='Group commit window')
+
+    def handle(self, *args, **options):
+        threads, bookings = options['threads'], options['bookings']
+        # Benchmark rows live in the real database (clients need their own
+        # connections), so they are deleted again at the end.
+        users, desks = self.create_data(threads)
+        try:
+            self.stdout.write(f'{threads} clients x {bookings} bookings on {settings.DATABASES["default"]["NAME"]}')
+            modes = [('per request', False), ('group commit', True)]
+            for offset, (label, enabled) in enumerate(modes):
+                start = date.today() + timedelta(days=1 + offset * bookings)
+                with override_settings(
+                    BOOKING_GROUP_COMMIT=enabled,
+                    BOOKING_GROUP_COMMIT_WINDOW_MS=options['window_ms'],
+                    BOOKING_THROTTLE_RATES={**settings.BOOKING_THROTTLE_RATES, 'booking': '1000000/s'},
+                ):
+                    elapsed, latencies, failed = self.run(users, desks, start, bookings)
+                done = len(latencies)
+                if not done:
+                    self.stdout.write(f'{label:12} every booking failed')
+                    continue
+                self.stdout.write(
+                    f'{label:12} {done / elapsed:8.1f} bookings/s   '
+                    f'p50 {_percentile(latencies, 0.5) * 1000:6.1f} ms   '
+                    f'p95 {_percentile(latencies, 0.95) * 1000:6.1f} ms'
+                    + (f'   {failed} failed' if failed else '')
+                )
+        finally:
+            desk_ids = [desk.id for desk in desks]
+            Area.objects.filter(name__startswith='__benchmark_group_commit_').delete()
+            User.objects.filter(username__startswith='__benchmark_group_commit_').delete()
+            ReservationEvent.objects.filter(desk_id__in=desk_ids).delete()
+
+    def run(self, users, desks, start, bookings):
+        latencies = []
+        failed = []
+        factory = APIRequestFactory()
+        view = ReservationViewSet.as_view({'post': 'quick_book'})
+
+        def book(user, desk):
+            try:
+                for n in range(bookings):
+                    payload = {'desk_id': desk.id, 'date': (start + timedelta(days=n)).isoformat()}
+                    started = time.perf_counter()
+                    request = factory.post('/api/reservations/quick_book/', payload, format='json')
+                    force_authenticate(request, user)
+                    response = view(request)
+                    if response.status_code == 201:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        failed.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=book, args=pair) for pair in zip(users, desks)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return time.perf_counter() - started, latencies, len(failed)
+
+    def create_data(self, threads):
+        """One user and one desk per client, so bookings never conflict."""
+        area = Area.objects.create(name='__benchmark_group_commit_0__')
+        room = Room.objects.create(area=area, name='Benchmark Room')
+        desks = [Desk.objects.create(room=room, identifier=f'BG.{n}') for n in range(threads)]
+        users = [User.objects.create(username=f'__benchmark_group_commit_{n}__') for n in range(threads)]
+        return users, desks
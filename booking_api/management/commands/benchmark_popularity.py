@@ -0,0 +1,90 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.contrib.auth import get_user_model
+
+from core.models import Area, Room, Desk, Reservation
+from core.popularity import rebuild_usage, top_areas, top_desks
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark top-K desks/areas: monthly counters vs GROUP BY over reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desks', type=int, default=500, help='Desks to create')
+        parser.add_argument('--days', type=int, default=730, help='Days of booking history')
+        parser.add_argument('--occupancy', type=float, default=0.6, help='Share of desks booked per day')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (best is reported)')
+
+    def handle(self, *args, **options):
+        # Benchmark data is created in a transaction that is always rolled back.
+        with transaction.atomic():
+            end = date.today()
+            start = end - timedelta(days=options['days'] - 1)
+            rows = self.create_data(options['desks'], start, options['days'], options['occupancy'])
+            rebuild_usage()
+
+            self.stdout.write(f'{rows} reservations, {options["desks"]} desks, best of {options["repeat"]}')
+            ranges = [('last 30 days', end - timedelta(days=29)), ('last year', end - timedelta(days=364)),
+                      ('full history', start)]
+            for label, range_start in ranges:
+                naive = self.best(options['repeat'], lambda: self.naive(range_start, end))
+                counters = self.best(options['repeat'], lambda: (
+                    top_desks(range_start, end, 10), top_areas(range_start, end, 10)
+                ))
+                self.stdout.write(
+                    f'{label:14} GROUP BY: {naive * 1000:8.1f} ms   counters: {counters * 1000:8.1f} ms'
+                )
+
+            transaction.set_rollback(True)
+
+    def naive(self, start, end):
+        booked = Reservation.objects.filter(date__range=(start, end)).exclude(status='cancelled')
+        desks = list(booked.values('desk_id').annotate(bookings=Count('id')).order_by('-bookings', 'desk_id')[:10])
+        areas = list(
+            booked.values('desk__room__area_id').annotate(bookings=Count('id'))
+            .order_by('-bookings', 'desk__room__area_id')[:10]
+        )
+        return desks, areas
+
+    def best(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def create_data(self, desk_count, start, days, occupancy):
+        users = User.objects.bulk_create(
+            [User(username=f'__benchmark_{n}__') for n in range(50)]
+        )
+        desks = []
+        for n in range(10):
+            area = Area.objects.create(name=f'__benchmark_{n}__')
+            room = Room.objects.create(area=area, name='Benchmark Room')
+            desks += Desk.objects.bulk_create(
+                [Desk(room=room, identifier=f'B{n}.{i}') for i in range(desk_count // 10)]
+            )
+
+        rng = random.Random(0)
+        weights = [rng.paretovariate(1.5) for _ in desks]
+        per_day = int(len(desks) * occupancy)
+        total = 0
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            booked = set()
+            while len(booked) < per_day:
+                booked.update(rng.choices(range(len(desks)), weights=weights, k=per_day - len(booked)))
+            Reservation.objects.bulk_create(
+                [Reservation(user=rng.choice(users), desk=desks[i], date=day) for i in booked],
+                batch_size=1000,
+            )
+            total += len(booked)
+        return total
@@ -0,0 +1,77 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.contrib.auth import get_user_model
+
+from core.models import Area, Room, Desk, UserPermission
+from core.search import SearchIndex, _rebuild
+
+User = get_user_model()
+
+FIRST_NAMES = ['Anna', 'Ben', 'Clara', 'David', 'Emma', 'Felix', 'Greta', 'Hannah', 'Jonas', 'Lena',
+               'Lukas', 'Marie', 'Noah', 'Paul', 'Sophie', 'Tim']
+LAST_NAMES = ['Bauer', 'Becker', 'Fischer', 'Hoffmann', 'Koch', 'Meyer', 'Müller', 'Richter',
+              'Schäfer', 'Schmidt', 'Schneider', 'Schulz', 'Wagner', 'Weber', 'Wolf', 'Zimmermann']
+QUERIES = ['schmidt', 'anna mü', 'EMP04711', '1.L.1', 'open office', 'level 2', 'zimmerman', 'we']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the search index: build time and per-query latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000, help='Users to create')
+        parser.add_argument('--desks', type=int, default=2000, help='Desks to create')
+        parser.add_argument('--repeat', type=int, default=50, help='Runs per query (median and max reported)')
+
+    def handle(self, *args, **options):
+        # Benchmark data is created in a transaction that is always rolled back.
+        with transaction.atomic():
+            self.create_data(options['users'], options['desks'])
+            index = SearchIndex()
+            started = time.perf_counter()
+            _rebuild(index)
+            self.stdout.write(
+                f'Indexed {len(index.documents)} documents in {time.perf_counter() - started:.2f} s'
+            )
+            areas = set(Area.objects.values_list('id', flat=True)[:2])
+            for query in QUERIES:
+                for label, scope in (('all', None), ('2 areas', areas)):
+                    timings = []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        found = index.search(query, areas=scope)
+                        timings.append(time.perf_counter() - started)
+                    timings.sort()
+                    self.stdout.write(
+                        f'{query!r:14} {label:8} {len(found):3} results   '
+                        f'median {timings[len(timings) // 2] * 1000:6.2f} ms   max {timings[-1] * 1000:6.2f} ms'
+                    )
+            transaction.set_rollback(True)
+
+    def create_data(self, user_count, desk_count):
+        rng = random.Random(0)
+        areas = [Area.objects.create(name=f'__benchmark__ Level {n}') for n in range(1, 9)]
+        rooms = [Room.objects.create(area=area, name=f'Open Office {chr(65 + n)}')
+                 for area in areas for n in range(5)]
+        Desk.objects.bulk_create(
+            [Desk(room=rooms[n % len(rooms)], identifier=f'B{n % 8 + 1}.L.{n}') for n in range(desk_count)],
+            batch_size=1000,
+        )
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=f'__benchmark_{n}__' + ''.join(rng.choices(string.ascii_lowercase, k=4)),
+                    first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                    employee_id=f'EMP{n:05d}',
+                )
+                for n in range(user_count)
+            ],
+            batch_size=1000,
+        )
+        UserPermission.objects.bulk_create(
+            [UserPermission(user=user, area=rng.choice(areas)) for user in users],
+            batch_size=1000,
+        )
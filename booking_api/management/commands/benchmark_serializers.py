@@ -0,0 +1,67 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.contrib.auth import get_user_model
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Area, Room, Desk, Reservation
+from booking_api.serializers import DeskSerializer, ReservationSerializer
+from booking_api.fast_serializers import desk_values_serializer, reservation_values_serializer
+from booking_api.renderers import FastJSONRenderer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ModelSerializer vs values() fast path for list payloads (rows/sec)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Rows per payload')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        # Benchmark data is created in a transaction that is always rolled back.
+        with transaction.atomic():
+            self.create_data(rows)
+            desks = Desk.objects.filter(room__area__name='__benchmark__')
+            reservations = Reservation.objects.filter(desk__room__area__name='__benchmark__')
+
+            self.stdout.write(f'{rows} rows, best of {repeat}')
+            self.report('Desk / ModelSerializer + JSONRenderer', repeat, rows,
+                        lambda: JSONRenderer().render(DeskSerializer(desks, many=True).data))
+            self.report('Desk / fast path + FastJSONRenderer', repeat, rows,
+                        lambda: FastJSONRenderer().render(desk_values_serializer.serialize(desks)))
+            self.report('Reservation / ModelSerializer + JSONRenderer', repeat, rows,
+                        lambda: JSONRenderer().render(ReservationSerializer(reservations, many=True).data))
+            self.report('Reservation / fast path + FastJSONRenderer', repeat, rows,
+                        lambda: FastJSONRenderer().render(reservation_values_serializer.serialize(reservations)))
+
+            transaction.set_rollback(True)
+
+    def create_data(self, rows):
+        area = Area.objects.create(name='__benchmark__')
+        room = Room.objects.create(area=area, name='Benchmark Room')
+        user = User.objects.create(username='__benchmark__', first_name='Bench', last_name='Mark')
+        desks = Desk.objects.bulk_create(
+            Desk(room=room, identifier=f'BENCH.{i:06d}', pos_x=i % 500, pos_y=i // 500)
+            for i in range(rows)
+        )
+        start = date.today()
+        Reservation.objects.bulk_create(
+            Reservation(user=user, desk=desk, date=start + timedelta(days=i % 21))
+            for i, desk in enumerate(desks)
+        )
+
+    def report(self, label, repeat, rows, func):
+        best = min(self.time(func) for _ in range(repeat))
+        self.stdout.write(f'{label:<48} {best * 1000:8.1f} ms  {rows / best:12,.0f} rows/sec')
+
+    def time(self, func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
@@ -0,0 +1,91 @@
+import threading
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.contrib.auth import get_user_model
+
+from core.models import Area, Room, Desk, Reservation, ReservationEvent
+from core.sharding import shard_aliases, shard_for_area
+
+User = get_user_model()
+
+DESKS_PER_AREA = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark concurrent booking writes with every writer in one shard '
+        'vs writers spread over all shards (run with BOOKING_SHARD_COUNT > 1 '
+        'after migrate_shards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writers')
+        parser.add_argument('--writes', type=int, default=200, help='Reservations created per writer')
+
+    def handle(self, *args, **options):
+        shards = shard_aliases()
+        if len(shards) < 2:
+            self.stdout.write('Sharding needs at least two shards here; set BOOKING_SHARD_COUNT and rerun.')
+            return
+
+        threads, writes = options['threads'], options['writes']
+        # Benchmark rows live in real databases (writers need their own
+        # connections), so they are deleted again at the end.
+        users, areas = self.create_data(threads)
+        try:
+            same = [areas[shards[0]][n] for n in range(threads)]
+            spread = [areas[shards[n % len(shards)]][n // len(shards)] for n in range(threads)]
+            self.stdout.write(f'{threads} writers x {writes} reservations, {len(shards)} shards')
+            for offset, (label, targets) in enumerate([('one shard', same), ('all shards', spread)]):
+                start = date.today() + timedelta(days=1 + offset * (writes // DESKS_PER_AREA + 1))
+                elapsed = self.run(users, targets, start, writes)
+                self.stdout.write(
+                    f'{label:11} {elapsed:7.2f} s   {threads * writes / elapsed:9.1f} writes/s'
+                )
+        finally:
+            Area.objects.filter(name__startswith='__benchmark_shard_').delete()
+            User.objects.filter(username__startswith='__benchmark_shard_').delete()
+            desk_ids = [desk.id for shard_areas in areas.values() for desks in shard_areas for desk in desks]
+            for alias in shards:
+                ReservationEvent.objects.using(alias).filter(desk_id__in=desk_ids).delete()
+
+    def run(self, users, areas, start, writes):
+        def write(user, desks):
+            try:
+                for n in range(writes):
+                    Reservation.objects.create(
+                        user=user, desk=desks[n % len(desks)],
+                        date=start + timedelta(days=n // len(desks)),
+                    )
+            finally:
+                connections.close_all()
+
+        workers = [
+            threading.Thread(target=write, args=(user, desks))
+            for user, desks in zip(users, areas)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return time.perf_counter() - started
+
+    def create_data(self, threads):
+        """One user per writer and `threads` areas of desks in every shard."""
+        users = [User.objects.create(username=f'__benchmark_shard_{n}__') for n in range(threads)]
+        areas = {alias: [] for alias in shard_aliases()}
+        n = 0
+        while min(len(desks) for desks in areas.values()) < threads:
+            area = Area.objects.create(name=f'__benchmark_shard_{n}__')
+            room = Room.objects.create(area=area, name='Benchmark Room')
+            desks = [
+                Desk.objects.create(room=room, identifier=f'BS{n}.{i}')
+                for i in range(DESKS_PER_AREA)
+            ]
+            areas[shard_for_area(area.id)].append(desks)
+            n += 1
+        return users, areas
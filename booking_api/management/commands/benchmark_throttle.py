@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from booking_api.throttling import ReadRateThrottle
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of the token-bucket throttle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100000, help='Throttle checks to time')
+        parser.add_argument('--clients', type=int, default=100, help='Distinct client IPs')
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        clients = options['clients']
+        factory = APIRequestFactory()
+        requests = [
+            Request(factory.get('/api/desks/', REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}'))
+            for i in range(clients)
+        ]
+        throttle = ReadRateThrottle()
+
+        # Large enough that every check takes the "allowed" path.
+        with override_settings(BOOKING_THROTTLE_RATES={'read': f'{count * 10}/s'}):
+            start = time.perf_counter()
+            for i in range(count):
+                throttle.allow_request(requests[i % clients], None)
+            elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"Cache backend: {settings.CACHES['default']['BACKEND']}")
+        self.stdout.write(f'{count} checks over {clients} clients: {elapsed * 1000:.1f} ms')
+        self.stdout.write(f'{elapsed / count * 1e6:.1f} µs per request')
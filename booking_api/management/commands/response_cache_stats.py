@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from booking_api.cache import cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Report hit/miss and coalescing ratios of the API response cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after reporting',
+        )
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        self.stdout.write(f"Hits:   {stats['hits']}")
+        self.stdout.write(f"Misses: {stats['misses']}")
+        self.stdout.write(f"Ratio:  {stats['ratio']:.1%}")
+        self.stdout.write(f"Coalesced: {stats['coalesced']} ({stats['coalescing_ratio']:.1%} of misses shared)")
+
+        if options['reset']:
+            reset_cache_stats()
+            self.stdout.write('Counters reset.')
@@ -0,0 +1,179 @@
+"""
+On-demand profiling of single requests.
+
+A staff user adds `X-Profile: 1` (or `?_profile=1`) to a request and it runs
+under cProfile with every SQL statement timed. The result is written to
+BOOKING_PROFILE_DIR as two files sharing an id: `<id>.prof`, a pstats dump
+for snakeviz and friends, and `<id>.json` with the request, the queries and
+a summary of the slowest functions. Only the newest BOOKING_PROFILE_KEEP
+profiles are kept. The response carries `X-Profile-Id`; the profiles are
+listed under /admin/profiles/.
+
+Requests without the flag pay for a header and a query-string lookup and
+nothing else.
+"""
+import cProfile
+import json
+import pstats
+import secrets
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+HEADER = 'X-Profile'
+QUERY_FLAG = '_profile'
+RESPONSE_HEADER = 'X-Profile-Id'
+MAX_QUERIES = 1000
+TOP_FUNCTIONS = 100
+
+
+def profile_dir():
+    return Path(getattr(settings, 'BOOKING_PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def _requested(request):
+    return HEADER in request.headers or QUERY_FLAG in request.GET
+
+
+def _is_staff(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    # API clients authenticate inside the view; check their token up front.
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != b'token':
+        return False
+    try:
+        user, _ = TokenAuthentication().authenticate_credentials(auth[1].decode())
+    except (exceptions.AuthenticationFailed, UnicodeError):
+        return False
+    return user.is_staff
+
+
+class QueryRecorder:
+    """execute_wrapper recording each statement with its duration."""
+
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.total += duration
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({
+                    'sql': sql,
+                    'ms': round(duration * 1000, 3),
+                    'db': context['connection'].alias,
+                    'many': many,
+                })
+
+
+def _top_functions(stats, limit=TOP_FUNCTIONS):
+    rows = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f'{name} ({filename}:{line})' if line else name,
+            'calls': calls,
+            'own_ms': round(own * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3),
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:limit]
+
+
+def save_profile(request, response, profiler, recorder, duration):
+    """Write the profile files and drop the oldest beyond the limit; returns the id."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_id = f'{timezone.now():%Y%m%dT%H%M%S.%f}-{secrets.token_hex(4)}'
+    stats = pstats.Stats(profiler)
+    stats.dump_stats(directory / f'{profile_id}.prof')
+    record = {
+        'id': profile_id,
+        'created_at': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'user': request.user.get_username() if request.user.is_authenticated else None,
+        'duration_ms': round(duration * 1000, 3),
+        'query_count': recorder.count,
+        'query_ms': round(recorder.total * 1000, 3),
+        'queries': recorder.queries,
+        'top_functions': _top_functions(stats),
+    }
+    (directory / f'{profile_id}.json').write_text(json.dumps(record), encoding='utf-8')
+    _rotate(directory)
+    return profile_id
+
+
+def _rotate(directory):
+    keep = getattr(settings, 'BOOKING_PROFILE_KEEP', 100)
+    # Ids start with a timestamp, so name order is age order.
+    for path in sorted(directory.glob('*.json'), reverse=True)[keep:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def list_profiles(limit=None):
+    """Stored profile records, newest first."""
+    paths = sorted(profile_dir().glob('*.json'), reverse=True)[:limit]
+    records = []
+    for path in paths:
+        try:
+            records.append(json.loads(path.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            continue  # rotated away or half-written meanwhile
+    return records
+
+
+def load_profile(profile_id):
+    """The record for profile_id, or None."""
+    if not profile_id.replace('-', '').replace('.', '', 1).isalnum():
+        return None
+    try:
+        return json.loads((profile_dir() / f'{profile_id}.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+class ProfilingMiddleware:
+    """Profiles requests flagged with X-Profile / ?_profile by staff users."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'BOOKING_PROFILING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _requested(request) or not _is_staff(request):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - started
+
+        response[RESPONSE_HEADER] = save_profile(request, response, profiler, recorder, duration)
+        return response
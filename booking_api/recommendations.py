@@ -0,0 +1,243 @@
+"""
+Desk recommendations for a user and date.
+
+Candidates are the bookable desks in areas the user has permission for.
+Each is scored by:
+
+- history: the user's share of past bookings on that desk and in its room
+- colleagues: proximity to desks booked that day by the same department
+- popularity: how often the desk was booked recently by anyone
+
+Inputs that change slowly are kept precomputed: a spatial grid of desk
+positions per area (rebuilt when the area's cache version changes), each
+user's preference vector and each area's popularity (cached, dropped on
+the user's next booking or after a timeout). A request then only has to
+fetch candidates and the day's colleague bookings.
+"""
+import heapq
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from core.booking_rules import ACTIVE_STATUSES
+from core.models import Desk, Reservation
+from core.permissions import permitted_area_ids
+from core.series import pending_claims
+from core.sharding import across_shards, all_databases, shard_for_area
+from .cache import KEY_PREFIX, get_area_version
+
+GRID_CELL_SIZE = 100
+COLLEAGUE_RADIUS = 250
+HISTORY_DAYS = 90
+POPULARITY_DAYS = 30
+PRECOMPUTED_TIMEOUT = 60 * 60
+
+WEIGHTS = {
+    'history': 3.0,
+    'room': 1.0,
+    'colleagues': 2.0,
+    'popularity': 1.0,
+}
+
+
+class SpatialGrid:
+    """Uniform grid over desk positions answering radius queries."""
+
+    def __init__(self, points, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.positions = {}
+        for desk_id, x, y in points:
+            self.positions[desk_id] = (x, y)
+            self.cells[self._cell(x, y)].append((desk_id, x, y))
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def within(self, x, y, radius):
+        """Yield (desk_id, distance) for desks within radius of (x, y)."""
+        reach = int(math.ceil(radius / self.cell_size))
+        cx, cy = self._cell(x, y)
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                for desk_id, dx, dy in self.cells.get((gx, gy), ()):
+                    distance = math.hypot(dx - x, dy - y)
+                    if distance <= radius:
+                        yield desk_id, distance
+
+
+# area_id -> (cache version, SpatialGrid); per process, validated on use.
+_area_grids = {}
+
+
+def get_area_grid(area_id):
+    version = get_area_version(area_id)
+    cached = _area_grids.get(area_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    grid = SpatialGrid(
+        Desk.objects.filter(room__area_id=area_id, pos_x__isnull=False, pos_y__isnull=False)
+        .values_list('id', 'pos_x', 'pos_y')
+    )
+    _area_grids[area_id] = (version, grid)
+    return grid
+
+
+def _preferences_key(user_id):
+    return f'{KEY_PREFIX}:recommend:prefs:{user_id}'
+
+
+def invalidate_user_preferences(user_id):
+    cache.delete(_preferences_key(user_id))
+
+
+def get_user_preferences(user_id, today):
+    """Share of the user's recent bookings per desk and per room."""
+    key = _preferences_key(user_id)
+    preferences = cache.get(key)
+    if preferences is not None:
+        return preferences
+
+    rows = across_shards(
+        lambda db: Reservation.objects.using(db)
+        .filter(user_id=user_id, date__gte=today - timedelta(days=HISTORY_DAYS))
+        .exclude(status='cancelled')
+        .values('desk_id', 'desk__room_id')
+        .annotate(bookings=Count('id'))
+        .order_by()
+    )
+    desks, rooms = {}, defaultdict(float)
+    total = sum(row['bookings'] for row in rows)
+    for row in rows:
+        share = row['bookings'] / total
+        desks[row['desk_id']] = share
+        rooms[row['desk__room_id']] += share
+
+    preferences = {'desks': desks, 'rooms': dict(rooms)}
+    cache.set(key, preferences, PRECOMPUTED_TIMEOUT)
+    return preferences
+
+
+def get_area_popularity(area_id, today):
+    """Recent booking counts per desk, normalised to the busiest desk."""
+    key = f'{KEY_PREFIX}:recommend:popularity:{area_id}:{today.isoformat()}'
+    popularity = cache.get(key)
+    if popularity is not None:
+        return popularity
+
+    counts = dict(
+        Reservation.objects.using(shard_for_area(area_id))
+        .filter(desk__room__area_id=area_id, date__gte=today - timedelta(days=POPULARITY_DAYS), date__lt=today)
+        .exclude(status='cancelled')
+        .values_list('desk_id')
+        .annotate(bookings=Count('id'))
+        .order_by()
+    )
+    busiest = max(counts.values(), default=0)
+    popularity = {desk_id: count / busiest for desk_id, count in counts.items()}
+    cache.set(key, popularity, PRECOMPUTED_TIMEOUT)
+    return popularity
+
+
+def colleague_proximity(user, day, area_ids):
+    """Score desks by closeness to same-department colleagues booked on day."""
+    proximity = defaultdict(float)
+    if not user.department:
+        return proximity
+
+    colleague_desks = across_shards(
+        lambda db: Reservation.objects.using(db)
+        .filter(
+            date=day,
+            status__in=ACTIVE_STATUSES,
+            desk__room__area_id__in=area_ids,
+            user__department=user.department,
+        )
+        .exclude(user=user)
+        .values_list('desk_id', 'desk__room__area_id')
+    )
+    for desk_id, area_id in colleague_desks:
+        grid = get_area_grid(area_id)
+        position = grid.positions.get(desk_id)
+        if position is None:
+            continue
+        for neighbour_id, distance in grid.within(*position, COLLEAGUE_RADIUS):
+            proximity[neighbour_id] += 1 - distance / COLLEAGUE_RADIUS
+
+    closest = max(proximity.values(), default=0)
+    if closest:
+        for desk_id in proximity:
+            proximity[desk_id] /= closest
+    return proximity
+
+
+def recommend_desks(user, day, area_id=None, limit=5, today=None):
+    """
+    Return up to `limit` desks the user may book on `day`, best first.
+
+    Each item has the desk's id, identifier, room/area names, total score and
+    per-signal breakdown.
+    """
+    today = today or day
+    area_ids = set(permitted_area_ids(user.id))
+    if area_id is not None:
+        area_ids &= {area_id}
+    if not area_ids:
+        return []
+
+    # Each shard excludes its own active bookings against its replica of the desks.
+    candidates = across_shards(
+        lambda db: Desk.objects.using(db)
+        .filter(
+            room__area_id__in=[area for area in area_ids if shard_for_area(area) == db],
+            room__is_bookable=True,
+            status='available',
+        )
+        .exclude(id__in=Reservation.objects.using(db).filter(
+            date=day, status__in=ACTIVE_STATUSES
+        ).values('desk_id'))
+        .values('id', 'identifier', 'room_id', 'room__name', 'room__area_id', 'room__area__name')
+    )
+    # So do recurring bookings not yet materialized.
+    claimed = {
+        desk_id
+        for db in all_databases()
+        for desk_id, _ in pending_claims(day, day, using=db, desk__room__area_id__in=area_ids)
+    }
+    candidates = [desk for desk in candidates if desk['id'] not in claimed]
+
+    preferences = get_user_preferences(user.id, today)
+    proximity = colleague_proximity(user, day, area_ids)
+    popularity = {}
+    for candidate_area in area_ids:
+        popularity.update(get_area_popularity(candidate_area, today))
+
+    scored = []
+    for desk in candidates:
+        signals = {
+            'history': preferences['desks'].get(desk['id'], 0.0),
+            'room': preferences['rooms'].get(desk['room_id'], 0.0),
+            'colleagues': proximity.get(desk['id'], 0.0),
+            'popularity': popularity.get(desk['id'], 0.0),
+        }
+        score = sum(WEIGHTS[name] * value for name, value in signals.items())
+        scored.append((score, desk['identifier'], desk, signals))
+
+    # Highest score first; identifier breaks ties deterministically.
+    best = heapq.nsmallest(limit, scored, key=lambda item: (-item[0], item[1]))
+    return [
+        {
+            'desk': desk['id'],
+            'identifier': desk['identifier'],
+            'room_name': desk['room__name'],
+            'area': desk['room__area_id'],
+            'area_name': desk['room__area__name'],
+            'score': round(score, 4),
+            'signals': {name: round(value, 4) for name, value in signals.items()},
+        }
+        for score, _, desk, signals in best
+    ]
@@ -0,0 +1,40 @@
+"""
+JSON renderer backed by orjson when it is installed.
+
+Output is byte-identical to DRF's JSONRenderer for the compact, non-ASCII
+escaping configuration used by this project. Anything orjson can't
+reproduce exactly (indentation, ASCII escaping, encoder errors) falls back
+to the stdlib implementation.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+# Types DRF's JSONEncoder formats differently from orjson (e.g. 'Z' suffix
+# for UTC datetimes) are routed through its default() hook.
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if orjson is not None else 0
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Drop-in replacement for JSONRenderer using orjson with stdlib fallback."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Match JSONRenderer: always escape the JS line separators.
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -1,13 +1,149 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from django.contrib.auth import get_user_model
-from core.models import Area, Room, Desk, Reservation, UserPermission
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from core.models import (
+    Area, Room, Desk, Reservation, ReservationSeries, RoomReservation, UserPermission, WaitlistEntry,
+)
+from core.permissions import resolve_users
+from core.room_bookings import CLOSING_TIME, OPENING_TIME
+from core.series import WEEKDAY_NAMES, claim_on, mask_weekdays, weekday_mask
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+def parse_list_param(value):
+    """Split a comma-separated query parameter ('a, b,c') into names."""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets (?fields=a,b) and related-object expansion (?expand=x).
+
+    Options come from the `fields`/`expand` kwargs or, for safe requests,
+    from the query string. `expandable_fields` maps a foreign key field to
+    the serializer that replaces its id when expanded. `field_columns` and
+    `field_prefetches` declare what fields with non-lookup sources (methods,
+    counts, string representations) need, so get_query_plan() can narrow
+    the queryset to exactly the requested columns and joins.
+    """
+    expandable_fields = {}
+    field_columns = {}
+    field_prefetches = {}
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        if request is not None and request.method in SAFE_METHODS:
+            if fields is None:
+                fields = parse_list_param(request.query_params.get('fields'))
+            if expand is None:
+                expand = parse_list_param(request.query_params.get('expand'))
+
+        for name in expand or []:
+            if name in self.expandable_fields and name in self.fields:
+                self.fields[name] = self.expandable_fields[name](read_only=True)
+
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_query_plan(cls, fields=None, expand=None, prefix=''):
+        """
+        Return (columns, select_related, prefetch_related) for the requested
+        fields. `columns` is None when full rows are needed.
+        """
+        serializer = cls()
+        model = serializer.Meta.model
+        columns = {prefix + model._meta.pk.name}
+        select_related = set()
+        prefetch_related = set()
+        expand = expand or []
+
+        def add_relation(path):
+            # A traversed relation can't also be deferred, so keep its column.
+            select_related.add(prefix + path)
+            if columns is not None:
+                columns.add(prefix + path)
+
+        for name, field in serializer.fields.items():
+            if fields and name not in fields:
+                continue
+
+            if name in expand and name in cls.expandable_fields:
+                add_relation(name)
+                nested = cls.expandable_fields[name].get_query_plan(prefix=f'{prefix}{name}__')
+                if nested[0] is None:
+                    columns = None
+                elif columns is not None:
+                    columns |= nested[0]
+                select_related |= nested[1]
+                prefetch_related |= nested[2]
+                continue
+
+            if name in cls.field_columns or name in cls.field_prefetches:
+                for column in cls.field_columns.get(name, []):
+                    parts = column.split('__')
+                    for i in range(1, len(parts)):
+                        add_relation('__'.join(parts[:i]))
+                    if columns is not None:
+                        columns.add(prefix + column)
+                prefetch_related.update(prefix + p for p in cls.field_prefetches.get(name, []))
+                continue
+
+            if not field.source_attrs:
+                # source='*' (e.g. SerializerMethodField) may read anything.
+                columns = None
+                continue
+
+            current = model
+            for i, attr in enumerate(field.source_attrs):
+                path = '__'.join(field.source_attrs[:i + 1])
+                try:
+                    model_field = current._meta.get_field(attr)
+                except FieldDoesNotExist:
+                    # Method or property: can't tell which columns it reads.
+                    columns = None
+                    break
+                if model_field.auto_created and not model_field.concrete:
+                    # Reverse relations (e.g. rooms.count) run their own query.
+                    break
+                if model_field.is_relation and i < len(field.source_attrs) - 1:
+                    add_relation(path)
+                    current = model_field.related_model
+                elif columns is not None:
+                    columns.add(prefix + path)
+
+        return columns, select_related, prefetch_related
+
+    @classmethod
+    def optimize_queryset(cls, queryset, fields=None, expand=None):
+        """Apply only()/select_related()/prefetch_related() for the request."""
+        columns, select_related, prefetch_related = cls.get_query_plan(fields, expand)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if columns is not None:
+            queryset = queryset.only(*columns)
+        return queryset
+
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Converts User model to JSON, excludes sensitive fields, includes permissions."""
     area_permissions = serializers.StringRelatedField(many=True, read_only=True)
+
+    # str(UserPermission) reads the user's username and the area's name
+    field_columns = {'area_permissions': ['username']}
+    field_prefetches = {'area_permissions': ['area_permissions__area']}
     
     class Meta:
         model = User
@@ -18,10 +154,12 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'area_permissions']
 
 
-class AreaSerializer(serializers.ModelSerializer):
+class AreaSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Converts Area model to JSON with room and desk counts."""
     room_count = serializers.IntegerField(source='rooms.count', read_only=True)
     desk_count = serializers.SerializerMethodField()
+
+    field_columns = {'desk_count': []}
     
     class Meta:
         model = Area
@@ -33,10 +171,12 @@ class AreaSerializer(serializers.ModelSerializer):
         return Desk.objects.filter(room__area=obj).count()
 
 
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Converts Room model to JSON with area name and desk count."""
     area_name = serializers.CharField(source='area.name', read_only=True)
     desk_count = serializers.IntegerField(source='desks.count', read_only=True)
+
+    expandable_fields = {'area': AreaSerializer}
     
     class Meta:
         model = Room
@@ -47,10 +187,12 @@ class RoomSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class DeskSerializer(serializers.ModelSerializer):
+class DeskSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Converts Desk model to JSON with room and area information."""
     room_name = serializers.CharField(source='room.name', read_only=True)
     area_name = serializers.CharField(source='room.area.name', read_only=True)
+
+    expandable_fields = {'room': RoomSerializer}
     
     class Meta:
         model = Desk
@@ -61,16 +203,150 @@ class DeskSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Converts Reservation to JSON with validation for booking rules and quotas."""
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     desk_identifier = serializers.CharField(source='desk.identifier', read_only=True)
     area_name = serializers.CharField(source='desk.room.area.name', read_only=True)
+
+    expandable_fields = {'user': UserSerializer, 'desk': DeskSerializer}
+    field_columns = {'user_name': ['user__first_name', 'user__last_name']}
     
     class Meta:
         model = Reservation
         fields = [
             'id', 'date', 'status', 'notes', 'created_at', 'checked_in_at',
-            'user', 'user_name', 'desk', 'desk_identifier', 'area_name'
+            'user', 'user_name', 'desk', 'desk_identifier', 'area_name', 'series'
         ]
-        read_only_fields = ['created_at', 'user_name', 'desk_identifier', 'area_name']
\ No newline at end of file
+        read_only_fields = ['created_at', 'user_name', 'desk_identifier', 'area_name', 'series']
+
+    def validate(self, attrs):
+        # A recurring booking holds its future dates before they are reservations.
+        desk = attrs.get('desk', getattr(self.instance, 'desk', None))
+        day = attrs.get('date', getattr(self.instance, 'date', None))
+        unchanged = self.instance is not None and (self.instance.desk_id, self.instance.date) == (desk.pk, day)
+        if desk is not None and day is not None and not unchanged and claim_on(desk.pk, day) is not None:
+            raise serializers.ValidationError(f'Desk {desk.identifier} is held by a recurring booking on {day}')
+        return attrs
+
+
+class RoomReservationSerializer(serializers.ModelSerializer):
+    """Converts RoomReservation to JSON; the slot must lie within opening hours."""
+    room_name = serializers.CharField(source='room.name', read_only=True)
+
+    class Meta:
+        model = RoomReservation
+        fields = ['id', 'room', 'room_name', 'user', 'date', 'start_time', 'end_time', 'notes', 'created_at']
+        read_only_fields = ['user', 'created_at']
+
+    def validate_room(self, room):
+        if not room.is_bookable:
+            raise serializers.ValidationError(f'{room.name} cannot be booked')
+        return room
+
+    def validate_date(self, day):
+        if day < timezone.localdate():
+            raise serializers.ValidationError('date must not be in the past')
+        return day
+
+    def validate(self, attrs):
+        start, end = attrs['start_time'], attrs['end_time']
+        if start >= end:
+            raise serializers.ValidationError('end_time must be after start_time')
+        if start < OPENING_TIME or end > CLOSING_TIME:
+            raise serializers.ValidationError(
+                f'Rooms can be booked between {OPENING_TIME:%H:%M} and {CLOSING_TIME:%H:%M}'
+            )
+        return attrs
+
+
+class WeekdaysField(serializers.Field):
+    """A weekday bitmask as a list of names: ['mon', 'wed']."""
+
+    def to_representation(self, mask):
+        return [WEEKDAY_NAMES[day] for day in mask_weekdays(mask)]
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            raise serializers.ValidationError('Expected a non-empty list of weekdays')
+        unknown = [name for name in data if name not in WEEKDAY_NAMES]
+        if unknown:
+            raise serializers.ValidationError(f'Unknown weekdays: {unknown}; use {", ".join(WEEKDAY_NAMES)}')
+        return weekday_mask(WEEKDAY_NAMES.index(name) for name in data)
+
+
+class ReservationSeriesSerializer(serializers.ModelSerializer):
+    """Converts ReservationSeries to JSON; the desk is booked on `weekdays` from start_date to end_date."""
+    weekdays = WeekdaysField()
+    desk_identifier = serializers.CharField(source='desk.identifier', read_only=True)
+
+    class Meta:
+        model = ReservationSeries
+        fields = [
+            'id', 'user', 'desk', 'desk_identifier', 'weekdays', 'start_date', 'end_date',
+            'status', 'materialized_until', 'notes', 'created_at'
+        ]
+        read_only_fields = ['user', 'status', 'materialized_until', 'created_at']
+
+    def validate_start_date(self, start):
+        if start < timezone.localdate():
+            raise serializers.ValidationError('start_date must not be in the past')
+        return start
+
+    def validate(self, attrs):
+        end = attrs.get('end_date')
+        if end is not None and end < attrs['start_date']:
+            raise serializers.ValidationError('end_date must not be before start_date')
+        return attrs
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    """Converts WaitlistEntry to JSON; the area is taken from the desk when one is given."""
+    area = serializers.PrimaryKeyRelatedField(queryset=Area.objects.all(), required=False)
+    desk_identifier = serializers.CharField(source='desk.identifier', read_only=True, default=None)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            'id', 'user', 'area', 'desk', 'desk_identifier', 'date', 'status',
+            'reservation', 'created_at', 'promoted_at'
+        ]
+        read_only_fields = ['user', 'status', 'reservation', 'created_at', 'promoted_at']
+
+    def validate_date(self, day):
+        if day < timezone.localdate():
+            raise serializers.ValidationError('date must not be in the past')
+        return day
+
+    def validate(self, attrs):
+        desk = attrs.get('desk')
+        if desk is not None:
+            attrs['area'] = desk.room.area
+        elif attrs.get('area') is None:
+            raise serializers.ValidationError('Either desk or area is required')
+        return attrs
+
+
+class BulkPermissionSerializer(serializers.Serializer):
+    """Users, by id, employee id or department, and the areas to grant, revoke or set."""
+    user_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    employee_ids = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    departments = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    areas = serializers.ListField(child=serializers.IntegerField())
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate_areas(self, area_ids):
+        area_ids = set(area_ids)
+        missing = area_ids - set(Area.objects.filter(id__in=area_ids).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(f'Unknown areas: {sorted(missing)}')
+        return sorted(area_ids)
+
+    def validate(self, attrs):
+        if not (attrs['user_ids'] or attrs['employee_ids'] or attrs['departments']):
+            raise serializers.ValidationError('Select users with user_ids, employee_ids or departments')
+        user_ids, unknown = resolve_users(attrs['user_ids'], attrs['employee_ids'], attrs['departments'])
+        if unknown:
+            raise serializers.ValidationError({'unknown': unknown})
+        attrs['resolved_user_ids'] = user_ids
+        return attrs
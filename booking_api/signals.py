@@ -0,0 +1,108 @@
+"""Signal handlers that keep API caches coherent with writes."""
+import functools
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import (
+    Area, Room, Desk, Reservation, ReservationSeries, RoomReservation, UserPermission, GroupPermission,
+)
+from core.floor_plans import positions_changed
+from core.permissions import permissions_changed
+from .cache import bump_area_version, bump_bookings_version, bump_global_version
+from .recommendations import invalidate_user_preferences
+from .calendar import invalidate_feed
+
+User = get_user_model()
+
+
+def _area_id_for(instance):
+    """Resolve the area an instance belongs to with at most one query."""
+    if isinstance(instance, Area):
+        return instance.pk
+    if isinstance(instance, (Room, UserPermission, GroupPermission)):
+        return instance.area_id
+    if isinstance(instance, RoomReservation):
+        return Room.objects.filter(pk=instance.room_id).values_list('area_id', flat=True).first()
+    if isinstance(instance, Desk):
+        return Room.objects.filter(pk=instance.room_id).values_list('area_id', flat=True).first()
+    if isinstance(instance, (Reservation, ReservationSeries)):
+        return Desk.objects.filter(pk=instance.desk_id).values_list('room__area_id', flat=True).first()
+    return None
+
+
+@receiver(post_save, sender=Area)
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Desk)
+@receiver(post_save, sender=Reservation)
+@receiver(post_save, sender=ReservationSeries)
+@receiver(post_save, sender=RoomReservation)
+@receiver(post_save, sender=UserPermission)
+@receiver(post_save, sender=GroupPermission)
+@receiver(post_delete, sender=Area)
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=Desk)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_delete, sender=ReservationSeries)
+@receiver(post_delete, sender=RoomReservation)
+@receiver(post_delete, sender=UserPermission)
+@receiver(post_delete, sender=GroupPermission)
+def invalidate_area_cache(sender, instance, **kwargs):
+    # Rooms, desks and series can move between areas; both areas must be
+    # bumped. _previous_area_id is set by core.signals.remember_previous_area
+    # and remember_previous_series_desk.
+    area_id = _area_id_for(instance)
+    previous_area_id = getattr(instance, '_previous_area_id', None)
+    area_ids = [area_id]
+    if previous_area_id is not None and previous_area_id != area_id:
+        area_ids.append(previous_area_id)
+    # Bookings aren't part of the global lists, only of booking reports.
+    if isinstance(instance, (Reservation, ReservationSeries, RoomReservation)):
+        _bump_after_commit(area_ids, instance._state.db, bump_bookings_version)
+    else:
+        _bump_after_commit(area_ids, instance._state.db)
+
+
+def _bump_after_commit(area_ids, using, bump_lists=bump_global_version):
+    # After commit, like the calendar feed below: a read between the write
+    # and the commit would otherwise cache the old rows under the new version.
+    for area_id in area_ids:
+        transaction.on_commit(functools.partial(bump_area_version, area_id), using=using)
+    transaction.on_commit(bump_lists, using=using)
+
+
+@receiver(permissions_changed)
+def invalidate_area_caches_in_bulk(sender, area_ids, using=DEFAULT_DB_ALIAS, **kwargs):
+    _bump_after_commit(area_ids, using)
+
+
+@receiver(positions_changed)
+def invalidate_area_cache_for_positions(sender, area_id, using=DEFAULT_DB_ALIAS, **kwargs):
+    _bump_after_commit([area_id], using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    transaction.on_commit(bump_global_version, using=instance._state.db)
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_recommendation_preferences(sender, instance, **kwargs):
+    # After commit on the reservation's shard, like the calendar feed below.
+    transaction.on_commit(
+        functools.partial(invalidate_user_preferences, instance.user_id), using=instance._state.db
+    )
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_calendar_feed(sender, instance, **kwargs):
+    # After commit: a feed read in between would otherwise be cached under
+    # the fresh version with the old data until the user's next change.
+    user_ids = {instance.user_id, getattr(instance, '_previous_user_id', None)} - {None}
+    for user_id in user_ids:
+        transaction.on_commit(functools.partial(invalidate_feed, user_id), using=instance._state.db)
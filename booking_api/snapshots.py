@@ -0,0 +1,152 @@
+"""
+Area workspace snapshot: an area with its rooms, desks and one day's
+reservation states, built with a fixed number of queries regardless of
+how many rooms, desks or bookings the area has. Recurring bookings show
+as reserved on dates not yet materialized (see core/series.py).
+
+Deltas return the same desk entries, but only for desks whose state changed
+after a given area version (see core/changes.py).
+"""
+from django.db.models import FilteredRelation, OuterRef, Q, Subquery
+
+from core.booking_rules import ACTIVE_STATUSES
+from core.models import Room, Desk, DeskChange, Reservation
+from core.series import pending_on
+from core.sharding import shard_for_area
+
+# Reservation values of a pending recurring occurrence, read by with_pending().
+PENDING_FIELDS = {'user_id': 'user_id', 'first_name': 'user__first_name', 'last_name': 'user__last_name'}
+PENDING_COLUMNS = [f'pending_{field}' for field in PENDING_FIELDS]
+
+
+def desk_state(desk_status, reservation):
+    """Effective state of a desk for a day as shown in the workspace view."""
+    if desk_status != 'available':
+        return desk_status
+    if reservation is not None and reservation['status'] in ACTIVE_STATUSES:
+        return 'reserved'
+    return 'available'
+
+
+def superseded(current):
+    """
+    Whether a later reservation row of the desk and day replaces current:
+    released bookings stay on record next to the desk's active one.
+    """
+    return current is None or current['status'] not in ACTIVE_STATUSES
+
+
+def desk_payload(desk, reservation):
+    """Snapshot entry for a desk values() row and its reservation row, if any."""
+    return {
+        **desk,
+        'state': desk_state(desk['status'], reservation),
+        'reservation': None if reservation is None else {
+            'id': reservation['id'],
+            'status': reservation['status'],
+            'user': reservation['user_id'],
+            'user_name': f"{reservation['user__first_name']} {reservation['user__last_name']}".strip(),
+        },
+    }
+
+
+def with_pending(desks, day):
+    """Annotate desk rows with the recurring booking holding the desk on day but not yet materialized."""
+    pending = pending_on(day, desk=OuterRef('pk'))
+    return desks.annotate(**{
+        f'pending_{field}': Subquery(pending.values(lookup)[:1])
+        for field, lookup in PENDING_FIELDS.items()
+    })
+
+
+def pop_reservation(desk):
+    """
+    Take the pending occurrence out of a with_pending() row, as reservation
+    values (without an id), or None.
+    """
+    pending = {lookup: desk.pop(f'pending_{field}') for field, lookup in PENDING_FIELDS.items()}
+    if pending['user_id'] is None:
+        return None
+    return {'id': None, 'status': 'confirmed', **pending}
+
+
+def build_area_snapshot(area, day):
+    """Nested area → rooms → desks payload with reservation states for `day`."""
+    rooms = list(
+        Room.objects.filter(area=area)
+        .order_by('name')
+        .values('id', 'name', 'is_bookable')
+    )
+    # Desk replicas in the area's shard see its recurring bookings.
+    db = shard_for_area(area.id)
+    desks = with_pending(Desk.objects.using(db).filter(room__area=area), day).values(
+        'id', 'identifier', 'status', 'pos_x', 'pos_y', 'room_id', *PENDING_COLUMNS
+    )
+    booked = Reservation.objects.using(db).filter(desk__room__area=area, date=day).order_by('id')
+    reservations = {}
+    for row in booked.values('id', 'desk_id', 'status', 'user_id', 'user__first_name', 'user__last_name'):
+        if superseded(reservations.get(row['desk_id'])):
+            reservations[row['desk_id']] = row
+
+    desks_by_room = {room['id']: [] for room in rooms}
+    desk_count = 0
+    for desk in desks:
+        # A pending occurrence outranks a released booking of the date.
+        reservation = pop_reservation(desk) or reservations.get(desk['id'])
+        desks_by_room[desk.pop('room_id')].append(desk_payload(desk, reservation))
+        desk_count += 1
+
+    for room in rooms:
+        room['desks'] = desks_by_room[room['id']]
+
+    return {
+        'area': {
+            'id': area.id,
+            'name': area.name,
+            'map_svg': area.map_svg.url if area.map_svg else None,
+            'room_count': len(rooms),
+            'desk_count': desk_count,
+        },
+        'date': day.isoformat(),
+        'rooms': rooms,
+    }
+
+
+def build_area_delta(area_id, day, since, until):
+    """
+    Snapshot entries (plus room_id) for desks whose state on `day` changed
+    at an area version in (since, until], in one query.
+    """
+    # Desk replicas in the area's shard join its reservations there.
+    db = shard_for_area(area_id)
+    changed = DeskChange.objects.using(db).filter(
+        Q(date=day) | Q(date__isnull=True),
+        area_id=area_id, version__gt=since, version__lte=until,
+    ).values('desk_id')
+    rows = (
+        with_pending(Desk.objects.using(db).filter(id__in=changed), day)
+        .annotate(booking=FilteredRelation('reservations', condition=Q(reservations__date=day)))
+        .order_by('id', 'booking__id')
+        .values(
+            'id', 'identifier', 'status', 'pos_x', 'pos_y', 'room_id',
+            'booking__id', 'booking__status', 'booking__user_id',
+            'booking__user__first_name', 'booking__user__last_name', *PENDING_COLUMNS
+        )
+    )
+    desks = {}
+    for row in rows:
+        reservation = pop_reservation(row)
+        if reservation is None and row['booking__id'] is not None:
+            reservation = {
+                'id': row['booking__id'],
+                'status': row['booking__status'],
+                'user_id': row['booking__user_id'],
+                'user__first_name': row['booking__user__first_name'],
+                'user__last_name': row['booking__user__last_name'],
+            }
+        desk = {key: value for key, value in row.items() if not key.startswith('booking__')}
+        # One row per reservation of the desk on day.
+        current = desks.get(desk['id'])
+        if current is None or superseded(current['reservation']):
+            desks[desk['id']] = desk_payload(desk, reservation)
+    return list(desks.values())
@@ -0,0 +1,85 @@
+import base64
+from django.test import TestCase
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from core.models import Area, Room, Desk, Reservation
+from .utils import capture_queries
+
+User = get_user_model()
+
+
+def decode_bit(encoded, day, desk, desk_count):
+    bits = base64.b64decode(encoded)
+    index = day * desk_count + desk
+    return bool(bits[index // 8] & (0x80 >> (index % 8)))
+
+
+class AvailabilityMatrixTestCase(TestCase):
+    """Test the multi-day availability bitset endpoint"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.start = date.today()
+
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.room = Room.objects.create(area=self.area, name="Office 1.L.01")
+        self.desk1 = Desk.objects.create(room=self.room, identifier="1.L.01")
+        self.desk2 = Desk.objects.create(room=self.room, identifier="1.L.02")
+        self.desk3 = Desk.objects.create(room=self.room, identifier="1.L.03", status='disabled')
+
+        user = User.objects.create_user(username='jane')
+        Reservation.objects.create(user=user, desk=self.desk1, date=self.start + timedelta(days=1))
+        Reservation.objects.create(
+            user=user, desk=self.desk2, date=self.start + timedelta(days=2), status='cancelled'
+        )
+        self.url = reverse('area-availability-matrix', kwargs={'pk': self.area.pk})
+
+    def get_matrix(self, **params):
+        response = self.client.get(self.url, {'from': self.start.isoformat(), **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_states_and_free_counts(self):
+        """Each cell is in exactly the expected state"""
+        data = self.get_matrix(days=3)
+        desks = data['desks']
+        self.assertEqual(desks, [self.desk1.id, self.desk2.id, self.desk3.id])
+        self.assertEqual(data['free_counts'], [2, 1, 1])
+
+        states = data['states']
+        self.assertTrue(decode_bit(states['free'], 0, 0, 3))
+        self.assertTrue(decode_bit(states['reserved'], 1, 0, 3))
+        self.assertFalse(decode_bit(states['free'], 1, 0, 3))
+        self.assertTrue(decode_bit(states['released'], 2, 1, 3))
+        self.assertTrue(decode_bit(states['unavailable'], 0, 2, 3))
+        self.assertFalse(decode_bit(states['free'], 0, 2, 3))
+
+    def test_query_count_is_fixed(self):
+        """Area, desks, one reservation and one recurring booking query regardless of size"""
+        for i in range(20):
+            Desk.objects.create(room=self.room, identifier=f"1.L.1{i:02d}")
+        cache.clear()
+        with capture_queries() as queries:
+            self.client.get(self.url)
+        self.assertEqual(len(queries), 4)
+
+    def test_payload_stays_small(self):
+        """500 desks over 21 days stay within a few KB"""
+        Desk.objects.bulk_create(
+            Desk(room=self.room, identifier=f"BULK.{i:03d}") for i in range(500)
+        )
+        cache.clear()
+        response = self.client.get(self.url)
+        self.assertLess(len(response.content), 12 * 1024)
+        self.assertEqual(len(response.json()['free_counts']), 21)
+
+    def test_invalid_parameters(self):
+        """Bad dates and out-of-range days are rejected"""
+        self.assertEqual(self.client.get(self.url, {'from': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'days': 0}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'days': 365}).status_code, 400)
@@ -0,0 +1,238 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+from django.test import TestCase, TransactionTestCase
+from django.db import transaction
+from django.urls import reverse
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from core.models import Area, Room, Desk, Reservation, UserPermission
+from core.sharding import shard_for_area
+from booking_api import views
+from booking_api.cache import (
+    build_cache_key, bump_area_version, bump_global_version, cache_stats, get_area_version,
+    get_bookings_version, get_global_version,
+)
+
+User = get_user_model()
+
+
+class ResponseCacheTestCase(TestCase):
+    """Test versioned response caching and write-driven invalidation"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+        self.area1 = Area.objects.create(name="Level 1 - Left Wing")
+        # In area1's shard, so that desks can move between the two.
+        self.db = shard_for_area(self.area1.pk)
+        self.area2 = Area.objects.create(name="Level 2 - Right Wing")
+        while shard_for_area(self.area2.pk) != self.db:
+            self.area2 = Area.objects.create(name=f"Level {self.area2.pk + 1} - Right Wing")
+        self.room1 = Room.objects.create(area=self.area1, name="Office 1.L.01")
+        self.room2 = Room.objects.create(area=self.area2, name="Office 2.R.01")
+        self.desk1 = Desk.objects.create(room=self.room1, identifier="1.L.01")
+        self.desk2 = Desk.objects.create(room=self.room2, identifier="2.R.01")
+        self.user = User.objects.create_user(username='testuser', employee_id='EMP001')
+
+    def test_second_request_is_served_from_cache(self):
+        """Repeated GET is a hit and runs no queries"""
+        url = reverse('desk-list')
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second.json()[0]['identifier'], '1.L.01')
+
+    def test_write_invalidates_cached_response(self):
+        """Saving a desk changes the next response"""
+        url = reverse('area-desks', kwargs={'pk': self.area1.pk})
+        self.client.get(url)
+
+        self.desk1.status = 'disabled'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.desk1.save()
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()[0]['status'], 'disabled')
+
+    def test_write_bumps_only_affected_area(self):
+        """A reservation in area1 leaves area2's version and the global lists untouched"""
+        area1_version = get_area_version(self.area1.pk)
+        area2_version = get_area_version(self.area2.pk)
+        global_version = get_global_version()
+        bookings_version = get_bookings_version()
+
+        with self.captureOnCommitCallbacks(using=self.db, execute=True):
+            Reservation.objects.create(
+                user=self.user, desk=self.desk1, date=date.today() + timedelta(days=1)
+            )
+
+        self.assertGreater(get_area_version(self.area1.pk), area1_version)
+        self.assertEqual(get_area_version(self.area2.pk), area2_version)
+        self.assertEqual(get_global_version(), global_version)
+        self.assertGreater(get_bookings_version(), bookings_version)
+
+    def test_bookings_invalidate_reports_not_lists(self):
+        """A reservation keeps the cached desk list and refreshes the popularity report"""
+        desks, report = reverse('desk-list'), reverse('popularity-list')
+        self.client.get(desks)
+        self.client.get(report)
+
+        with self.captureOnCommitCallbacks(using=self.db, execute=True):
+            Reservation.objects.create(
+                user=self.user, desk=self.desk1, date=date.today() + timedelta(days=1)
+            )
+
+        self.assertEqual(self.client.get(desks)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(report)['X-Cache'], 'MISS')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.desk2.identifier = '2.R.02'
+            self.desk2.save()
+        self.assertEqual(self.client.get(desks)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(report)['X-Cache'], 'MISS')
+
+    def test_area_scoped_entry_survives_other_area_writes(self):
+        """Writes in area2 don't evict area1's cached desks"""
+        url = reverse('area-desks', kwargs={'pk': self.area1.pk})
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserPermission.objects.create(user=self.user, area=self.area2)
+
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_moving_desk_invalidates_both_areas(self):
+        """Desk moved to another area's room bumps old and new area"""
+        old_version = get_area_version(self.area1.pk)
+        new_version = get_area_version(self.area2.pk)
+
+        self.desk1.room = self.room2
+        with self.captureOnCommitCallbacks(execute=True):
+            self.desk1.save()
+
+        self.assertGreater(get_area_version(self.area1.pk), old_version)
+        self.assertGreater(get_area_version(self.area2.pk), new_version)
+
+    def test_versions_are_bumped_after_commit(self):
+        """A read inside an uncommitted write caches under the old version, which the commit retires"""
+        url = reverse('area-desks', kwargs={'pk': self.area1.pk})
+        version = get_area_version(self.area1.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.desk1.status = 'disabled'
+                self.desk1.save()
+                # Another request reading now caches what it sees under the current version.
+                self.client.get(url)
+                self.assertEqual(get_area_version(self.area1.pk), version)
+
+        self.assertGreater(get_area_version(self.area1.pk), version)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_evicted_versions_do_not_repeat(self):
+        """An evicted version key restarts past every value it held"""
+        versions = [get_area_version(self.area1.pk), get_global_version()]
+        for _ in range(3):
+            bump_area_version(self.area1.pk)
+            bump_global_version()
+        cache.delete_many([f'booking_api:ver:area:{self.area1.pk}', 'booking_api:ver:global'])
+
+        self.assertGreater(get_global_version(), versions[1] + 3)
+        self.assertGreater(get_area_version(self.area1.pk), versions[0] + 3)
+
+    def test_default_date_is_part_of_the_key(self):
+        """Responses for the implicit today are not served once the day changes"""
+        url = reverse('area-room-slots', kwargs={'pk': self.area1.pk})
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        tomorrow = date.today() + timedelta(days=1)
+        with mock.patch('booking_api.cache.date', wraps=date) as mock_date:
+            mock_date.today.return_value = tomorrow
+            self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_not_found_is_not_cached(self):
+        """Error responses always go to the view"""
+        url = reverse('area-detail', kwargs={'pk': 9999})
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertNotEqual(response.get('X-Cache'), 'HIT')
+
+    def test_hit_ratio_reported(self):
+        """Stats count hits and misses"""
+        url = reverse('area-list')
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get(url)
+
+        stats = cache_stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertAlmostEqual(stats['ratio'], 2 / 3)
+
+
+class CoalescingTestCase(TransactionTestCase):
+    """Concurrent identical misses share one computation"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        room = Room.objects.create(area=self.area, name="Office 1.L.01")
+        Desk.objects.create(room=room, identifier="1.L.01")
+        self.user = User.objects.create_user(username='testuser', employee_id='EMP001')
+        UserPermission.objects.create(user=self.user, area=self.area)
+        self.url = reverse('area-snapshot', kwargs={'pk': self.area.pk}) + f'?date={date.today().isoformat()}'
+        self.computed = 0
+
+    def slow_snapshot(self, area, day):
+        self.computed += 1
+        time.sleep(0.3)
+        return {'area': area.pk, 'date': day.isoformat()}
+
+    def get(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.get(self.url)
+
+    def test_concurrent_requests_share_one_computation(self):
+        """Four simultaneous snapshot requests build the snapshot once"""
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(self.get())) for _ in range(4)]
+        with mock.patch.object(views, 'build_area_snapshot', self.slow_snapshot):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(self.computed, 1)
+        self.assertEqual(sorted(r['X-Cache'] for r in responses), ['COALESCED'] * 3 + ['MISS'])
+        self.assertEqual(len({r.content for r in responses}), 1)
+        self.assertEqual({r['ETag'] for r in responses}, {responses[0]['ETag']})
+        stats = cache_stats()
+        self.assertEqual((stats['misses'], stats['coalesced']), (1, 3))
+        self.assertAlmostEqual(stats['coalescing_ratio'], 3 / 4)
+
+    def test_waits_for_another_process_holding_the_lock(self):
+        """With the shared lock taken elsewhere, the body that process stores is served"""
+        request = SimpleNamespace(accepted_media_type='application/json', get_full_path=lambda: self.url)
+        key = build_cache_key(request, f'a{self.area.pk}-{get_area_version(self.area.pk)}')
+        cache.add(f'{key}:lock', 1)
+        threading.Timer(0.2, cache.set, args=(key, b'{"from": "elsewhere"}')).start()
+
+        with mock.patch.object(views, 'build_area_snapshot', self.slow_snapshot):
+            response = self.get()
+        self.assertEqual(self.computed, 0)
+        self.assertEqual(response['X-Cache'], 'COALESCED')
+        self.assertEqual(response.json(), {'from': 'elsewhere'})
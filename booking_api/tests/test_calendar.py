@@ -0,0 +1,101 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from core.models import Area, Room, Desk, Reservation
+from core.sharding import shard_for_area
+from booking_api.calendar import make_token
+
+User = get_user_model()
+
+
+class CalendarFeedTestCase(TestCase):
+    """Test tokenized iCalendar feeds"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.tomorrow = date.today() + timedelta(days=1)
+
+        area = Area.objects.create(name="Level 1, Left Wing")
+        self.db = shard_for_area(area.id)
+        room = Room.objects.create(area=area, name="Open Office A")
+        self.desk1 = Desk.objects.create(room=room, identifier="1.L.01")
+        self.desk2 = Desk.objects.create(room=room, identifier="1.L.02")
+        self.user = User.objects.create_user(username='jane', employee_id='EMP001')
+        self.other = User.objects.create_user(username='joe', employee_id='EMP002')
+
+        self.booking = Reservation.objects.create(user=self.user, desk=self.desk1, date=self.tomorrow)
+        Reservation.objects.create(user=self.other, desk=self.desk2, date=self.tomorrow)
+        Reservation.objects.create(user=self.user, desk=self.desk2, date=date.today() - timedelta(days=60))
+
+        self.url = reverse('calendar-feed', kwargs={'token': make_token(self.user.pk)})
+
+    def fetch(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body.decode('utf-8')
+
+    def test_feed_contents(self):
+        """Only the user's recent and upcoming bookings, as all-day events"""
+        response, body = self.fetch()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/calendar'))
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn(f'UID:reservation-{self.booking.id}@corp-booking', body)
+        self.assertIn(f'DTSTART;VALUE=DATE:{self.tomorrow:%Y%m%d}', body)
+        self.assertIn('LOCATION:Level 1\\, Left Wing - Open Office A', body)
+        self.assertIn('STATUS:CONFIRMED', body)
+
+    def test_cached_and_conditional(self):
+        """Repeat polls skip the database; a matching ETag gets a 304"""
+        response, body = self.fetch()
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            cached, cached_body = self.fetch()
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            since = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(cached_body, body)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(since.status_code, 304)
+
+    def test_invalidated_only_by_own_changes(self):
+        """Another user's booking keeps the feed; the user's own change refreshes it"""
+        etag = self.fetch()[0]['ETag']
+        with self.captureOnCommitCallbacks(using=self.db, execute=True):
+            Reservation.objects.create(user=self.other, desk=self.desk1, date=self.tomorrow + timedelta(days=1))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(using=self.db, execute=True):
+            self.booking.status = 'cancelled'
+            self.booking.save()
+        response, body = self.fetch(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('STATUS:CANCELLED', body)
+
+    def test_token_endpoint_and_bad_token(self):
+        """The subscription URL points at the feed; forged tokens are rejected"""
+        self.client.force_authenticate(self.user)
+        data = self.client.get(reverse('calendar-list')).json()
+        self.assertTrue(data['url'].endswith(self.url))
+
+        forged = reverse('calendar-feed', kwargs={'token': f'{self.other.pk}:forged'})
+        self.assertEqual(self.client.get(forged).status_code, 404)
+
+    def test_long_lines_are_folded(self):
+        """Content lines are folded at 75 octets"""
+        self.booking.notes = 'Ä' * 100
+        self.booking.save()
+        body = self.fetch()[1]
+        self.assertTrue(all(len(line.encode('utf-8')) <= 75 for line in body.split('\r\n')))
+        self.assertIn('DESCRIPTION:', body)
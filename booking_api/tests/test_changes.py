@@ -0,0 +1,145 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from core.changes import get_change_version
+from core.models import Area, Room, Desk, Reservation, AreaVersion, UserPermission, WaitlistEntry
+from core.sharding import shard_for_area
+
+User = get_user_model()
+
+
+class AreaChangesTestCase(TestCase):
+    """Test delta sync of desk states"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.tomorrow = date.today() + timedelta(days=1)
+
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.db = shard_for_area(self.area.id)
+        self.room = Room.objects.create(area=self.area, name="Office 1.L.01")
+        self.desk1 = Desk.objects.create(room=self.room, identifier="1.L.01")
+        self.desk2 = Desk.objects.create(room=self.room, identifier="1.L.02")
+        self.desk3 = Desk.objects.create(room=self.room, identifier="1.L.03")
+        self.user = User.objects.create_user(username='jane', first_name='Jane', last_name='Doe')
+
+        self.url = reverse('area-changes', kwargs={'pk': self.area.pk})
+
+    def sync(self, since=None, day=None):
+        params = {'date': (day or self.tomorrow).isoformat()}
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_first_sync_is_full_snapshot(self):
+        """Without since the client gets the full snapshot and a version"""
+        data = self.sync()
+        self.assertTrue(data['full'])
+        self.assertEqual(data['area']['desk_count'], 3)
+        self.assertEqual(data['version'], get_change_version(self.area.pk)[0])
+
+    def test_delta_contains_only_changed_desks(self):
+        """Booking one desk returns just that desk with its new state"""
+        version = self.sync()['version']
+        Reservation.objects.create(user=self.user, desk=self.desk2, date=self.tomorrow)
+
+        data = self.sync(version)
+        self.assertFalse(data['full'])
+        self.assertGreater(data['version'], version)
+        self.assertEqual([desk['id'] for desk in data['desks']], [self.desk2.id])
+        self.assertEqual(data['desks'][0]['state'], 'reserved')
+        self.assertEqual(data['desks'][0]['reservation']['user_name'], 'Jane Doe')
+
+        self.assertEqual(self.sync(data['version'])['desks'], [])
+
+    def test_other_dates_and_desk_edits(self):
+        """Bookings on other dates are ignored; desk edits show on every date"""
+        version = self.sync()['version']
+        Reservation.objects.create(user=self.user, desk=self.desk1, date=self.tomorrow + timedelta(days=1))
+        self.desk3.status = 'disabled'
+        self.desk3.save()
+
+        desks = self.sync(version)['desks']
+        self.assertEqual([(desk['id'], desk['state']) for desk in desks], [(self.desk3.id, 'disabled')])
+
+    def test_cancellation_frees_desk(self):
+        """A cancelled booking comes back as available"""
+        reservation = Reservation.objects.create(user=self.user, desk=self.desk1, date=self.tomorrow)
+        version = self.sync()['version']
+        reservation.status = 'cancelled'
+        reservation.save()
+
+        desk = self.sync(version)['desks'][0]
+        self.assertEqual(desk['state'], 'available')
+        self.assertEqual(desk['reservation']['status'], 'cancelled')
+
+    def test_rebooking_after_cancellation(self):
+        """A new booking next to the cancelled one shows once, as reserved"""
+        reservation = Reservation.objects.create(user=self.user, desk=self.desk1, date=self.tomorrow)
+        reservation.status = 'cancelled'
+        reservation.save()
+        version = self.sync()['version']
+        other = User.objects.create_user(username='john', first_name='John', last_name='Roe')
+        rebooked = Reservation.objects.create(user=other, desk=self.desk1, date=self.tomorrow)
+
+        desks = self.sync(version)['desks']
+        self.assertEqual([(desk['id'], desk['state']) for desk in desks], [(self.desk1.id, 'reserved')])
+        self.assertEqual(desks[0]['reservation']['id'], rebooked.id)
+        snapshot = {desk['id']: desk for desk in self.sync()['rooms'][0]['desks']}
+        self.assertEqual(snapshot[self.desk1.id]['reservation']['user_name'], 'John Roe')
+
+    def test_unchanged_refresh_is_one_query(self):
+        """An up-to-date client costs one query; a delta costs two"""
+        version = self.sync()['version']
+        with CaptureQueriesContext(connections[self.db]) as queries:
+            self.sync(version)
+        self.assertEqual(len(queries), 1)
+
+        Reservation.objects.create(user=self.user, desk=self.desk2, date=self.tomorrow)
+        with CaptureQueriesContext(connections[self.db]) as queries:
+            self.sync(version)
+        self.assertEqual(len(queries), 2)
+
+    def test_stale_or_unknown_version_falls_back_to_snapshot(self):
+        """Room edits and desk deletions raise the floor; future versions are unknown"""
+        version = self.sync()['version']
+        self.room.name = "Office 1.L.99"
+        self.room.save()
+        self.assertTrue(self.sync(version)['full'])
+
+        version = self.sync()['version']
+        self.desk3.delete()
+        self.assertTrue(self.sync(version)['full'])
+
+        self.assertTrue(self.sync(version + 100)['full'])
+
+    def test_desk_moving_areas_resets_old_area(self):
+        """The area a desk leaves can't express the removal as a delta"""
+        # Desks only move within their shard.
+        other_area = Area.objects.create(name="Level 2")
+        while shard_for_area(other_area.id) != self.db:
+            other_area = Area.objects.create(name=f"Level {other_area.id + 1}")
+        other_room = Room.objects.create(area=other_area, name="Office 2.01")
+        version = self.sync()['version']
+        self.desk1.room = other_room
+        self.desk1.save()
+        self.assertTrue(self.sync(version)['full'])
+
+    def test_area_delete_cascades(self):
+        """Deleting an area with bookings and waiters leaves no counters or promotions behind"""
+        Reservation.objects.create(user=self.user, desk=self.desk1, date=self.tomorrow)
+        waiter = User.objects.create_user(username='joe', employee_id='EMP002')
+        UserPermission.objects.create(user=waiter, area=self.area)
+        WaitlistEntry.objects.create(user=waiter, area=self.area, desk=self.desk1, date=self.tomorrow)
+        self.area.delete()
+        self.assertFalse(AreaVersion.objects.exists())
+        self.assertFalse(Reservation.objects.exists())
@@ -11,6 +11,7 @@ User = get_user_model()
 
 class APIEndpointsTestCase(TestCase):
     """Test cases for all API endpoints"""
+    databases = '__all__'
     
     def setUp(self):
         self.client = APIClient()
@@ -0,0 +1,67 @@
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.renderers import JSONRenderer
+from datetime import date, timedelta
+from core.models import Area, Room, Desk, Reservation
+from booking_api.serializers import DeskSerializer, ReservationSerializer
+from booking_api.fast_serializers import desk_values_serializer, reservation_values_serializer
+from booking_api.renderers import FastJSONRenderer
+
+User = get_user_model()
+
+
+class FastSerializerEquivalenceTest(TestCase):
+    """Fast path output must be byte-identical to the ModelSerializers"""
+    databases = '__all__'
+
+    def setUp(self):
+        self.area = Area.objects.create(name="Nivo 1 – Levo krilo  ")
+        self.room = Room.objects.create(area=self.area, name="Pisarna 1.Č.01")
+        self.desk1 = Desk.objects.create(room=self.room, identifier="1.L.01", pos_x=100, pos_y=200)
+        self.desk2 = Desk.objects.create(room=self.room, identifier="1.L.02", status='permanent')
+
+        self.user = User.objects.create_user(username='ana', first_name='Ana', last_name='Žagar')
+        self.nameless = User.objects.create_user(username='anon')
+
+        tomorrow = date.today() + timedelta(days=1)
+        Reservation.objects.create(user=self.user, desk=self.desk1, date=tomorrow, notes='"quoted"\n\u2028')
+        Reservation.objects.create(
+            user=self.nameless, desk=self.desk2, date=tomorrow,
+            status='checked_in', checked_in_at=timezone.now(),
+        )
+
+    def assertRendersIdentically(self, serializer_class, fast_serializer, queryset):
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        fast_data = fast_serializer.serialize(queryset)
+        self.assertEqual(JSONRenderer().render(fast_data), expected)
+        self.assertEqual(FastJSONRenderer().render(fast_data), expected)
+
+    def test_desk_fast_path_matches_serializer(self):
+        """Desk rows produce the same bytes as DeskSerializer"""
+        self.assertRendersIdentically(DeskSerializer, desk_values_serializer, Desk.objects.all())
+
+    def test_reservation_fast_path_matches_serializer(self):
+        """Reservation rows (incl. full name and nulls) match ReservationSerializer"""
+        self.assertRendersIdentically(
+            ReservationSerializer, reservation_values_serializer, Reservation.objects.all()
+        )
+
+    def test_fast_path_uses_single_query(self):
+        """Joins are resolved in one values_list() query"""
+        with self.assertNumQueries(1):
+            reservation_values_serializer.serialize(Reservation.objects.all())
+
+    def test_fast_renderer_matches_for_serializer_data(self):
+        """FastJSONRenderer is a drop-in for JSONRenderer on regular data"""
+        data = ReservationSerializer(Reservation.objects.all(), many=True).data
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_fast_renderer_honours_indent(self):
+        """Indented output falls back to the stdlib encoder"""
+        data = DeskSerializer(Desk.objects.all(), many=True).data
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type),
+        )
@@ -0,0 +1,129 @@
+import threading
+from unittest import mock
+from django.test import TransactionTestCase, override_settings
+from django.db import DatabaseError
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from core import group_commit
+from core.models import Area, Room, Desk, Reservation
+from core.sharding import shard_for_area
+
+User = get_user_model()
+
+
+@override_settings(BOOKING_GROUP_COMMIT=True, BOOKING_GROUP_COMMIT_WINDOW_MS=200)
+class GroupCommitTestCase(TransactionTestCase):
+    """Test quick_book with concurrent bookings committed in batches"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.db = shard_for_area(self.area.id)
+        self.room = Room.objects.create(area=self.area, name="Office 1.L.01")
+        self.desks = [Desk.objects.create(room=self.room, identifier=f"1.L.0{n}") for n in range(1, 4)]
+        self.users = [User.objects.create_user(username=f'user{n}', employee_id=f'EMP00{n}') for n in range(6)]
+        self.day = (date.today() + timedelta(days=1)).isoformat()
+
+    def book_concurrently(self, bookings):
+        """Send (user, desk) quick_book requests at once; returns {(user, desk): response}"""
+        responses = {}
+
+        def book(user, desk):
+            client = APIClient()
+            client.force_authenticate(user)
+            responses[(user, desk)] = client.post(
+                reverse('reservation-quick-book'), {'desk_id': desk.id, 'date': self.day}, format='json'
+            )
+
+        threads = [threading.Thread(target=book, args=booking) for booking in bookings]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_batch_keeps_per_request_conflicts(self):
+        """Three users racing for one desk get one 201 and two 409s; other desks book normally"""
+        contested, *others = self.desks
+        bookings = [(user, contested) for user in self.users[:3]]
+        bookings += list(zip(self.users[3:], others))
+        responses = self.book_concurrently(bookings)
+
+        contested_codes = sorted(responses[(user, contested)].status_code for user in self.users[:3])
+        self.assertEqual(contested_codes, [201, 409, 409])
+        for user, desk in zip(self.users[3:], others):
+            self.assertEqual(responses[(user, desk)].status_code, 201)
+        self.assertEqual(Reservation.objects.using(self.db).filter(desk=contested).count(), 1)
+        self.assertEqual(Reservation.objects.using(self.db).count(), 3)
+
+        winner = next(user for user in self.users[:3] if responses[(user, contested)].status_code == 201)
+        reservation = responses[(winner, contested)].json()['reservation']
+        self.assertTrue(Reservation.objects.using(self.db).filter(pk=reservation['id'], user=winner).exists())
+
+    def test_bookings_share_one_transaction(self):
+        """Bookings queued within the window are committed together"""
+        batches = []
+        original = group_commit._Writer._next_batch
+
+        def record(writer):
+            batch = original(writer)
+            batches.append(len(batch))
+            return batch
+
+        # A fresh writer, so that every batch goes through the patched method.
+        with mock.patch.object(group_commit._Writer, '_next_batch', record), \
+                mock.patch.dict(group_commit._writers, clear=True):
+            responses = self.book_concurrently(list(zip(self.users[:3], self.desks)))
+        self.assertEqual({response.status_code for response in responses.values()}, {201})
+        self.assertEqual(sum(batches), 3)
+        self.assertLess(len(batches), 3)
+
+    def test_writer_survives_connection_errors(self):
+        """A batch whose connection check fails gets the error; the next batch commits"""
+        original = BaseDatabaseWrapper.close_if_unusable_or_obsolete
+        calls = []
+
+        def fail_once(connection):
+            calls.append(connection.alias)
+            if len(calls) == 1:
+                raise DatabaseError('connection lost')
+            return original(connection)
+
+        with mock.patch.object(BaseDatabaseWrapper, 'close_if_unusable_or_obsolete', fail_once), \
+                mock.patch.dict(group_commit._writers, clear=True):
+            with self.assertRaisesMessage(DatabaseError, 'connection lost'):
+                group_commit.submit(self.db, lambda: 1)
+            self.assertEqual(group_commit.submit(self.db, lambda: 2), 2)
+
+    @override_settings(BOOKING_GROUP_COMMIT_TIMEOUT=0.2, BOOKING_GROUP_COMMIT_WINDOW_MS=0)
+    def test_timeout_drops_queued_write(self):
+        """A request stops waiting after the timeout; its queued write never runs"""
+        started, release = threading.Event(), threading.Event()
+        written = []
+
+        def block():
+            started.set()
+            release.wait()
+
+        def submit_blocking():
+            try:
+                group_commit.submit(self.db, block)
+            except TimeoutError:
+                pass  # this request may time out too
+
+        with mock.patch.dict(group_commit._writers, clear=True):
+            blocker = threading.Thread(target=submit_blocking)
+            blocker.start()
+            started.wait()
+            with self.assertRaises(TimeoutError):
+                group_commit.submit(self.db, lambda: written.append(1))
+            release.set()
+            blocker.join()
+            with self.settings(BOOKING_GROUP_COMMIT_TIMEOUT=10):
+                self.assertEqual(group_commit.submit(self.db, lambda: 3), 3)
+        self.assertEqual(written, [])
@@ -0,0 +1,119 @@
+import threading
+from unittest import mock
+from django.test import TransactionTestCase
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from core.models import Area, Room, Desk, Reservation
+from core.sharding import shard_for_area
+from booking_api.views import ReservationViewSet
+
+User = get_user_model()
+
+
+class IdempotencyKeyTestCase(TransactionTestCase):
+    """Test Idempotency-Key handling on reservation writes"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.db = shard_for_area(self.area.id)
+        self.room = Room.objects.create(area=self.area, name="Office 1.L.01")
+        self.desk = Desk.objects.create(room=self.room, identifier="1.L.01")
+        self.user = User.objects.create_user(username='jane')
+        self.client.force_authenticate(self.user)
+        self.payload = {'desk_id': self.desk.id, 'date': (date.today() + timedelta(days=1)).isoformat()}
+        self.url = reverse('reservation-quick-book')
+
+    def post(self, key, payload=None, client=None):
+        return (client or self.client).post(
+            self.url, payload or self.payload, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_replay_returns_original_response(self):
+        """A retried quick_book gets the original 201, not a 409"""
+        first = self.post('booking-1')
+        second = self.post('booking-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Reservation.objects.using(self.db).count(), 1)
+
+    def test_replay_skips_database(self):
+        """Replays don't touch the booking path"""
+        self.post('booking-1')
+        with self.assertNumQueries(0):
+            self.post('booking-1')
+
+    def test_without_key_duplicate_conflicts(self):
+        """Plain retries still hit the unique constraint"""
+        self.client.post(self.url, self.payload, format='json')
+        response = self.client.post(self.url, self.payload, format='json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_key_reused_with_different_payload(self):
+        """Reusing a key for another request is rejected"""
+        self.post('booking-1')
+        other = dict(self.payload, date=(date.today() + timedelta(days=2)).isoformat())
+        self.assertEqual(self.post('booking-1', other).status_code, 422)
+
+    def test_keys_are_scoped_per_user(self):
+        """Another user's identical key runs independently"""
+        self.post('booking-1')
+        other_client = APIClient()
+        other_client.force_authenticate(User.objects.create_user(username='joe'))
+        response = self.post('booking-1', client=other_client)
+        self.assertEqual(response.status_code, 409)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_create_endpoint(self):
+        """POST /reservations/ honours the key"""
+        url = reverse('reservation-list')
+        payload = {'user': self.user.id, 'desk': self.desk.id, 'date': self.payload['date']}
+        first = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY='create-1')
+        second = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY='create-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.content, first.content)
+
+    def test_unhandled_error_frees_the_key(self):
+        """A crashed request doesn't hold its key; the retry runs straight away"""
+        url = reverse('reservation-list')
+        payload = {'user': self.user.id, 'desk': self.desk.id, 'date': self.payload['date']}
+        with mock.patch.object(ReservationViewSet, 'perform_create', side_effect=RuntimeError('crash')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY='create-2')
+        with self.settings(BOOKING_IDEMPOTENCY_WAIT=0):
+            retry = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY='create-2')
+        self.assertEqual(retry.status_code, 201)
+
+    def test_patch_with_key(self):
+        """PATCH goes through update() once"""
+        reservation = Reservation.objects.create(user=self.user, desk=self.desk, date=date.today())
+        url = reverse('reservation-detail', kwargs={'pk': reservation.pk})
+        response = self.client.patch(url, {'notes': 'Window seat'}, format='json', HTTP_IDEMPOTENCY_KEY='patch-1')
+        self.assertEqual(response.status_code, 200)
+
+    def test_concurrent_duplicates_are_coalesced(self):
+        """Simultaneous duplicates produce one booking and identical responses"""
+        responses = []
+
+        def book():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            responses.append(self.post('booking-concurrent', client=client))
+
+        threads = [threading.Thread(target=book) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Reservation.objects.using(self.db).count(), 1)
+        self.assertEqual({r.status_code for r in responses}, {201})
+        self.assertEqual(len({r.content for r in responses}), 1)
@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from core.models import Area, UserPermission
+from core.permissions import bulk_replace, permitted_area_ids
+
+User = get_user_model()
+
+
+class BulkPermissionTestCase(TestCase):
+    """Test bulk grant/revoke/replace through the API, the command and the helpers"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', employee_id='ADM001', is_admin=True)
+        self.areas = [Area.objects.create(name=f"Level {n}") for n in range(1, 4)]
+        # One by one: bulk_create() would skip replicating them to the shards.
+        self.users = [
+            User.objects.create_user(
+                username=f'user{n}', employee_id=f'EMP{n:03d}', department='Sales' if n % 2 else 'Engineering'
+            )
+            for n in range(1, 7)
+        ]
+        self.client.force_authenticate(self.admin)
+
+    def post(self, action, **data):
+        return self.client.post(reverse(f'permission-{action}'), data, format='json')
+
+    def area_ids(self, user):
+        return set(UserPermission.objects.filter(user=user).values_list('area_id', flat=True))
+
+    def test_grant_by_department_and_employee_id(self):
+        """Grants reach every selected user and count only new rows"""
+        UserPermission.objects.create(user=self.users[0], area=self.areas[0])
+        response = self.post('grant', departments=['Sales'], employee_ids=['EMP002'], areas=[self.areas[0].id])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.json()[key] for key in ('users', 'areas', 'created', 'deleted')},
+            {'users': 4, 'areas': 1, 'created': 3, 'deleted': 0},
+        )
+        self.assertEqual(UserPermission.objects.filter(area=self.areas[0]).count(), 4)
+
+    def test_revoke_and_replace(self):
+        """Revoke removes the given areas; replace leaves exactly the given areas"""
+        user = self.users[0]
+        self.post('grant', user_ids=[user.id], areas=[a.id for a in self.areas])
+        self.assertEqual(self.post('revoke', user_ids=[user.id], areas=[self.areas[0].id]).json()['deleted'], 1)
+        self.assertEqual(self.area_ids(user), {self.areas[1].id, self.areas[2].id})
+
+        response = self.post('replace', user_ids=[user.id], areas=[self.areas[0].id, self.areas[1].id])
+        self.assertEqual((response.json()['created'], response.json()['deleted']), (1, 1))
+        self.assertEqual(self.area_ids(user), {self.areas[0].id, self.areas[1].id})
+
+        self.post('replace', user_ids=[user.id], areas=[])
+        self.assertEqual(self.area_ids(user), set())
+
+    def test_cache_follows_bulk_changes(self):
+        """Cached effective permissions are dropped when the change commits"""
+        user = self.users[0]
+        self.assertEqual(permitted_area_ids(user.id), set())
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_replace([user.id], [self.areas[2].id])
+        self.assertEqual(permitted_area_ids(user.id), {self.areas[2].id})
+
+    def test_dry_run_and_validation(self):
+        """Dry runs change nothing; unknown users or areas and non-admins are rejected"""
+        response = self.post('grant', departments=['Sales'], areas=[self.areas[0].id], dry_run=True)
+        self.assertEqual(response.json()['created'], 3)
+        self.assertFalse(UserPermission.objects.exists())
+
+        response = self.post('grant', employee_ids=['EMP001', 'NOPE'], areas=[self.areas[0].id])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['unknown'], {'employee_ids': ['NOPE']})
+        self.assertEqual(self.post('grant', user_ids=[self.users[0].id], areas=[999]).status_code, 400)
+        self.assertEqual(self.post('grant', user_ids=[self.users[0].id], areas=[]).status_code, 400)
+
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.post('grant', user_ids=[self.users[0].id], areas=[self.areas[0].id]).status_code, 403)
+
+    def test_command(self):
+        """The management command takes the same selectors"""
+        out = StringIO()
+        call_command('bulk_permissions', 'grant', '--departments', 'Engineering',
+                     '--areas', f'{self.areas[0].id},{self.areas[1].id}', stdout=out)
+        self.assertIn('6 permissions created, 0 deleted', out.getvalue())
+        self.assertEqual(UserPermission.objects.count(), 6)
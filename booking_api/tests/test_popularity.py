@@ -0,0 +1,108 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from io import StringIO
+from core.models import Area, Room, Desk, Reservation, DeskUsage
+from core.popularity import rebuild_usage, top_areas, top_desks
+from core.sharding import across_shards
+
+User = get_user_model()
+
+
+class PopularityTestCase(TestCase):
+    """Test hot desk/area counters and top-K queries"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.other_area = Area.objects.create(name="Level 2 - Right Wing")
+        room = Room.objects.create(area=self.area, name="Open Office A")
+        other_room = Room.objects.create(area=self.other_area, name="Open Office B")
+        self.desk1 = Desk.objects.create(room=room, identifier="1.L.01")
+        self.desk2 = Desk.objects.create(room=room, identifier="1.L.02")
+        self.desk3 = Desk.objects.create(room=other_room, identifier="2.R.01")
+        self.user = User.objects.create_user(username='jane', employee_id='EMP001')
+
+    def book(self, desk, day, **kwargs):
+        return Reservation.objects.create(user=self.user, desk=desk, date=day, **kwargs)
+
+    def usage(self):
+        return {(u.desk_id, u.month): u.bookings for u in across_shards(DeskUsage.objects.using)}
+
+    def test_counters_follow_writes(self):
+        """Creates, cancellations, moves and deletes keep monthly counters exact"""
+        reservation = self.book(self.desk1, date(2026, 3, 10))
+        self.book(self.desk1, date(2026, 3, 11))
+        self.assertEqual(self.usage(), {(self.desk1.id, date(2026, 3, 1)): 2})
+
+        reservation.status = 'cancelled'
+        reservation.save()
+        self.assertEqual(self.usage()[(self.desk1.id, date(2026, 3, 1))], 1)
+
+        reservation.status = 'confirmed'
+        reservation.desk = self.desk2
+        reservation.date = date(2026, 4, 2)
+        reservation.save()
+        self.assertEqual(self.usage()[(self.desk2.id, date(2026, 4, 1))], 1)
+
+        reservation.delete()
+        self.assertEqual(self.usage()[(self.desk2.id, date(2026, 4, 1))], 0)
+
+        before = self.usage()
+        rebuild_usage()
+        self.assertEqual({key: count for key, count in before.items() if count}, self.usage())
+
+    def test_top_k_combines_months_and_partial_edges(self):
+        """Whole months come from counters, partial months from reservations"""
+        for day in (date(2026, 1, 31), date(2026, 2, 10), date(2026, 2, 11), date(2026, 3, 1)):
+            self.book(self.desk1, day)
+        for day in (date(2026, 2, 12), date(2026, 3, 2), date(2026, 3, 3)):
+            self.book(self.desk3, day)
+        self.book(self.desk2, date(2026, 3, 10))
+
+        start, end = date(2026, 1, 31), date(2026, 3, 2)
+        self.assertEqual(top_desks(start, end), [(self.desk1.id, 4), (self.desk3.id, 2)])
+        self.assertEqual(top_areas(start, end), [(self.area.id, 4), (self.other_area.id, 2)])
+        self.assertEqual(top_desks(date(2026, 3, 1), date(2026, 3, 31), limit=1), [(self.desk3.id, 2)])
+
+    def test_api(self):
+        """The endpoint names desks and areas and validates parameters"""
+        today = date.today()
+        self.book(self.desk2, today)
+        self.book(self.desk2, today - timedelta(days=1))
+        self.book(self.desk1, today - timedelta(days=2))
+
+        response = self.client.get(reverse('popularity-list'), {'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['desks'], [{
+            'desk': self.desk2.id, 'identifier': '1.L.02', 'room_name': 'Open Office A',
+            'area': self.area.id, 'area_name': 'Level 1 - Left Wing', 'bookings': 2,
+        }])
+        self.assertEqual(data['areas'], [{'area': self.area.id, 'name': 'Level 1 - Left Wing', 'bookings': 3}])
+
+        url = reverse('popularity-list')
+        self.assertEqual(self.client.get(url, {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': '2026-02-01', 'to': '2026-01-01'}).status_code, 400)
+
+    def test_admin_panel(self):
+        """The desk usage changelist shows the hot desk report"""
+        admin = User.objects.create_superuser(username='admin', employee_id='ADM001', password='x')
+        self.client.force_login(admin)
+        self.book(self.desk3, date.today())
+        response = self.client.get(reverse('admin:core_deskusage_changelist'))
+        self.assertContains(response, 'popularity-panel')
+        self.assertContains(response, '2.R.01')
+
+    def test_benchmark_command(self):
+        """The benchmark runs on a small data set and leaves no data behind"""
+        out = StringIO()
+        call_command('benchmark_popularity', '--desks', '20', '--days', '40', '--repeat', '1', stdout=out)
+        self.assertIn('counters', out.getvalue())
+        self.assertFalse(Area.objects.filter(name__startswith='__benchmark').exists())
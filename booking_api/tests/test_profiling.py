@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from booking_api.profiling import RESPONSE_HEADER, list_profiles
+from core.models import Area
+
+User = get_user_model()
+
+
+class ProfilingTestCase(TestCase):
+    """Test on-demand request profiling and the admin viewer"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings_override = override_settings(BOOKING_PROFILE_DIR=self.directory, BOOKING_PROFILE_KEEP=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        Area.objects.create(name="Level 1 - Left Wing")
+        self.staff = User.objects.create_user(username='staff', employee_id='EMP001', is_staff=True)
+        self.user = User.objects.create_user(username='user', employee_id='EMP002')
+        self.client = APIClient()
+
+    def test_staff_request_is_profiled(self):
+        """A flagged staff request stores its functions and SQL"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('area-list'), HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+
+        [profile] = list_profiles()
+        self.assertEqual(profile['id'], response[RESPONSE_HEADER])
+        self.assertEqual((profile['path'], profile['user']), ('/api/areas/', 'staff'))
+        self.assertTrue(any('core_area' in query['sql'] for query in profile['queries']))
+        self.assertTrue(profile['top_functions'])
+
+    def test_query_flag_and_token_auth(self):
+        """?_profile works too, for API clients authenticating with a token"""
+        token = Token.objects.create(user=self.staff)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = self.client.get(reverse('area-list'), {'_profile': '1'})
+        self.assertIn(RESPONSE_HEADER, response)
+
+    def test_unflagged_and_non_staff_requests_are_not_profiled(self):
+        """Nothing is recorded without the flag or for non-staff users"""
+        self.client.force_login(self.staff)
+        self.assertNotIn(RESPONSE_HEADER, self.client.get(reverse('area-list')))
+        self.client.force_login(self.user)
+        self.assertNotIn(RESPONSE_HEADER, self.client.get(reverse('area-list'), HTTP_X_PROFILE='1'))
+        self.assertEqual(list_profiles(), [])
+
+    def test_rotation(self):
+        """Only the newest BOOKING_PROFILE_KEEP profiles are kept"""
+        self.client.force_login(self.staff)
+        ids = [self.client.get(reverse('area-list'), HTTP_X_PROFILE='1')[RESPONSE_HEADER] for _ in range(3)]
+        self.assertEqual({profile['id'] for profile in list_profiles()}, set(ids[1:]))
+
+    def test_admin_pages(self):
+        """Staff can browse profiles in the admin; others are sent to the login"""
+        self.client.force_login(self.staff)
+        profile_id = self.client.get(reverse('area-list'), HTTP_X_PROFILE='1')[RESPONSE_HEADER]
+
+        response = self.client.get(reverse('profile-list'))
+        self.assertContains(response, profile_id)
+        response = self.client.get(reverse('profile-detail', args=[profile_id]))
+        self.assertContains(response, 'core_area')
+        response = self.client.get(reverse('profile-download', args=[profile_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('profile-detail', args=['missing'])).status_code, 404)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('profile-list')).status_code, 302)
@@ -0,0 +1,131 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from core.models import Area, Room, Desk, Reservation, UserPermission
+from core.sharding import shard_for_area
+from booking_api.recommendations import SpatialGrid, recommend_desks
+
+User = get_user_model()
+
+
+class SpatialGridTest(TestCase):
+    """Test the per-area desk position grid"""
+    databases = '__all__'
+
+    def test_within_radius(self):
+        """Only desks inside the radius are returned, across cell borders"""
+        grid = SpatialGrid([(1, 0, 0), (2, 90, 0), (3, 150, 0), (4, 500, 500)], cell_size=100)
+        found = dict(grid.within(100, 0, 60))
+        self.assertEqual(set(found), {2, 3})
+        self.assertAlmostEqual(found[3], 50)
+
+
+class RecommendationTestCase(TestCase):
+    """Test desk ranking and one-click booking"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.today = date.today()
+        self.day = self.today + timedelta(days=1)
+
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.db = shard_for_area(self.area.id)
+        self.other_area = Area.objects.create(name="Level 2 - Right Wing")
+        self.room = Room.objects.create(area=self.area, name="Open Office A")
+        self.other_room = Room.objects.create(area=self.other_area, name="Open Office B")
+
+        self.desk_a = Desk.objects.create(room=self.room, identifier="1.L.01", pos_x=0, pos_y=0)
+        self.desk_b = Desk.objects.create(room=self.room, identifier="1.L.02", pos_x=100, pos_y=0)
+        self.desk_c = Desk.objects.create(room=self.room, identifier="1.L.03", pos_x=1000, pos_y=0)
+        self.desk_d = Desk.objects.create(room=self.room, identifier="1.L.04", pos_x=1100, pos_y=0)
+        Desk.objects.create(room=self.room, identifier="1.L.05", status='permanent')
+        Desk.objects.create(room=self.other_room, identifier="2.R.01")
+
+        self.user = User.objects.create_user(username='jane', employee_id='EMP001', department='Engineering')
+        self.colleague = User.objects.create_user(username='joe', employee_id='EMP002', department='Engineering')
+        UserPermission.objects.create(user=self.user, area=self.area)
+
+    def identifiers(self, recommendations):
+        return [item['identifier'] for item in recommendations]
+
+    def test_only_bookable_permitted_desks(self):
+        """Permanent desks, booked desks and other areas are excluded"""
+        Reservation.objects.create(user=self.colleague, desk=self.desk_a, date=self.day)
+        result = recommend_desks(self.user, self.day, limit=10, today=self.today)
+        self.assertEqual(set(self.identifiers(result)), {'1.L.02', '1.L.03', '1.L.04'})
+
+    def test_history_ranks_first(self):
+        """The user's usual desk is the top pick"""
+        for days_ago in range(1, 4):
+            Reservation.objects.create(user=self.user, desk=self.desk_c, date=self.today - timedelta(days=days_ago))
+        result = recommend_desks(self.user, self.day, today=self.today)
+        self.assertEqual(result[0]['identifier'], '1.L.03')
+        self.assertGreater(result[0]['signals']['history'], 0)
+
+    def test_colleague_proximity(self):
+        """Desks next to a same-department colleague rank higher"""
+        Reservation.objects.create(user=self.colleague, desk=self.desk_c, date=self.day)
+        result = recommend_desks(self.user, self.day, today=self.today)
+        self.assertEqual(result[0]['identifier'], '1.L.04')
+        self.assertGreater(result[0]['signals']['colleagues'], 0)
+
+    def test_preferences_refresh_after_booking(self):
+        """Precomputed preferences are dropped when the user books"""
+        recommend_desks(self.user, self.day, today=self.today)
+        with self.captureOnCommitCallbacks(using=self.db, execute=True):
+            Reservation.objects.create(user=self.user, desk=self.desk_d, date=self.today - timedelta(days=1))
+        result = recommend_desks(self.user, self.day, today=self.today)
+        self.assertEqual(result[0]['identifier'], '1.L.04')
+
+    def test_no_permission_in_area(self):
+        """Areas the user can't book return nothing"""
+        self.assertEqual(recommend_desks(self.user, self.day, area_id=self.other_area.id), [])
+
+    def test_recommend_endpoint(self):
+        """GET ranks desks for the requested date and area"""
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('desk-recommend'), {
+            'date': self.day.isoformat(), 'area': self.area.id, 'limit': 2,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_one_click_booking(self):
+        """POST books the top pick for the user"""
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('desk-recommend'), {'date': self.day.isoformat()})
+
+        self.assertEqual(response.status_code, 201)
+        reservation = Reservation.objects.using(self.db).get(user=self.user, date=self.day)
+        self.assertEqual(reservation.desk.identifier, response.json()['recommendation']['identifier'])
+
+    def test_one_click_booking_over_quota(self):
+        """Past the weekly quota the one-click booking awaits approval"""
+        monday = self.today + timedelta(days=7 - self.today.weekday())
+        for offset, desk in enumerate((self.desk_a, self.desk_b, self.desk_c)):
+            Reservation.objects.create(user=self.user, desk=desk, date=monday + timedelta(days=offset))
+        self.client.force_authenticate(self.user)
+        thursday = monday + timedelta(days=3)
+        response = self.client.post(reverse('desk-recommend'), {'date': thursday.isoformat()})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['reservation']['status'], 'pending_approval')
+
+    def test_unbookable_rooms_excluded(self):
+        """Desks in rooms closed for booking are never recommended"""
+        self.room.is_bookable = False
+        self.room.save()
+        self.assertEqual(recommend_desks(self.user, self.day, today=self.today), [])
+
+    def test_one_click_booking_when_full(self):
+        """No bookable desk returns a conflict"""
+        for desk in (self.desk_a, self.desk_b, self.desk_c, self.desk_d):
+            Reservation.objects.create(user=self.colleague, desk=desk, date=self.day)
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('desk-recommend'), {'date': self.day.isoformat()})
+        self.assertEqual(response.status_code, 409)
@@ -0,0 +1,136 @@
+from unittest import mock
+from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connections
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from io import StringIO
+from core.events import compact_events, prune_events, read_events
+from core.models import Area, Room, Desk, Reservation, ReservationEvent
+from core.sharding import shard_for_area
+
+User = get_user_model()
+
+
+class ReservationEventTestCase(TestCase):
+    """Test the append-only reservation event log"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        area = Area.objects.create(name="Level 1 - Left Wing")
+        room = Room.objects.create(area=area, name="Open Office A")
+        self.desk = Desk.objects.create(room=room, identifier="1.L.01")
+        self.db = shard_for_area(area.id)
+        self.user = User.objects.create_user(username='jane', employee_id='EMP001')
+        self.day = date.today() + timedelta(days=1)
+
+    def events(self):
+        return ReservationEvent.objects.using(self.db)
+
+    def event_types(self):
+        return list(self.events().values_list('event_type', flat=True))
+
+    def test_changes_are_logged_in_order(self):
+        """Create, check-in, cancel, edit and delete each append one event"""
+        reservation = Reservation.objects.create(user=self.user, desk=self.desk, date=self.day)
+        reservation_id = reservation.id
+        reservation.status = 'checked_in'
+        reservation.save()
+        reservation.status = 'cancelled'
+        reservation.save()
+        reservation.notes = 'Left early'
+        reservation.save()
+        reservation.status = 'confirmed'
+        reservation.save()
+        reservation.delete()
+
+        self.assertEqual(self.event_types(), [
+            'created', 'checked_in', 'cancelled', 'updated', 'status_changed', 'deleted'
+        ])
+        ids = list(self.events().values_list('id', flat=True))
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(set(self.events().values_list('reservation_id', flat=True)), {reservation_id})
+        self.assertEqual(self.events().filter(event_type='cancelled').get().previous_status, 'checked_in')
+
+    def test_event_rolls_back_with_change(self):
+        """A failed save leaves no event behind"""
+        Reservation.objects.create(user=self.user, desk=self.desk, date=self.day)
+        with self.assertRaises(IntegrityError):
+            Reservation.objects.create(user=self.user, desk=self.desk, date=self.day)
+        self.assertEqual(self.event_types(), ['created'])
+
+    def test_api_reads_batches_after_sequence(self):
+        """Consumers page through events with after/next"""
+        for offset in range(5):
+            Reservation.objects.create(user=self.user, desk=self.desk, date=self.day + timedelta(days=offset))
+        url = reverse('reservation-event-list')
+
+        first = self.client.get(url, {'limit': 3, 'shard': self.db}).json()
+        self.assertEqual(len(first['events']), 3)
+        self.assertTrue(first['has_more'])
+        self.assertFalse(first['gap'])
+
+        rest = self.client.get(url, {'after': first['next'], 'limit': 3, 'shard': self.db}).json()
+        self.assertEqual(len(rest['events']), 2)
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(rest['events'][0]['id'], first['next'] + 1)
+        self.assertEqual(rest['events'][0]['event_type'], 'created')
+
+        self.assertEqual(self.client.get(url, {'after': 'x'}).status_code, 400)
+
+    def test_recent_events_wait_out_the_lag(self):
+        """With concurrent writers, reads stop before the first event inside the lag"""
+        older = Reservation.objects.create(user=self.user, desk=self.desk, date=self.day)
+        Reservation.objects.create(user=self.user, desk=self.desk, date=self.day + timedelta(days=1))
+        self.events().filter(reservation_id=older.id).update(created_at=timezone.now() - timedelta(minutes=1))
+
+        with mock.patch.object(connections[self.db], 'vendor', 'postgresql'):
+            events, has_more, _ = read_events(using=self.db)
+        self.assertEqual([event['reservation_id'] for event in events], [older.id])
+        self.assertFalse(has_more)
+        self.assertEqual(len(read_events(using=self.db)[0]), 2)
+
+    def test_compaction_keeps_latest_event_per_reservation(self):
+        """Superseded events go, each reservation's newest one stays"""
+        reservation = Reservation.objects.create(user=self.user, desk=self.desk, date=self.day)
+        reservation.status = 'checked_in'
+        reservation.save()
+        other = Reservation.objects.create(user=self.user, desk=self.desk, date=self.day + timedelta(days=1))
+        upto = self.events().last().id
+
+        self.assertEqual(compact_events(upto, segment_size=1, using=self.db), 1)
+        remaining = self.events().values_list('reservation_id', 'event_type')
+        self.assertEqual(set(remaining), {(reservation.id, 'checked_in'), (other.id, 'created')})
+
+    def test_retention_reports_gap(self):
+        """Pruned events make a stale consumer see a gap"""
+        for offset in range(3):
+            Reservation.objects.create(user=self.user, desk=self.desk, date=self.day + timedelta(days=offset))
+        first_id = self.events().first().id
+        self.events().filter(id__lt=first_id + 2).update(
+            created_at=timezone.now() - timedelta(days=100)
+        )
+
+        self.assertEqual(prune_events(timezone.now() - timedelta(days=90), segment_size=1, using=self.db), 2)
+        response = self.client.get(reverse('reservation-event-list'), {'after': first_id - 1, 'shard': self.db}).json()
+        self.assertTrue(response['gap'])
+        self.assertEqual(len(response['events']), 1)
+
+    def test_prune_command(self):
+        """The management command applies retention and compaction"""
+        reservation = Reservation.objects.create(user=self.user, desk=self.desk, date=self.day)
+        reservation.status = 'cancelled'
+        reservation.save()
+        self.events().update(created_at=timezone.now() - timedelta(days=10))
+
+        out = StringIO()
+        call_command('prune_reservation_events', '--compact-days', '7', stdout=out)
+        self.assertIn('Pruned 0', out.getvalue())
+        self.assertIn('Compacted 1', out.getvalue())
+        self.assertEqual(self.event_types(), ['cancelled'])
@@ -0,0 +1,195 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connections
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import timedelta
+from io import StringIO
+from core.booking_rules import weekday_bookings
+from core.models import Area, Room, Desk, Reservation, ReservationSeries, UserPermission
+from core.sharding import shard_for_area
+from core import series as series_module
+from core.series import HORIZON_DAYS, create_series, materialize, weekday_mask
+
+User = get_user_model()
+
+MON, WED = 0, 2
+
+
+class ReservationSeriesTestCase(TestCase):
+    """Test recurring bookings and their lazily materialized occurrences"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.today = timezone.localdate()
+        self.monday = self.today + timedelta(days=7 - self.today.weekday())  # next Monday
+
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.db = shard_for_area(self.area.id)
+        self.room = Room.objects.create(area=self.area, name="Open Office A")
+        self.desk = Desk.objects.create(room=self.room, identifier="1.L.01")
+        self.other_desk = Desk.objects.create(room=self.room, identifier="1.L.02")
+        self.user = User.objects.create_user(username='alice', employee_id='EMP001', first_name='Alice')
+        self.colleague = User.objects.create_user(username='bob', employee_id='EMP002')
+        for user in (self.user, self.colleague):
+            UserPermission.objects.create(user=user, area=self.area)
+        self.client.force_authenticate(self.user)
+
+    def create(self, **data):
+        payload = {'desk': self.desk.id, 'weekdays': ['mon', 'wed'], 'start_date': self.monday.isoformat(), **data}
+        return self.client.post(reverse('reservationseries-list'), payload, format='json')
+
+    def snapshot_state(self, desk, day):
+        response = self.client.get(reverse('area-snapshot', args=[self.area.id]), {'date': day.isoformat()})
+        desks = [entry for room in response.json()['rooms'] for entry in room['desks']]
+        return next(entry for entry in desks if entry['id'] == desk.id)
+
+    def test_create_materializes_within_horizon_only(self):
+        """Reservations exist up to the horizon; later occurrences are held by the series"""
+        response = self.create()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['weekdays'], ['mon', 'wed'])
+        horizon = self.today + timedelta(days=HORIZON_DAYS)
+        occurrences = Reservation.objects.using(self.db).filter(series_id=response.json()['id'])
+        dates = list(occurrences.values_list('date', flat=True))
+        self.assertTrue(dates)
+        self.assertTrue(all(day <= horizon and day.weekday() in (MON, WED) for day in dates))
+
+        later = self.monday + timedelta(weeks=8)
+        self.assertFalse(Reservation.objects.using(self.db).filter(date=later).exists())
+        entry = self.snapshot_state(self.desk, later)
+        self.assertEqual(entry['state'], 'reserved')
+        self.assertEqual(entry['reservation']['id'], None)
+        self.assertEqual(entry['reservation']['user'], self.user.id)
+
+    def test_pending_occurrences_block_bookings_and_count_to_quota(self):
+        """Bookings on a held date are refused; the quota counts pending occurrences"""
+        self.create()
+        later = self.monday + timedelta(weeks=8)
+        self.client.force_authenticate(self.colleague)
+        response = self.client.post(
+            reverse('reservation-quick-book'), {'desk_id': self.desk.id, 'date': later.isoformat()}, format='json'
+        )
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post(
+            reverse('reservation-list'),
+            {'desk': self.desk.id, 'user': self.colleague.id, 'date': later.isoformat()},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(weekday_bookings(self.user.id, later), 2)
+
+    def test_conflicts_and_rules(self):
+        """Taken dates are a 409; overlapping weekdays and more than the quota are refused"""
+        taken = self.monday + timedelta(weeks=10, days=WED)
+        Reservation.objects.create(user=self.colleague, desk=self.desk, date=taken)
+        response = self.create()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['conflicts'], [taken.isoformat()])
+
+        self.assertEqual(self.create(desk=self.other_desk.id).status_code, 201)
+        self.assertEqual(self.create(desk=self.desk.id, weekdays=['wed']).status_code, 400)
+        self.assertEqual(self.create(desk=self.desk.id, weekdays=['tue', 'thu']).status_code, 400)
+        self.assertEqual(self.create(weekdays=['someday']).status_code, 400)
+
+    def test_no_user_to_act_for(self):
+        """Anonymous series with no user in the system fail cleanly"""
+        User.objects.all().delete()
+        self.client.force_authenticate(None)
+        self.assertEqual(self.create().status_code, 500)
+
+    def test_materialize_rolls_the_horizon_forward(self):
+        """The daily job materializes newly due occurrences once, past the quota as pending approval"""
+        series, _ = create_series(self.user, self.desk, weekday_mask([MON]), self.monday, today=self.today)
+        week = self.monday + timedelta(weeks=4)
+        for offset, desk_id in ((1, self.desk.id), (2, self.desk.id), (3, self.other_desk.id)):
+            Reservation.objects.create(user=self.user, desk_id=desk_id, date=week + timedelta(days=offset))
+
+        later = self.today + timedelta(days=14)
+        self.assertGreater(materialize(later), 0)
+        self.assertEqual(materialize(later), 0)
+        occurrence = Reservation.objects.using(self.db).get(series=series, date=week)
+        self.assertEqual(occurrence.status, 'pending_approval')
+        series.refresh_from_db()
+        self.assertEqual(series.materialized_until, later + timedelta(days=HORIZON_DAYS))
+
+        out = StringIO()
+        call_command('materialize_series', today=later + timedelta(days=7), stdout=out)
+        self.assertIn('Created 1 reservations', out.getvalue())
+
+    def test_cancel_and_move_whole_series(self):
+        """Cancelling or moving acts on upcoming occurrences and the pending ones alike"""
+        series_id = self.create().json()['id']
+        later = self.monday + timedelta(weeks=8)
+
+        response = self.client.post(
+            reverse('reservationseries-move', args=[series_id]), {'desk': self.other_desk.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Reservation.objects.using(self.db).filter(desk=self.desk, status='confirmed').exists())
+        self.assertTrue(Reservation.objects.using(self.db).filter(desk=self.other_desk, series_id=series_id).exists())
+        self.assertEqual(self.snapshot_state(self.desk, later)['state'], 'available')
+        self.assertEqual(self.snapshot_state(self.other_desk, later)['state'], 'reserved')
+
+        with self.captureOnCommitCallbacks(using=self.db, execute=True):
+            response = self.client.post(reverse('reservationseries-cancel', args=[series_id]))
+        self.assertEqual(response.json()['status'], 'cancelled')
+        self.assertGreater(response.json()['cancelled_reservations'], 0)
+        self.assertFalse(Reservation.objects.using(self.db).filter(series_id=series_id, status='confirmed').exists())
+        self.assertEqual(self.snapshot_state(self.other_desk, later)['state'], 'available')
+        self.assertEqual(ReservationSeries.objects.using(self.db).get(pk=series_id).status, 'cancelled')
+
+
+class ReservationSeriesRaceTestCase(TransactionTestCase):
+    """Test concurrent series of one user"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.monday = self.today + timedelta(days=7 - self.today.weekday())
+        area = Area.objects.create(name="Level 1 - Left Wing")
+        room = Room.objects.create(area=area, name="Open Office A")
+        self.desks = [Desk.objects.create(room=room, identifier=f"1.L.0{n}") for n in range(2)]
+        self.user = User.objects.create_user(username='alice', employee_id='EMP001')
+
+    def test_rules_are_checked_under_the_lock(self):
+        """Two series on the same weekdays racing on different desks: exactly one is created"""
+        original = series_module.rule_error
+
+        def slow_rule_error(*args, **kwargs):
+            # Widen the gap between checking the rules and creating the series.
+            error = original(*args, **kwargs)
+            time.sleep(0.1)
+            return error
+
+        results = {}
+
+        def create(desk):
+            try:
+                results[desk.pk] = create_series(self.user, desk, weekday_mask([MON]), self.monday)[0]
+            except ValidationError as error:
+                results[desk.pk] = error
+            finally:
+                connections.close_all()
+
+        with mock.patch.object(series_module, 'rule_error', slow_rule_error):
+            threads = [threading.Thread(target=create, args=[desk]) for desk in self.desks]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(sum(isinstance(result, ReservationSeries) for result in results.values()), 1)
+        self.assertEqual(sum(isinstance(result, ValidationError) for result in results.values()), 1)
@@ -0,0 +1,183 @@
+import threading
+import time as time_module
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.db import connections
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, time, timedelta
+from core.models import Area, Room, RoomReservation, UserPermission
+from core import room_bookings
+from core.room_bookings import RoomSchedule, book_room
+
+User = get_user_model()
+
+
+class RoomScheduleTestCase(SimpleTestCase):
+    """Test the sorted interval index behind conflict checks and free slots"""
+    databases = '__all__'
+
+    def setUp(self):
+        self.schedule = RoomSchedule([
+            (time(13), time(14), 2),
+            (time(9), time(10, 30), 1),
+        ])
+
+    def test_overlaps(self):
+        """Touching intervals are free; any intersection conflicts"""
+        self.assertFalse(self.schedule.overlaps(time(10, 30), time(13)))
+        self.assertFalse(self.schedule.overlaps(time(7), time(9)))
+        self.assertTrue(self.schedule.overlaps(time(10), time(11)))
+        self.assertTrue(self.schedule.overlaps(time(12), time(15)))
+        self.assertTrue(self.schedule.overlaps(time(9, 15), time(9, 45)))
+        self.assertTrue(self.schedule.overlaps(time(8), time(19)))
+
+    def test_add_keeps_order_and_rejects_overlap(self):
+        """Bookings stay sorted by start and overlapping ones are refused"""
+        self.schedule.add(time(11), time(12), 3)
+        self.assertEqual([key for _, _, key in self.schedule.booked()], [1, 3, 2])
+        with self.assertRaises(ValueError):
+            self.schedule.add(time(11, 30), time(12, 30))
+
+    def test_free_slots(self):
+        """Free slots are the gaps between bookings within opening hours"""
+        self.assertEqual(self.schedule.free_slots(time(8), time(18)), [
+            (time(8), time(9)), (time(10, 30), time(13)), (time(14), time(18)),
+        ])
+        self.assertEqual(RoomSchedule().free_slots(time(8), time(9)), [(time(8), time(9))])
+        self.assertEqual(self.schedule.free_slots(time(9), time(10)), [])
+
+
+class RoomBookingTestCase(TestCase):
+    """Test meeting-room bookings through the API"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.day = date.today() + timedelta(days=7)
+
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.room = Room.objects.create(area=self.area, name="Meeting Room")
+        self.office = Room.objects.create(area=self.area, name="Open Office A", is_bookable=False)
+        self.user = User.objects.create_user(username='user', employee_id='EMP001')
+        self.other = User.objects.create_user(username='other', employee_id='EMP002')
+        for user in (self.user, self.other):
+            UserPermission.objects.create(user=user, area=self.area)
+
+    def book(self, start, end, user=None, room=None):
+        self.client.force_authenticate(user or self.user)
+        return self.client.post(reverse('roomreservation-list'), {
+            'room': (room or self.room).id, 'date': self.day.isoformat(),
+            'start_time': start, 'end_time': end,
+        }, format='json')
+
+    def test_book_and_conflict(self):
+        """Overlapping bookings of a room are rejected with 409"""
+        response = self.book('09:00', '10:00')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['room_name'], 'Meeting Room')
+
+        self.assertEqual(self.book('09:30', '11:00', user=self.other).status_code, 409)
+        self.assertEqual(self.book('10:00', '11:00', user=self.other).status_code, 201)
+        self.assertEqual(RoomReservation.objects.count(), 2)
+
+    def test_invalid_slots(self):
+        """Slots must end after they start, within opening hours, on a future date, in a bookable room"""
+        self.assertEqual(self.book('10:00', '09:00').status_code, 400)
+        self.assertEqual(self.book('05:00', '06:00').status_code, 400)
+        self.assertEqual(self.book('09:00', '10:00', room=self.office).status_code, 400)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('roomreservation-list'), {
+            'room': self.room.id, 'date': '2020-01-06', 'start_time': '09:00', 'end_time': '10:00',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date', response.json())
+
+    def test_no_user_to_act_for(self):
+        """Anonymous bookings with no user in the system fail cleanly"""
+        User.objects.all().delete()
+        response = self.client.post(reverse('roomreservation-list'), {
+            'room': self.room.id, 'date': self.day.isoformat(), 'start_time': '09:00', 'end_time': '10:00',
+        }, format='json')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {'error': 'No users found in system'})
+
+    def test_requires_area_permission(self):
+        """Users without access to the area cannot book its rooms"""
+        outsider = User.objects.create_user(username='outsider', employee_id='EMP003')
+        self.assertEqual(self.book('09:00', '10:00', user=outsider).status_code, 403)
+
+    def test_area_room_slots(self):
+        """One call returns every bookable room's bookings and free slots"""
+        self.book('09:00', '10:00')
+        other_room = Room.objects.create(area=self.area, name="Board Room")
+
+        response = self.client.get(
+            reverse('area-room-slots', args=[self.area.id]), {'date': self.day.isoformat()}
+        )
+        data = response.json()
+        self.assertEqual([room['name'] for room in data['rooms']], ['Board Room', 'Meeting Room'])
+        board, meeting = data['rooms']
+        self.assertEqual(board['free'], [{'start': '07:00', 'end': '20:00'}])
+        self.assertEqual(meeting['booked'][0]['start'], '09:00')
+        self.assertEqual(meeting['free'], [{'start': '07:00', 'end': '09:00'}, {'start': '10:00', 'end': '20:00'}])
+
+        # A new booking invalidates the cached response.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book('12:00', '13:00', room=other_room)
+        response = self.client.get(
+            reverse('area-room-slots', args=[self.area.id]), {'date': self.day.isoformat()}
+        )
+        self.assertEqual(len(response.json()['rooms'][0]['booked']), 1)
+
+    def test_cancel_frees_slot(self):
+        """Deleting a booking frees its slot"""
+        pk = self.book('09:00', '10:00').json()['id']
+        self.client.delete(reverse('roomreservation-detail', args=[pk]))
+        self.assertEqual(self.book('09:00', '10:00', user=self.other).status_code, 201)
+
+
+class RoomBookingRaceTestCase(TransactionTestCase):
+    """Test concurrent bookings of the same room slot"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        area = Area.objects.create(name="Level 1 - Left Wing")
+        self.room = Room.objects.create(area=area, name="Meeting Room")
+        self.users = [User.objects.create_user(username=f'user{n}', employee_id=f'EMP00{n}') for n in range(3)]
+        self.day = date.today() + timedelta(days=7)
+
+    def test_overlapping_bookings_are_serialised(self):
+        """Bookings racing for one slot each see the others' writes: exactly one wins"""
+        original = room_bookings.load_schedule
+
+        def slow_load(room_id, day):
+            # Widen the gap between reading the schedule and writing the booking.
+            schedule = original(room_id, day)
+            time_module.sleep(0.1)
+            return schedule
+
+        results = {}
+
+        def book(user):
+            try:
+                results[user] = book_room(user, self.room, self.day, time(9), time(10))
+            finally:
+                connections.close_all()
+
+        with mock.patch.object(room_bookings, 'load_schedule', slow_load):
+            threads = [threading.Thread(target=book, args=[user]) for user in self.users]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(sum(booking is not None for booking in results.values()), 1)
+        self.assertEqual(RoomReservation.objects.count(), 1)
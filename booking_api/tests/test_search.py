@@ -0,0 +1,142 @@
+from django.test import SimpleTestCase, TestCase
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from core.models import Area, Room, Desk, GroupPermission, UserPermission
+from core.search import Document, SearchIndex
+
+User = get_user_model()
+
+
+def document(kind, pk, text, areas=(1,)):
+    return Document(kind, pk, text, '', text, frozenset(areas))
+
+
+class SearchIndexTestCase(SimpleTestCase):
+    """Test the trigram index"""
+    databases = '__all__'
+
+    def setUp(self):
+        self.index = SearchIndex()
+        for pk, identifier in enumerate(['1.l.12', '1.l.01', '2.r.12', '10.l.1'], start=1):
+            self.index.put(document('desk', pk, identifier))
+        self.index.put(document('room', 1, 'open office a', areas=(2,)))
+        self.index.put(document('user', 1, 'anna schmidt anna emp001'))
+
+    def labels(self, query, **kwargs):
+        return [doc.label for doc in self.index.search(query, **kwargs)]
+
+    def test_substring_match_ranked(self):
+        """Exact and prefix matches rank before other substring matches"""
+        # The substring match first, then near misses sharing 2 of 3 trigrams
+        self.assertEqual(self.labels('1.l.1'), ['1.l.12', '1.l.01', '10.l.1'])
+        self.assertEqual(self.labels('l.12'), ['1.l.12'])
+        self.assertEqual(self.labels('office'), ['open office a'])
+        self.assertEqual(self.labels('EMP001'), ['anna schmidt anna emp001'])
+
+    def test_short_query_matches_word_starts(self):
+        """Two characters match the start of a word only"""
+        self.assertEqual(self.labels('sc'), ['anna schmidt anna emp001'])
+        self.assertEqual(self.labels('ch'), [])
+
+    def test_fuzzy_match(self):
+        """Small typos still find the document"""
+        self.assertEqual(self.labels('schmitt'), ['anna schmidt anna emp001'])
+
+    def test_scoping(self):
+        """Results are limited to the given areas and kinds"""
+        self.assertEqual(self.labels('office', areas={1}), [])
+        self.assertEqual(self.labels('office', areas={2}), ['open office a'])
+        self.assertEqual(self.labels('1.l', kinds=('room',)), [])
+
+    def test_update_and_remove(self):
+        """Re-putting a document replaces it; removing drops it"""
+        self.index.put(document('room', 1, 'quiet room', areas=(2,)))
+        self.assertEqual(self.labels('office'), [])
+        self.assertEqual(self.labels('quiet'), ['quiet room'])
+        self.index.remove('room', 1)
+        self.assertEqual(self.labels('quiet'), [])
+
+
+class SearchApiTestCase(TestCase):
+    """Test /api/search/"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.hidden_area = Area.objects.create(name="Level 9 - Executive")
+        self.room = Room.objects.create(area=self.area, name="Open Office A")
+        self.desk = Desk.objects.create(room=self.room, identifier="1.L.12")
+        Desk.objects.create(
+            room=Room.objects.create(area=self.hidden_area, name="Board Room"), identifier="9.L.12"
+        )
+
+        self.user = User.objects.create_user(username='jdoe', first_name='Jane', last_name='Doe',
+                                             employee_id='EMP001')
+        self.colleague = User.objects.create_user(username='mmuster', first_name='Max', last_name='Müller',
+                                                  employee_id='EMP002')
+        User.objects.create_user(username='exec', first_name='Max', last_name='Mayer', employee_id='EMP003')
+        for user in (self.user, self.colleague):
+            UserPermission.objects.create(user=user, area=self.area)
+        self.client.force_authenticate(self.user)
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('search-list'), {'q': query, **params})
+        return response.json()['results']
+
+    def test_scoped_to_permitted_areas(self):
+        """Desks, rooms and users outside the caller's areas are hidden"""
+        self.assertEqual([(r['type'], r['label']) for r in self.search('L.12')], [('desk', '1.L.12')])
+        self.assertEqual([r['label'] for r in self.search('max')], ['Max Müller'])
+        self.assertEqual(self.search('board'), [])
+
+    def test_admins_see_everything(self):
+        """Administrators are not limited by area permissions"""
+        self.user.is_admin = True
+        self.user.save()
+        self.assertEqual(len(self.search('L.12')), 2)
+
+    def test_accents_and_types(self):
+        """Accents are ignored and ?types= narrows the result kinds"""
+        result = self.search('muller')[0]
+        self.assertEqual((result['type'], result['id'], result['detail']), ('user', self.colleague.id, 'EMP002'))
+        self.assertEqual([r['type'] for r in self.search('level 1', types='area')], ['area'])
+
+    def test_index_follows_changes(self):
+        """Committed writes reach the index without a rebuild"""
+        self.assertEqual(self.search('quiet'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.name = 'Quiet Room'
+            self.room.save()
+        self.assertEqual([r['label'] for r in self.search('quiet')], ['Quiet Room'])
+        # The desk's detail follows its room.
+        self.assertEqual(self.search('1.L.12')[0]['detail'], 'Level 1 - Left Wing - Quiet Room')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.desk.delete()
+        self.assertEqual(self.search('1.L.12'), [])
+
+    def test_department_grants_scope_users(self):
+        """Users permitted through their department show up once the grant commits"""
+        self.assertEqual([r['label'] for r in self.search('mayer')], [])
+        self.search('max')  # the index is built before the grant
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(username='exec').update(department='Board')
+            GroupPermission.objects.create(area=self.area, department='Board')
+        self.assertEqual([r['label'] for r in self.search('mayer')], ['Max Mayer'])
+
+    def test_anonymous_callers_are_refused(self):
+        """Search acts for the signed-in user only, never a stand-in"""
+        self.client.force_authenticate(None)
+        response = self.client.get(reverse('search-list'), {'q': 'max'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_validation(self):
+        """Too-short queries, unknown types and bad limits are rejected"""
+        url = reverse('search-list')
+        self.assertEqual(self.client.get(url, {'q': 'a'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'desk', 'types': 'car'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'desk', 'limit': 0}).status_code, 400)
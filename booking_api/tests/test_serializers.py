@@ -12,6 +12,7 @@ User = get_user_model()
 
 class UserSerializerTest(TestCase):
     """Test UserSerializer functionality"""
+    databases = '__all__'
     
     def setUp(self):
         self.user = User.objects.create_user(
@@ -63,6 +64,7 @@ class UserSerializerTest(TestCase):
 
 class AreaSerializerTest(TestCase):
     """Test AreaSerializer functionality"""
+    databases = '__all__'
     
     def setUp(self):
         self.area = Area.objects.create(name="Level 1 - Left Wing")
@@ -107,6 +109,7 @@ class AreaSerializerTest(TestCase):
 
 class RoomSerializerTest(TestCase):
     """Test RoomSerializer functionality"""
+    databases = '__all__'
     
     def setUp(self):
         self.area = Area.objects.create(name="Level 1 - Left Wing")
@@ -140,6 +143,7 @@ class RoomSerializerTest(TestCase):
 
 class DeskSerializerTest(TestCase):
     """Test DeskSerializer functionality"""
+    databases = '__all__'
     
     def setUp(self):
         self.area = Area.objects.create(name="Level 1 - Left Wing")
@@ -190,6 +194,7 @@ class DeskSerializerTest(TestCase):
 
 class ReservationSerializerTest(TestCase):
     """Test ReservationSerializer functionality"""
+    databases = '__all__'
     
     def setUp(self):
         self.user = User.objects.create_user(
@@ -220,7 +225,7 @@ class ReservationSerializerTest(TestCase):
         
         expected_fields = {
             'id', 'date', 'status', 'notes', 'created_at', 'checked_in_at',
-            'user', 'user_name', 'desk', 'desk_identifier', 'area_name'
+            'user', 'user_name', 'desk', 'desk_identifier', 'area_name', 'series'
         }
         self.assertEqual(set(data.keys()), expected_fields)
         
@@ -0,0 +1,249 @@
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from core.models import (
+    Area, Room, Desk, Reservation, ReservationEvent, ReservationSeries, UserPermission, WaitlistEntry,
+)
+from core.routers import AreaShardRouter
+from core.sharding import (
+    ID_SHIFT, all_databases, clear_desk_areas, id_base, seed_id_ranges, shard_for_area, shard_for_id,
+)
+
+User = get_user_model()
+
+TWO_SHARDS = ['shard_0', 'shard_1']
+
+
+class ShardMappingTestCase(TestCase):
+    """Test how areas, ids and rows map to shards"""
+    databases = '__all__'
+
+    def setUp(self):
+        clear_desk_areas()
+        self.user = User.objects.create_user(username='user', employee_id='EMP001')
+
+    def test_everything_in_default_without_shards(self):
+        """Sharding is off by default"""
+        with override_settings(BOOKING_SHARDS=[]):
+            self.assertEqual(all_databases(), ['default'])
+            self.assertEqual(shard_for_area(7), 'default')
+            self.assertEqual(shard_for_id(1), 'default')
+
+    @override_settings(BOOKING_SHARDS=TWO_SHARDS)
+    def test_areas_and_ids_map_to_shards(self):
+        """Areas alternate between shards and an id names the shard it came from"""
+        self.assertEqual([shard_for_area(area_id) for area_id in (1, 2, 3)], ['shard_1', 'shard_0', 'shard_1'])
+        self.assertEqual(id_base('shard_0'), 1 << ID_SHIFT)
+        self.assertEqual(shard_for_id(id_base('shard_1') + 5), 'shard_1')
+        self.assertEqual(shard_for_id(5), 'default')
+        self.assertEqual(shard_for_id('nope'), 'default')
+
+    def test_router_uses_desk_area(self):
+        """New reservations go to their desk's area shard; reference data stays in default"""
+        area = Area.objects.create(name="Level 1 - Left Wing")
+        desk = Desk.objects.create(room=Room.objects.create(area=area, name="Open Office A"), identifier="1.L.01")
+        router = AreaShardRouter()
+        reservation = Reservation(user=self.user, desk=desk, date=date(2026, 11, 4))
+
+        with override_settings(BOOKING_SHARDS=TWO_SHARDS):
+            self.assertEqual(router.db_for_write(Reservation, instance=reservation), shard_for_area(area.id))
+            self.assertEqual(router.db_for_read(Reservation), 'default')
+            self.assertEqual(router.db_for_write(Desk, instance=desk), 'default')
+
+
+@override_settings(BOOKING_SHARDS=TWO_SHARDS, DATABASE_ROUTERS=['core.routers.AreaShardRouter'])
+class ShardedBookingTestCase(TestCase):
+    """Test bookings with two shards"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        clear_desk_areas()
+        for shard in TWO_SHARDS:
+            seed_id_ranges(shard)
+        self.client = APIClient()
+        today = date.today()
+        self.day = today + timedelta(days=9 - today.weekday())  # Wednesday next week
+
+        # One area in each of the first two shards.
+        self.areas = {}
+        number = 0
+        while len(self.areas) < 2:
+            area = Area.objects.create(name=f"Area {number}")
+            self.areas.setdefault(shard_for_area(area.id), area)
+            number += 1
+        self.shards = sorted(self.areas)
+        self.desks = [
+            Desk.objects.create(room=Room.objects.create(area=self.areas[shard], name="Open Office"),
+                                identifier=f"{shard}.01")
+            for shard in self.shards
+        ]
+
+        self.user = User.objects.create_user(username='user', employee_id='EMP001')
+        self.other = User.objects.create_user(username='other', employee_id='EMP002')
+        for user in (self.user, self.other):
+            for area in self.areas.values():
+                UserPermission.objects.create(user=user, area=area)
+
+    def book(self, desk, day, user=None):
+        self.client.force_authenticate(user or self.user)
+        return self.client.post(
+            reverse('reservation-list'),
+            {'user': (user or self.user).id, 'desk': desk.id, 'date': day.isoformat()},
+            format='json',
+        )
+
+    def test_reference_rows_are_replicated(self):
+        """Desks written to default appear in, and disappear from, every shard"""
+        for shard in self.shards:
+            self.assertTrue(Desk.objects.using(shard).filter(pk=self.desks[0].pk).exists())
+        self.desks[0].delete()
+        for shard in self.shards:
+            self.assertFalse(Desk.objects.using(shard).filter(pk=self.desks[0].pk).exists())
+
+    def test_bookings_land_in_area_shard(self):
+        """Bookings are written to their area's shard and read back by id and in lists"""
+        ids = [self.book(desk, self.day).json()['id'] for desk in self.desks[:1]]
+        ids.append(self.book(self.desks[1], self.day + timedelta(days=1)).json()['id'])
+
+        for shard, pk in zip(self.shards, ids):
+            self.assertEqual(shard_for_id(pk), shard)
+            self.assertTrue(Reservation.objects.using(shard).filter(pk=pk).exists())
+        self.assertFalse(Reservation.objects.using('default').exists())
+
+        response = self.client.get(reverse('reservation-detail', args=[ids[0]]))
+        self.assertEqual(response.json()['desk'], self.desks[0].id)
+        listed = [row['id'] for row in self.client.get(reverse('reservation-list')).json()]
+        self.assertEqual(listed, ids[::-1])  # newest date first
+
+    def test_moves_stay_within_shard(self):
+        """Desks and rooms cannot move to an area in another shard"""
+        room = self.desks[0].room
+        other_room = self.desks[1].room
+        desk = self.desks[0]
+        desk.room = other_room
+        with self.assertRaises(ValidationError):
+            desk.save()
+        with self.assertRaises(ValidationError):
+            desk.full_clean()
+        room.area = self.areas[self.shards[1]]
+        with self.assertRaises(ValidationError):
+            room.save()
+
+        # Within a shard, a room moves and its desks follow.
+        same_shard = Area.objects.create(name="Annex 0")
+        while shard_for_area(same_shard.id) != self.shards[0]:
+            same_shard = Area.objects.create(name=f"Annex {same_shard.id}")
+        room.area = same_shard
+        room.save()
+        self.book(Desk.objects.get(pk=desk.pk), self.day)
+        self.assertTrue(Reservation.objects.using(self.shards[0]).filter(desk=desk).exists())
+
+    def test_double_booking_conflicts(self):
+        """The shard's unique (desk, date) constraint rejects a second booking"""
+        self.book(self.desks[0], self.day)
+        response = self.book(self.desks[0], self.day, user=self.other)
+        self.assertEqual(response.status_code, 400)
+
+    def test_release_promotes_waiter_in_shard(self):
+        """Cancelling promotes the desk's waiter within the shard"""
+        pk = self.book(self.desks[1], self.day).json()['id']
+        self.client.force_authenticate(self.other)
+        entry = self.client.post(
+            reverse('waitlistentry-list'), {'desk': self.desks[1].id, 'date': self.day.isoformat()}, format='json'
+        ).json()
+        self.assertEqual(shard_for_id(entry['id']), self.shards[1])
+
+        self.client.force_authenticate(self.user)
+        self.client.patch(reverse('reservation-detail', args=[pk]), {'status': 'cancelled'}, format='json')
+
+        promoted = WaitlistEntry.objects.using(self.shards[1]).get(pk=entry['id'])
+        self.assertEqual(promoted.status, 'promoted')
+        self.assertEqual(promoted.reservation.user, self.other)
+
+    def test_event_log_per_shard(self):
+        """Each shard's log is read with ?shard="""
+        self.book(self.desks[1], self.day)
+        response = self.client.get(reverse('reservation-event-list'), {'shard': self.shards[1]})
+        data = response.json()
+        self.assertEqual(data['shard'], self.shards[1])
+        self.assertEqual([event['event_type'] for event in data['events']], ['created'])
+        self.assertFalse(data['gap'])
+        self.assertFalse(ReservationEvent.objects.using(self.shards[0]).exists())
+
+        response = self.client.get(reverse('reservation-event-list'), {'shard': 'elsewhere'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_series_moves_across_shards(self):
+        """A series lives in its desk's shard; moving it to another shard's desk re-creates it there"""
+        self.client.force_authenticate(self.user)
+        monday = date.today() + timedelta(days=7 - date.today().weekday())
+        response = self.client.post(
+            reverse('reservationseries-list'),
+            {'desk': self.desks[0].id, 'weekdays': ['mon'], 'start_date': monday.isoformat()},
+            format='json',
+        )
+        series_id = response.json()['id']
+        self.assertEqual(shard_for_id(series_id), self.shards[0])
+        self.assertTrue(Reservation.objects.using(self.shards[0]).filter(series_id=series_id).exists())
+        self.assertEqual([row['id'] for row in self.client.get(reverse('reservationseries-list')).json()], [series_id])
+
+        moved = self.client.post(
+            reverse('reservationseries-move', args=[series_id]), {'desk': self.desks[1].id}, format='json'
+        ).json()
+        self.assertEqual(shard_for_id(moved['id']), self.shards[1])
+        self.assertFalse(Reservation.objects.using(self.shards[0]).filter(status='confirmed').exists())
+        self.assertTrue(Reservation.objects.using(self.shards[1]).filter(series_id=moved['id']).exists())
+
+
+@override_settings(BOOKING_SHARDS=[])
+class MigrateShardsTestCase(TestCase):
+    """Test migrate_shards moving bookings made before sharding"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        clear_desk_areas()
+        self.user = User.objects.create_user(username='user', employee_id='EMP001')
+        self.other = User.objects.create_user(username='other', employee_id='EMP002')
+        self.areas = [Area.objects.create(name=f"Area {number}") for number in range(2)]
+        self.desks = [
+            Desk.objects.create(room=Room.objects.create(area=area, name="Open Office"), identifier=f"{area.id}.01")
+            for area in self.areas
+        ]
+        self.day = date(2026, 11, 4)
+
+    def test_bookings_move_to_their_shard(self):
+        """Series, reservations, waitlist entries and events leave default with their links intact"""
+        series = ReservationSeries.objects.create(
+            user=self.user, desk=self.desks[0], weekdays=1, start_date=self.day,
+        )
+        booked = Reservation.objects.create(user=self.user, desk=self.desks[0], date=self.day, series=series)
+        created_at = booked.created_at
+        Reservation.objects.create(user=self.user, desk=self.desks[1], date=self.day)
+        WaitlistEntry.objects.create(
+            user=self.other, area=self.areas[0], desk=self.desks[0], date=self.day, reservation=booked,
+        )
+
+        with override_settings(BOOKING_SHARDS=TWO_SHARDS, DATABASE_ROUTERS=['core.routers.AreaShardRouter']):
+            clear_desk_areas()
+            call_command('migrate_shards', stdout=StringIO())
+            shard = shard_for_area(self.areas[0].id)
+            other_shard = shard_for_area(self.areas[1].id)
+
+            for model in (Reservation, ReservationSeries, WaitlistEntry, ReservationEvent):
+                self.assertFalse(model.objects.using('default').exists())
+            moved = Reservation.objects.using(shard).get(desk=self.desks[0])
+            self.assertEqual(shard_for_id(moved.pk), shard)
+            self.assertEqual(moved.created_at, created_at)
+            self.assertEqual(moved.series, ReservationSeries.objects.using(shard).get())
+            self.assertEqual(WaitlistEntry.objects.using(shard).get().reservation_id, moved.pk)
+            self.assertTrue(ReservationEvent.objects.using(shard).filter(reservation_id=moved.pk).exists())
+            self.assertTrue(Reservation.objects.using(other_shard).filter(desk=self.desks[1]).exists())
@@ -0,0 +1,111 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from core.models import Area, Room, Desk, Reservation
+from core.sharding import shard_for_area
+from .utils import capture_queries
+
+User = get_user_model()
+
+
+class AreaSnapshotTestCase(TestCase):
+    """Test the single-request area workspace snapshot"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.tomorrow = date.today() + timedelta(days=1)
+
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.db = shard_for_area(self.area.id)
+        self.room1 = Room.objects.create(area=self.area, name="Office 1.L.01")
+        self.room2 = Room.objects.create(area=self.area, name="Office 1.L.02")
+        self.desk1 = Desk.objects.create(room=self.room1, identifier="1.L.01")
+        self.desk2 = Desk.objects.create(room=self.room1, identifier="1.L.02", status='permanent')
+        self.desk3 = Desk.objects.create(room=self.room2, identifier="1.L.03")
+
+        self.user = User.objects.create_user(username='jane', first_name='Jane', last_name='Doe')
+        Reservation.objects.create(user=self.user, desk=self.desk1, date=self.tomorrow)
+
+        self.url = reverse('area-snapshot', kwargs={'pk': self.area.pk})
+
+    def test_snapshot_structure(self):
+        """Rooms nest their desks with per-date states"""
+        response = self.client.get(self.url, {'date': self.tomorrow.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual(data['area']['name'], "Level 1 - Left Wing")
+        self.assertEqual(data['area']['desk_count'], 3)
+        self.assertEqual(data['date'], self.tomorrow.isoformat())
+        self.assertEqual([room['name'] for room in data['rooms']], ["Office 1.L.01", "Office 1.L.02"])
+
+        desks = {desk['identifier']: desk for room in data['rooms'] for desk in room['desks']}
+        self.assertEqual(desks['1.L.01']['state'], 'reserved')
+        self.assertEqual(desks['1.L.01']['reservation']['user_name'], 'Jane Doe')
+        self.assertEqual(desks['1.L.02']['state'], 'permanent')
+        self.assertEqual(desks['1.L.03']['state'], 'available')
+        self.assertIsNone(desks['1.L.03']['reservation'])
+
+    def test_other_date_has_no_reservations(self):
+        """Reservation states are for the requested date only"""
+        response = self.client.get(self.url, {'date': (self.tomorrow + timedelta(days=1)).isoformat()})
+        desk = response.json()['rooms'][0]['desks'][0]
+        self.assertEqual(desk['state'], 'available')
+
+    def test_query_count_is_fixed(self):
+        """Snapshot cost doesn't grow with the number of desks"""
+        for i in range(10):
+            desk = Desk.objects.create(room=self.room2, identifier=f"1.L.1{i}")
+            Reservation.objects.create(user=self.user, desk=desk, date=self.tomorrow)
+        cache.clear()
+
+        with capture_queries() as queries:
+            self.client.get(self.url, {'date': self.tomorrow.isoformat()})
+        self.assertEqual(len(queries), 4)
+
+    def test_etag_returns_304_until_area_changes(self):
+        """Version token round-trips as ETag / If-None-Match"""
+        params = {'date': self.tomorrow.isoformat()}
+        response = self.client.get(self.url, params)
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{response.json()["version"]}"')
+
+        with capture_queries() as queries:
+            response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(queries, [])
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(using=self.db, execute=True):
+            Reservation.objects.create(user=self.user, desk=self.desk3, date=self.tomorrow)
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_none_match_lists_and_unknown_areas(self):
+        """If-None-Match is parsed as a list of tags; a missing area is a 404 whatever the tag"""
+        params = {'date': self.tomorrow.isoformat()}
+        etag = self.client.get(self.url, params)['ETag']
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag[:-1] + '0"')
+        self.assertEqual(response.status_code, 200)
+
+        url = reverse('area-snapshot', kwargs={'pk': 9999})
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=f'"9999.1.{self.tomorrow.isoformat()}"')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+    def test_invalid_date(self):
+        """Malformed date is rejected"""
+        response = self.client.get(self.url, {'date': 'tomorrow'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_area(self):
+        """Missing area returns 404"""
+        response = self.client.get(reverse('area-snapshot', kwargs={'pk': 9999}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,119 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from core.models import Area, Room, Desk, Reservation, UserPermission
+from core.sharding import all_databases, shard_for_area
+from booking_api.serializers import ReservationSerializer, DeskSerializer
+from .utils import capture_queries
+
+User = get_user_model()
+
+
+class SparseFieldsetTestCase(TestCase):
+    """Test ?fields= and ?expand= on API endpoints"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.db = shard_for_area(self.area.id)
+        self.room = Room.objects.create(area=self.area, name="Office 1.L.01")
+        self.desk1 = Desk.objects.create(room=self.room, identifier="1.L.01")
+        self.desk2 = Desk.objects.create(room=self.room, identifier="1.L.02")
+        self.user = User.objects.create_user(username='jane', first_name='Jane', last_name='Doe')
+        UserPermission.objects.create(user=self.user, area=self.area)
+
+        tomorrow = date.today() + timedelta(days=1)
+        for desk in (self.desk1, self.desk2):
+            Reservation.objects.create(user=self.user, desk=desk, date=tomorrow)
+
+    def get_with_queries(self, url, params):
+        with capture_queries() as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), queries
+
+    def list_queries(self):
+        """Queries of a reservation list: one, or two per shard (rows and merge keys)."""
+        databases = all_databases()
+        return 1 if len(databases) == 1 else 2 * len(databases)
+
+    def test_desk_fields_skip_joins(self):
+        """Mobile desk list only selects desk columns"""
+        data, queries = self.get_with_queries(reverse('desk-list'), {'fields': 'id,identifier,status'})
+
+        self.assertEqual(data[0], {'id': self.desk1.id, 'identifier': '1.L.01', 'status': 'available'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('core_room', queries[0])
+        self.assertNotIn('created_at', queries[0])
+
+    def test_area_desks_respect_fields(self):
+        """Custom actions honour ?fields= too"""
+        url = reverse('area-desks', kwargs={'pk': self.area.pk})
+        data, _ = self.get_with_queries(url, {'fields': 'identifier'})
+        self.assertEqual(data, [{'identifier': '1.L.01'}, {'identifier': '1.L.02'}])
+
+    def test_reservation_fields_skip_user_join(self):
+        """Without user_name the user table isn't joined"""
+        data, queries = self.get_with_queries(reverse('reservation-list'), {'fields': 'id,status,desk_identifier'})
+
+        self.assertEqual(set(data[0]), {'id', 'status', 'desk_identifier'})
+        self.assertEqual(len(queries), self.list_queries())
+        for query in queries:
+            self.assertNotIn('core_user', query)
+            self.assertNotIn('core_area', query)
+
+    def test_reservation_expand_desk(self):
+        """?expand=desk nests the desk with a bounded number of queries"""
+        data, queries = self.get_with_queries(
+            reverse('reservation-list'), {'expand': 'desk', 'fields': 'id,desk'}
+        )
+
+        self.assertEqual({r['desk']['identifier'] for r in data}, {'1.L.01', '1.L.02'})
+        self.assertEqual(data[0]['desk']['area_name'], 'Level 1 - Left Wing')
+        self.assertEqual(len(queries), self.list_queries())
+
+    def test_reservation_retrieve_with_fields(self):
+        """Detail endpoint narrows the row it loads"""
+        reservation = Reservation.objects.using(self.db).filter(desk=self.desk1).get()
+        url = reverse('reservation-detail', kwargs={'pk': reservation.pk})
+        data, queries = self.get_with_queries(url, {'fields': 'id,user_name'})
+
+        self.assertEqual(data, {'id': reservation.id, 'user_name': 'Jane Doe'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('core_desk', queries[0])
+
+    def test_user_permissions_are_prefetched(self):
+        """area_permissions doesn't query per user"""
+        User.objects.create_user(username='john')
+        data, queries = self.get_with_queries(reverse('user-list'), {'fields': 'id,area_permissions'})
+
+        self.assertEqual(set(data[0]), {'id', 'area_permissions'})
+        self.assertEqual(len(queries), 3)  # users, permissions, areas
+
+    def test_default_response_unchanged(self):
+        """No options returns every field"""
+        data, _ = self.get_with_queries(reverse('desk-list'), {})
+        self.assertEqual(len(data[0]), len(DeskSerializer().fields))
+
+    def test_query_plan(self):
+        """Plan only joins what requested fields traverse"""
+        columns, select_related, prefetch = ReservationSerializer.get_query_plan(['id', 'user_name'])
+        self.assertEqual(select_related, {'user'})
+        self.assertEqual(columns, {'id', 'user', 'user__first_name', 'user__last_name'})
+        self.assertEqual(prefetch, set())
+
+    def test_writes_ignore_fields_param(self):
+        """POST validates the full serializer regardless of ?fields="""
+        url = reverse('reservation-list') + '?fields=id'
+        response = self.client.post(url, {
+            'user': self.user.id, 'desk': self.desk1.id,
+            'date': (date.today() + timedelta(days=5)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['desk_identifier'], '1.L.01')
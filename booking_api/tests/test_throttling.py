@@ -0,0 +1,104 @@
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from core.models import Area
+from booking_api.throttling import TokenBucketThrottle, parse_rate
+
+User = get_user_model()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(BOOKING_THROTTLE_RATES={'read': '3/min', 'booking': '2/min'})
+class TokenBucketThrottleTestCase(TestCase):
+    """Test token-bucket throttling of reads and booking writes"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock()
+        self._timer = TokenBucketThrottle.timer
+        TokenBucketThrottle.timer = self.clock
+        self.client = APIClient()
+        Area.objects.create(name="Level 1 - Left Wing")
+
+    def tearDown(self):
+        TokenBucketThrottle.timer = self._timer
+
+    def read(self, client=None):
+        return (client or self.client).get(reverse('area-list'))
+
+    def test_parse_rate(self):
+        """Rates give capacity and per-second refill"""
+        self.assertEqual(parse_rate('30/min'), (30, 0.5))
+
+    def test_burst_then_retry_after(self):
+        """Capacity is exhausted, then 429 with Retry-After"""
+        for _ in range(3):
+            self.assertEqual(self.read().status_code, 200)
+        response = self.read()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+
+    def test_tokens_refill_over_time(self):
+        """One token comes back per refill interval, without exceeding capacity"""
+        for _ in range(3):
+            self.read()
+        self.clock.now += 20
+        self.assertEqual(self.read().status_code, 200)
+        self.assertEqual(self.read().status_code, 429)
+
+        self.clock.now += 3600
+        for _ in range(3):
+            self.assertEqual(self.read().status_code, 200)
+        self.assertEqual(self.read().status_code, 429)
+
+    def test_expired_origin_is_a_full_bucket(self):
+        """A count left over from an expired bucket isn't charged to the next one"""
+        for _ in range(3):
+            self.read()
+        cache.delete('booking_api:throttle:read:ip:127.0.0.1:origin')
+        for _ in range(3):
+            self.assertEqual(self.read().status_code, 200)
+        self.assertEqual(self.read().status_code, 429)
+
+        cache.delete('booking_api:throttle:read:ip:127.0.0.1:taken')
+        self.assertEqual(self.read().status_code, 200)
+
+    def test_denied_requests_do_not_consume(self):
+        """Hammering while throttled doesn't push the wait further out"""
+        for _ in range(10):
+            self.read()
+        self.clock.now += 20
+        self.assertEqual(self.read().status_code, 200)
+
+    def test_reads_and_writes_have_separate_buckets(self):
+        """Exhausting reads leaves booking writes available"""
+        for _ in range(4):
+            self.read()
+        url = reverse('reservation-quick-book')
+        self.assertNotEqual(self.client.post(url, {}, format='json').status_code, 429)
+        self.assertNotEqual(self.client.post(url, {}, format='json').status_code, 429)
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, 429)
+
+    def test_users_have_separate_buckets(self):
+        """Authenticated users are throttled per user, not per IP"""
+        for _ in range(4):
+            self.read()
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='jane'))
+        self.assertEqual(self.read(other).status_code, 200)
+
+    @override_settings(BOOKING_THROTTLE_RATES={})
+    def test_unconfigured_scope_is_unlimited(self):
+        """No rate means no throttling"""
+        for _ in range(10):
+            self.assertEqual(self.read().status_code, 200)
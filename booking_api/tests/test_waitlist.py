@@ -0,0 +1,184 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime import date, timedelta
+from core.booking_rules import ACTIVE_STATUSES
+from core.models import Area, Room, Desk, Reservation, UserPermission, WaitlistEntry
+from core.sharding import shard_for_area
+from core.waitlist import promote_next, waitlist_promoted
+
+User = get_user_model()
+
+
+class WaitlistTestCase(TestCase):
+    """Test waitlist promotion when desks are released"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        today = date.today()
+        self.day = today + timedelta(days=9 - today.weekday())  # Wednesday next week
+
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.room = Room.objects.create(area=self.area, name="Open Office A")
+        self.desk = Desk.objects.create(room=self.room, identifier="1.L.01")
+        self.db = shard_for_area(self.area.id)
+
+        self.owner = User.objects.create_user(username='owner', employee_id='EMP001')
+        self.first = User.objects.create_user(username='first', employee_id='EMP002')
+        self.second = User.objects.create_user(username='second', employee_id='EMP003')
+        for user in (self.owner, self.first, self.second):
+            UserPermission.objects.create(user=user, area=self.area)
+
+        self.booking = Reservation.objects.create(user=self.owner, desk=self.desk, date=self.day)
+
+    def wait(self, user, desk=None):
+        return WaitlistEntry.objects.create(user=user, area=self.area, desk=desk, date=self.day)
+
+    def active(self):
+        return Reservation.objects.using(self.db).get(desk=self.desk, date=self.day, status__in=ACTIVE_STATUSES)
+
+    def holder(self):
+        return self.active().user
+
+    def test_cancellation_promotes_first_waiter(self):
+        """The oldest waiter gets the desk as a confirmed reservation"""
+        first = self.wait(self.first, self.desk)
+        self.wait(self.second, self.desk)
+
+        self.booking.status = 'cancelled'
+        self.booking.save()
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'promoted')
+        self.assertIsNotNone(first.promoted_at)
+        self.assertEqual(first.reservation.user, self.first)
+        self.assertEqual(first.reservation.status, 'confirmed')
+        self.assertEqual(self.holder(), self.first)
+        self.assertEqual(WaitlistEntry.objects.using(self.db).filter(status='waiting').count(), 1)
+
+    def test_promotion_keeps_released_booking_and_notifies(self):
+        """The cancelled row stays on record; waitlist_promoted fires after commit"""
+        first = self.wait(self.first, self.desk)
+        promoted = []
+
+        def receiver(sender, entry, **kwargs):
+            promoted.append(entry.pk)
+
+        waitlist_promoted.connect(receiver)
+        self.addCleanup(waitlist_promoted.disconnect, receiver)
+
+        with self.captureOnCommitCallbacks(using=self.db) as callbacks:
+            self.booking.status = 'cancelled'
+            self.booking.save()
+        self.assertEqual(promoted, [])
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(promoted, [first.pk])
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'cancelled')
+        self.assertEqual(self.holder(), self.first)
+
+    def test_no_show_and_delete_promote(self):
+        """Marking a no-show or deleting the booking also releases the desk"""
+        self.wait(self.first)
+        self.wait(self.second)
+
+        self.booking.status = 'no_show'
+        self.booking.save()
+        self.assertEqual(self.holder(), self.first)
+
+        self.active().delete()
+        self.assertEqual(self.holder(), self.second)
+
+    def test_desk_and_area_queues_merge_by_join_time(self):
+        """An earlier area-wide waiter beats a later desk-specific waiter"""
+        self.wait(self.first)
+        self.wait(self.second, self.desk)
+        Reservation.objects.using(self.db).filter(pk=self.booking.pk).update(status='cancelled')
+        promote_next(self.desk.id, self.day)
+        self.assertEqual(self.holder(), self.first)
+
+    def test_active_booking_is_never_replaced(self):
+        """Promotion does nothing while the desk is still booked"""
+        self.wait(self.first)
+        self.assertIsNone(promote_next(self.desk.id, self.day))
+        self.assertEqual(self.holder(), self.owner)
+
+    def test_ineligible_waiters_are_skipped(self):
+        """Waiters without permission or over quota stay in the queue"""
+        UserPermission.objects.filter(user=self.first).delete()
+        other_desk = Desk.objects.create(room=self.room, identifier="1.L.02")
+        monday = self.day - timedelta(days=2)
+        for offset in (0, 1, 3):
+            Reservation.objects.create(user=self.second, desk=other_desk, date=monday + timedelta(days=offset))
+        third = User.objects.create_user(username='third', employee_id='EMP004')
+        UserPermission.objects.create(user=third, area=self.area)
+
+        blocked = [self.wait(self.first), self.wait(self.second), self.wait(third)]
+
+        self.booking.status = 'cancelled'
+        self.booking.save()
+
+        self.assertEqual(self.holder(), third)
+        for entry in blocked[:2]:
+            entry.refresh_from_db()
+            self.assertEqual(entry.status, 'waiting')
+
+    def test_release_without_eligible_waiter_keeps_row(self):
+        """With nobody to promote the cancelled reservation is left as is"""
+        self.booking.status = 'cancelled'
+        self.booking.save()
+        self.assertTrue(Reservation.objects.using(self.db).filter(pk=self.booking.pk, status='cancelled').exists())
+
+    def test_api_cancel_promotes_and_waiter_sees_promotion(self):
+        """Cancelling through the API promotes; ?status=promoted reports it"""
+        self.client.force_authenticate(self.first)
+        response = self.client.post(reverse('waitlistentry-list'), {'desk': self.desk.id, 'date': self.day.isoformat()})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'waiting')
+        self.assertEqual(response.json()['area'], self.area.id)
+
+        self.client.force_authenticate(self.owner)
+        response = self.client.patch(
+            reverse('reservation-detail', kwargs={'pk': self.booking.pk}), {'status': 'cancelled'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_authenticate(self.first)
+        response = self.client.get(reverse('waitlistentry-list'), {'status': 'promoted'})
+        entries = response.json()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['reservation'], Reservation.objects.using(self.db).get(user=self.first).id)
+
+    def test_api_join_books_free_desk(self):
+        """Joining when a desk in the area is free books it straight away"""
+        free_desk = Desk.objects.create(room=self.room, identifier="1.L.02")
+        self.client.force_authenticate(self.first)
+        response = self.client.post(reverse('waitlistentry-list'), {'area': self.area.id, 'date': self.day.isoformat()})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'promoted')
+        self.assertEqual(Reservation.objects.using(self.db).get(user=self.first).desk, free_desk)
+
+    def test_api_rejects_duplicate_and_missing_target(self):
+        """A user waits once per target; desk or area is required"""
+        self.client.force_authenticate(self.first)
+        url = reverse('waitlistentry-list')
+        payload = {'desk': self.desk.id, 'date': self.day.isoformat()}
+        self.assertEqual(self.client.post(url, payload).status_code, 201)
+        self.assertEqual(self.client.post(url, payload).status_code, 409)
+        self.assertEqual(self.client.post(url, {'date': self.day.isoformat()}).status_code, 400)
+        yesterday = date.today() - timedelta(days=1)
+        self.assertEqual(self.client.post(url, {'desk': self.desk.id, 'date': yesterday.isoformat()}).status_code, 400)
+
+    def test_api_join_requires_area_permission(self):
+        """Users can't wait for desks in areas they may not book"""
+        outsider = User.objects.create_user(username='outsider', employee_id='EMP004')
+        self.client.force_authenticate(outsider)
+        response = self.client.post(reverse('waitlistentry-list'), {'desk': self.desk.id, 'date': self.day.isoformat()})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(WaitlistEntry.objects.using(self.db).filter(user=outsider).exists())
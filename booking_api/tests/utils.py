@@ -0,0 +1,20 @@
+from contextlib import ExitStack, contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from core.sharding import shard_aliases
+
+
+@contextmanager
+def capture_queries():
+    """CaptureQueriesContext over the default database and every shard; the list fills on exit."""
+    queries = []
+    with ExitStack() as stack:
+        contexts = [
+            stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in [DEFAULT_DB_ALIAS, *shard_aliases()]
+        ]
+        yield queries
+    for context in contexts:
+        queries.extend(query['sql'] for query in context.captured_queries)
@@ -0,0 +1,126 @@
+"""
+Token-bucket throttles for the API, shared across workers via the cache.
+
+Each (scope, user or client IP) pair owns a bucket holding up to `capacity`
+tokens that refill continuously at `capacity / period`. Rates are read from
+settings.BOOKING_THROTTLE_RATES at request time, in DRF's 'N/period' form
+(e.g. '30/min'); a missing or None rate disables that scope.
+
+The bucket is kept as two cache keys: the time it was created and a running
+count of tokens taken. Tokens accrued since creation minus tokens taken is
+the fill level, so a request needs one read and one atomic incr() and never
+a read-modify-write of shared state. When a bucket has been idle long
+enough to overflow, the taken count is advanced to cap it at `capacity`.
+A missing key means a full bucket: the request that recreates the origin
+also resets the count, so a count never outlives its origin, and a missing
+count is restarted at the tokens accrued.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from .cache import KEY_PREFIX
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'30/min' -> (capacity, tokens per second)."""
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base class; subclasses set `scope` and choose which requests apply."""
+    scope = None
+    timer = time.time
+
+    def applies_to(self, request, view):
+        return True
+
+    def get_rate(self):
+        return getattr(settings, 'BOOKING_THROTTLE_RATES', {}).get(self.scope)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'{KEY_PREFIX}:throttle:{self.scope}:{ident}'
+
+    def allow_request(self, request, view):
+        self._wait = None
+        rate = self.get_rate()
+        if rate is None or not self.applies_to(request, view):
+            return True
+
+        capacity, refill = parse_rate(rate)
+        key = self.get_cache_key(request, view)
+        origin_key, taken_key = f'{key}:origin', f'{key}:taken'
+        # Keys outlive any useful state; an expired bucket is simply full.
+        timeout = max(60 * 60, int(10 * capacity / refill))
+
+        now = self.timer()
+        origin = cache.get(origin_key)
+        if origin is None:
+            # The keys expire apart (incr() doesn't extend them): a count left
+            # from the expired origin would be charged against the new one.
+            if cache.add(origin_key, now, timeout):
+                cache.set(taken_key, 0, timeout)
+            origin = cache.get(origin_key, now)
+
+        accrued = int((now - origin) * refill)
+        try:
+            taken = cache.incr(taken_key)
+        except ValueError:
+            # Evicted count: the overflow below tops the bucket up to full.
+            cache.add(taken_key, 0, timeout)
+            taken = cache.incr(taken_key)
+
+        # Idle bucket: tokens beyond capacity are lost, i.e. the count taken
+        # before this request is at least the count accrued.
+        overflow = accrued - (taken - 1)
+        if overflow > 0:
+            taken = cache.incr(taken_key, overflow)
+
+        if taken <= accrued + capacity:
+            return True
+
+        # Denied requests don't consume a token.
+        cache.decr(taken_key)
+        self._wait = (taken - accrued - capacity) / refill
+        return False
+
+    def wait(self):
+        return self._wait and math.ceil(self._wait)
+
+
+class ReadRateThrottle(TokenBucketThrottle):
+    """Bucket shared by all read (GET/HEAD/OPTIONS) requests of a client."""
+    scope = 'read'
+
+    def applies_to(self, request, view):
+        return request.method in SAFE_METHODS
+
+
+class BookingRateThrottle(TokenBucketThrottle):
+    """Bucket shared by all booking writes of a client."""
+    scope = 'booking'
+
+    def applies_to(self, request, view):
+        return request.method not in SAFE_METHODS
+
+
+class CalendarFeedThrottle(TokenBucketThrottle):
+    """One bucket per calendar feed; pollers share IPs, so keying by IP won't do."""
+    scope = 'calendar'
+
+    def get_cache_key(self, request, view):
+        token = hashlib.sha256(view.kwargs.get('token', '').encode('utf-8')).hexdigest()
+        return f'{KEY_PREFIX}:throttle:{self.scope}:{token}'
@@ -2,7 +2,9 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     UserViewSet, AreaViewSet, RoomViewSet, 
-    DeskViewSet, ReservationViewSet
+    DeskViewSet, ReservationViewSet, ReservationSeriesViewSet, RoomReservationViewSet, WaitlistViewSet,
+    ReservationEventViewSet, PopularityViewSet, PermissionViewSet, SearchViewSet, CalendarViewSet,
+    CalendarFeedView
 )
 
 # Router configuration for all API endpoints:
@@ -11,10 +13,27 @@ from .views import (
 # - /api/areas/{id}/ - get specific area
 # - /api/areas/{id}/rooms/ - list rooms in area
 # - /api/areas/{id}/desks/ - list desks in area
+# - /api/areas/{id}/snapshot/?date= - area, rooms, desks and reservation states
+# - /api/areas/{id}/changes/?date=&since= - desk states changed since a version
+# - /api/areas/{id}/availability-matrix/?from=&days= - desk x day bitsets per state
+# - /api/areas/{id}/room-slots/?date= - bookable rooms with their booked and free time slots
 # - /api/rooms/ - list all rooms
 # - /api/rooms/{id}/desks/ - list desks in room
 # - /api/desks/ - list all desks
+# - /api/desks/recommend/?date=&area= - ranked desks for the user (POST books top pick)
 # - /api/reservations/ - list all reservations
+# - /api/reservation-series/ - the user's recurring desk bookings; {id}/cancel/ and {id}/move/
+# - /api/room-reservations/ - the user's meeting-room bookings (start/end times)
+# - /api/waitlist/ - join/leave desk or area waitlists; ?status=promoted for promotions
+# - /api/reservation-events/?after=&limit= - reservation change log after a sequence
+# - /api/popularity/?from=&to=&limit= - most booked desks and areas
+# - /api/permissions/grant|revoke|replace/ - bulk area permissions (admins)
+# - /api/search/?q=&types=&limit= - fuzzy search over desks, rooms, areas and users
+# - /api/calendar/ - the user's calendar subscription URL
+# - /api/calendar/<token>.ics - iCalendar feed of the user's bookings
+#
+# Read endpoints accept ?fields=a,b (sparse fieldsets) and ?expand=<fk>
+# (nest the related object instead of its id).
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
@@ -22,7 +41,16 @@ router.register(r'areas', AreaViewSet)
 router.register(r'rooms', RoomViewSet)
 router.register(r'desks', DeskViewSet)
 router.register(r'reservations', ReservationViewSet)
+router.register(r'reservation-series', ReservationSeriesViewSet)
+router.register(r'room-reservations', RoomReservationViewSet)
+router.register(r'waitlist', WaitlistViewSet)
+router.register(r'reservation-events', ReservationEventViewSet, basename='reservation-event')
+router.register(r'popularity', PopularityViewSet, basename='popularity')
+router.register(r'permissions', PermissionViewSet, basename='permission')
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'calendar', CalendarViewSet, basename='calendar')
 
 urlpatterns = [
+    path('calendar/<str:token>.ics', CalendarFeedView.as_view(), name='calendar-feed'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,70 +1,440 @@
-from rest_framework import viewsets, status
+import functools
+import heapq
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from core.models import Area, Room, Desk, Reservation, UserPermission
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from core import group_commit
+from core.booking_rules import ACTIVE_STATUSES, exceeds_quota, has_area_permission
+from core.models import Area, Room, Desk, Reservation, ReservationSeries, RoomReservation, WaitlistEntry
+from core.changes import get_change_version
+from core.permissions import bulk_grant, bulk_replace, bulk_revoke, permitted_area_ids
+from core.events import MAX_BATCH_SIZE, read_events
+from core.popularity import popularity_report
+from core.room_bookings import area_room_slots, book_room
+from core.search import KINDS as SEARCH_KINDS, MIN_QUERY_LENGTH, normalize, search
+from core.series import cancel_series, claim_on, create_series, move_series, pending_claims
+from core.sharding import all_databases, id_base, shard_aliases, shard_for_area, shard_for_desk, shard_for_id
+from core.waitlist import promote_next
 from .serializers import (
     UserSerializer, AreaSerializer, RoomSerializer, 
-    DeskSerializer, ReservationSerializer
+    DeskSerializer, ReservationSerializer, RoomReservationSerializer, WaitlistEntrySerializer,
+    ReservationSeriesSerializer, BulkPermissionSerializer, parse_list_param
 )
+from .cache import KEY_PREFIX, CachedResponseMixin, cache_response, get_area_version
+from .fast_serializers import desk_values_serializer, reservation_values_serializer
+from .snapshots import build_area_delta, build_area_snapshot
+from .recommendations import recommend_desks
+from .availability import MAX_MATRIX_DAYS, build_availability_matrix
+from .idempotency import IdempotencyMixin, idempotent
+from .calendar import get_cached_feed, get_feed_version, make_token, read_token, stream_feed
+from .throttling import CalendarFeedThrottle
 
 User = get_user_model()
 
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+def parse_date_param(value, default=None):
+    """Parse a YYYY-MM-DD parameter. Returns default when missing, None when invalid."""
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def get_booking_user(request):
+    """The user a booking request acts for."""
+    if request.user.is_authenticated:
+        return request.user
+    # TODO: require authentication; until then act as the first user
+    return User.objects.first()
+
+
+class SparseFieldsetMixin:
+    """Narrows list/retrieve querysets to what ?fields= and ?expand= need."""
+
+    def get_field_options(self):
+        params = self.request.query_params
+        return parse_list_param(params.get('fields')), parse_list_param(params.get('expand'))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = self.get_serializer_class().optimize_queryset(
+                queryset, *self.get_field_options()
+            )
+        return queryset
+
+    def fast_list_response(self, queryset, serializer_class, values_serializer):
+        """Serve a list via the values() fast path unless expansion is requested."""
+        fields, expand = self.get_field_options()
+        if expand:
+            queryset = serializer_class.optimize_queryset(queryset, fields, expand)
+            serializer = serializer_class(queryset, many=True, context=self.get_serializer_context())
+            return Response(serializer.data)
+        return Response(values_serializer.serialize(queryset, fields))
+
+
+class ShardedQuerysetMixin:
+    """
+    For sharded models: detail routes read the shard the id belongs to and
+    lists read every shard (see core/sharding.py).
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        pk = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return queryset if pk is None else queryset.using(shard_for_id(pk))
+
+    def list_across_shards(self, queryset, render):
+        """
+        render(queryset) for each shard's part of queryset, merged in the
+        queryset's ordering (whose fields must all sort the same direction).
+        """
+        databases = all_databases()
+        if len(databases) == 1:
+            return render(queryset.using(databases[0]))
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        keys = [name.lstrip('-') for name in ordering]
+        parts = [
+            zip(part.values_list(*keys), render(part))
+            for part in (queryset.using(db) for db in databases)
+        ]
+        merged = heapq.merge(*parts, key=itemgetter(0), reverse=ordering[0].startswith('-'))
+        return [item for _, item in merged]
+
+
+class UserViewSet(SparseFieldsetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Read-only user profiles. Shows current user's permissions and bookings."""
     queryset = User.objects.filter(is_active=True)
     serializer_class = UserSerializer
 
+    @cache_response()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response()
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-class AreaViewSet(viewsets.ReadOnlyModelViewSet):
+
+class AreaViewSet(SparseFieldsetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Provides list() and retrieve() for areas. Read-only access."""
     queryset = Area.objects.all()
     serializer_class = AreaSerializer
+
+    @cache_response()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(area_scoped=True)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     @action(detail=True, methods=['get'])
+    @cache_response(area_scoped=True)
     def rooms(self, request, pk=None):
         """Custom endpoint to list all rooms for a specific area."""
         area = self.get_object()
-        rooms = Room.objects.filter(area=area)
-        serializer = RoomSerializer(rooms, many=True)
+        rooms = RoomSerializer.optimize_queryset(
+            Room.objects.filter(area=area), *self.get_field_options()
+        )
+        serializer = RoomSerializer(rooms, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
+    @cache_response(area_scoped=True)
     def desks(self, request, pk=None):
         """Updated area desks endpoint to work with Area->Room->Desk hierarchy."""
         area = self.get_object()
         desks = Desk.objects.filter(room__area=area)
-        serializer = DeskSerializer(desks, many=True)
-        return Response(serializer.data)
+        return self.fast_list_response(desks, DeskSerializer, desk_values_serializer)
+
+    @action(detail=True, methods=['get'])
+    def snapshot(self, request, pk=None):
+        """
+        Area, rooms, desks and reservation states for ?date= (default today)
+        in one payload. The ETag is the area's cache version; sending it back
+        in If-None-Match returns 304, usually without touching the database.
+        Unknown areas are a 404 either way.
+        """
+        day = parse_date_param(request.query_params.get('date'), default=date.today())
+        if day is None:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        version = f'{pk}.{get_area_version(pk)}.{day.isoformat()}'
+        etag = f'"{version}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self._snapshot_response(request, pk=pk, day=day, version=version)
+        elif not self._area_exists(pk):
+            raise Http404
+        response['ETag'] = etag
+        return response
+
+    def _area_exists_key(self, pk):
+        # Creating or deleting the area bumps its version.
+        return f'{KEY_PREFIX}:area-exists:{pk}:{get_area_version(pk)}'
+
+    def _remember_area(self, pk, exists):
+        cache.set(self._area_exists_key(pk), exists, timeout=getattr(settings, 'BOOKING_RESPONSE_CACHE_TIMEOUT', 300))
+
+    def _area_exists(self, pk):
+        """Whether area pk exists, from the cache while the area's version stands."""
+        if not str(pk).isdigit():
+            return False
+        exists = cache.get(self._area_exists_key(pk))
+        if exists is None:
+            exists = self.get_queryset().filter(pk=pk).exists()
+            self._remember_area(pk, exists)
+        return exists
+
+    @action(detail=True, methods=['get'])
+    def changes(self, request, pk=None):
+        """
+        Desk states for ?date= (default today) that changed after ?since=<version>.
+
+        Returns {'full': false, 'version', 'desks': [...]} with only the changed
+        desks, or a full snapshot ({'full': true, ...}) when since is missing or
+        older than the area's change floor. Send `version` back as since.
+        """
+        day = parse_date_param(request.query_params.get('date'), default=date.today())
+        if day is None:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            since = int(request.query_params['since'])
+        except (KeyError, ValueError):
+            since = None
 
+        version, floor = get_change_version(pk) if str(pk).isdigit() else (0, 0)
+        if since is not None and version and floor <= since <= version:
+            desks = build_area_delta(pk, day, since, version) if since < version else []
+            return Response({
+                'area': int(pk), 'date': day.isoformat(), 'version': version, 'full': False, 'desks': desks,
+            })
+
+        payload = build_area_snapshot(self.get_object(), day)
+        payload.update(version=version, full=True)
+        return Response(payload)
+
+    @action(detail=True, methods=['get'], url_path='availability-matrix')
+    @cache_response(area_scoped=True)
+    def availability_matrix(self, request, pk=None):
+        """
+        Desk x day availability from ?from= (default today) for ?days= days
+        (default 21, the booking window), as base64 bitsets per state plus
+        per-day free desk counts.
+        """
+        start = parse_date_param(request.query_params.get('from'), default=date.today())
+        if start is None:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            days = int(request.query_params.get('days', 21))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= MAX_MATRIX_DAYS:
+            return Response(
+                {'error': f'days must be between 1 and {MAX_MATRIX_DAYS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        area = self.get_object()
+        return Response(build_availability_matrix(area, start, days))
 
-class RoomViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=True, methods=['get'], url_path='room-slots')
+    @cache_response(area_scoped=True)
+    def room_slots(self, request, pk=None):
+        """Bookable rooms of the area with their bookings and free time slots on ?date= (default today)."""
+        day = parse_date_param(request.query_params.get('date'), default=date.today())
+        if day is None:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(area_room_slots(self.get_object(), day))
+
+    @cache_response(area_scoped=True)
+    def _snapshot_response(self, request, pk=None, day=None, version=None):
+        area = self.get_object()
+        self._remember_area(pk, True)
+        payload = build_area_snapshot(area, day)
+        payload['version'] = version
+        return Response(payload)
+
+
+class RoomViewSet(SparseFieldsetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Read-only access to rooms, filtered by user's area permissions."""
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
+
+    @cache_response()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response()
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     @action(detail=True, methods=['get'])
+    @cache_response()
     def desks(self, request, pk=None):
         """List all desks in a specific room."""
         room = self.get_object()
         desks = room.desks.all()
-        serializer = DeskSerializer(desks, many=True)
-        return Response(serializer.data)
+        return self.fast_list_response(desks, DeskSerializer, desk_values_serializer)
 
 
-class DeskViewSet(viewsets.ReadOnlyModelViewSet):
+class DeskViewSet(SparseFieldsetMixin, CachedResponseMixin, IdempotencyMixin, viewsets.ReadOnlyModelViewSet):
     """Read-only access to desks."""
     queryset = Desk.objects.all()
     serializer_class = DeskSerializer
 
+    @cache_response()
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.fast_list_response(queryset, DeskSerializer, desk_values_serializer)
+
+    @cache_response()
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get', 'post'])
+    @idempotent
+    def recommend(self, request):
+        """
+        Rank bookable desks for the user on ?date= (default today), optionally
+        within ?area=. GET returns the ranking (?limit=, default 5); POST books
+        the top pick in one click, falling through to the next pick if it was
+        taken in the meantime.
+        """
+        params = request.query_params if request.method == 'GET' else request.data
+        day = parse_date_param(params.get('date'), default=date.today())
+        if day is None:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            area_id = int(params['area']) if params.get('area') else None
+            limit = min(int(params.get('limit', 5)), 50)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'area and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        user = get_booking_user(request)
+        if not user:
+            return Response(
+                {'error': 'No users found in system'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
 
-class ReservationViewSet(viewsets.ModelViewSet):
-    """Reservations CRUD. Allows creating quick bookings."""
+        recommendations = recommend_desks(user, day, area_id=area_id, limit=limit, today=date.today())
+        if request.method == 'GET':
+            return Response(recommendations)
+
+        for pick in recommendations:
+            try:
+                with transaction.atomic(using=shard_for_desk(pick['desk'])):
+                    # Past the weekly quota the booking awaits approval, as
+                    # recurring ones do; counted in the booking's transaction,
+                    # as waitlist promotion does.
+                    booking_status = 'pending_approval' if exceeds_quota(user.id, day) else 'confirmed'
+                    reservation = Reservation.objects.create(
+                        user=user, desk_id=pick['desk'], date=day, status=booking_status
+                    )
+            except IntegrityError:
+                continue
+            serializer = ReservationSerializer(reservation, context=self.get_serializer_context())
+            return Response({
+                'success': True,
+                'message': f"Desk {pick['identifier']} booked successfully for {day.isoformat()}",
+                'reservation': serializer.data,
+                'recommendation': pick,
+            }, status=status.HTTP_201_CREATED)
+
+        return Response(
+            {'error': f'No bookable desk available for {day.isoformat()}'},
+            status=status.HTTP_409_CONFLICT
+        )
+
+
+class ReservationViewSet(ShardedQuerysetMixin, SparseFieldsetMixin, IdempotencyMixin, viewsets.ModelViewSet):
+    """
+    Reservations CRUD. Allows creating quick bookings.
+
+    All writes accept an Idempotency-Key header so client retries are safe.
+    """
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
+
+    def list(self, request, *args, **kwargs):
+        """List via the values() fast path instead of ModelSerializer."""
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.list_across_shards(
+            queryset,
+            lambda part: self.fast_list_response(part, ReservationSerializer, reservation_values_serializer).data,
+        ))
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @idempotent
+    def update(self, request, *args, **kwargs):
+        # Also covers PATCH: partial_update() delegates here.
+        return super().update(request, *args, **kwargs)
+
+    # With sharding the serializer's unique (desk, date) check reads the
+    # default database only; the shard's constraint has the final say.
+    def perform_create(self, serializer):
+        try:
+            serializer.save()
+        except IntegrityError:
+            raise ValidationError({'non_field_errors': ['The fields desk, date must make a unique set.']})
+
+    def perform_update(self, serializer):
+        # Cancelling promotes the next waiter; both commit together.
+        try:
+            with transaction.atomic(using=serializer.instance._state.db):
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'non_field_errors': ['The fields desk, date must make a unique set.']})
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(using=instance._state.db):
+            instance.delete()
+
+    @idempotent
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
     
     @action(detail=False, methods=['post'])
+    @idempotent
     def quick_book(self, request):
         """
         Quick booking endpoint for one-click desk reservations.
@@ -84,8 +454,7 @@ class ReservationViewSet(viewsets.ModelViewSet):
             # Get the desk
             desk = Desk.objects.get(id=desk_id)
             
-            # For now, use the first user (TODO: use authenticated user)
-            user = User.objects.first()
+            user = get_booking_user(request)
             if not user:
                 return Response(
                     {'error': 'No users found in system'}, 
@@ -108,14 +477,27 @@ class ReservationViewSet(viewsets.ModelViewSet):
                     {'error': f'Desk {desk.identifier} is not available for booking'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+
+            # Recurring bookings hold their future dates before they become reservations
+            if claim_on(desk.id, reservation_date) is not None:
+                return Response(
+                    {'error': f'Desk {desk.identifier} is already booked for {date_str}'},
+                    status=status.HTTP_409_CONFLICT
+                )
             
             # Create the reservation
-            reservation = Reservation.objects.create(
+            create = functools.partial(
+                Reservation.objects.create,
                 user=user,
                 desk=desk,
                 date=reservation_date,
                 status='confirmed'
             )
+            if group_commit.enabled():
+                # Committed with other concurrent bookings; see core/group_commit.py
+                reservation = group_commit.submit(shard_for_desk(desk.id), create)
+            else:
+                reservation = create()
             
             # Return reservation data
             serializer = self.get_serializer(reservation)
@@ -130,6 +512,12 @@ class ReservationViewSet(viewsets.ModelViewSet):
                 {'error': f'Desk with id {desk_id} not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
+        except TimeoutError:
+            # Group commit gave up waiting for the batch; see core/group_commit.py
+            return Response(
+                {'error': 'Booking timed out, please check your bookings and try again'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except Exception as e:
             # Handle duplicate booking or other errors
             if 'unique constraint' in str(e).lower():
@@ -141,3 +529,445 @@ class ReservationViewSet(viewsets.ModelViewSet):
                 {'error': f'Booking failed: {str(e)}'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class RoomReservationViewSet(IdempotencyMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                             mixins.CreateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    The booking user's meeting-room bookings (start/end times on one date).
+    Filter with ?date=. Overlapping an existing booking of the room is a 409;
+    see /api/areas/{id}/room-slots/ for free slots.
+    """
+    queryset = RoomReservation.objects.select_related('room')
+    serializer_class = RoomReservationSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset().filter(user=get_booking_user(self.request))
+        day = parse_date_param(self.request.query_params.get('date'))
+        if day is not None:
+            queryset = queryset.filter(date=day)
+        return queryset
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        user = get_booking_user(request)
+        if not user:
+            return Response(
+                {'error': 'No users found in system'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        room = data['room']
+        if not has_area_permission(user.id, room.area_id):
+            return Response(
+                {'error': f'No permission to book rooms in {room.area.name}'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        booking = book_room(user, room, data['date'], data['start_time'], data['end_time'], data.get('notes', ''))
+        if booking is None:
+            return Response(
+                {'error': f'{room.name} is already booked during that time'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(self.get_serializer(booking).data, status=status.HTTP_201_CREATED)
+
+    @idempotent
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
+
+class ReservationSeriesViewSet(ShardedQuerysetMixin, IdempotencyMixin, mixins.ListModelMixin,
+                               mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    The booking user's recurring desk bookings.
+
+    Creating a series books the desk on the given weekdays; its occurrences
+    become reservations up to three weeks ahead (see core/series.py).
+    Dates the desk is already booked on are a 409 listing them. cancel and
+    move act on the whole series from today on.
+    """
+    queryset = ReservationSeries.objects.select_related('desk')
+    serializer_class = ReservationSeriesSerializer
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=get_booking_user(self.request))
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.list_across_shards(
+            queryset, lambda part: self.get_serializer(part, many=True).data
+        ))
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        user = get_booking_user(request)
+        if not user:
+            return Response(
+                {'error': 'No users found in system'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        desk = data['desk']
+        forbidden = self._forbidden(user.pk, desk)
+        if forbidden is not None:
+            return forbidden
+
+        try:
+            series, conflicts = create_series(
+                user, desk, data['weekdays'], data['start_date'], data.get('end_date'), data.get('notes', '')
+            )
+        except DjangoValidationError as error:
+            return Response({'error': error.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        if series is None:
+            return self._conflict(desk, conflicts)
+        return Response(self.get_serializer(series).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def cancel(self, request, pk=None):
+        """Cancel the series and its upcoming reservations."""
+        series = self.get_object()
+        cancelled = cancel_series(series) if series.status == 'active' else 0
+        return Response({**self.get_serializer(series).data, 'cancelled_reservations': cancelled})
+
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def move(self, request, pk=None):
+        """Move the upcoming occurrences to another desk. Expects: {'desk': int}"""
+        series = self.get_object()
+        if series.status != 'active':
+            return Response({'error': 'Cancelled series cannot be moved'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            desk = Desk.objects.select_related('room__area').get(pk=request.data.get('desk'))
+        except (Desk.DoesNotExist, ValueError, TypeError):
+            return Response({'error': 'desk must be an existing desk id'}, status=status.HTTP_400_BAD_REQUEST)
+        forbidden = self._forbidden(series.user_id, desk)
+        if forbidden is not None:
+            return forbidden
+
+        try:
+            moved, conflicts = move_series(series, desk)
+        except DjangoValidationError as error:
+            return Response({'error': error.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        if moved is None:
+            return self._conflict(desk, conflicts)
+        return Response(self.get_serializer(moved).data)
+
+    def _forbidden(self, user_id, desk):
+        # The booking rules are checked by create_series/move_series under their locks.
+        if not has_area_permission(user_id, desk.room.area_id):
+            return Response(
+                {'error': f'No permission to book desks in {desk.room.area.name}'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return None
+
+    def _conflict(self, desk, conflicts):
+        return Response(
+            {
+                'error': f'Desk {desk.identifier} is already booked on some of these dates',
+                'conflicts': [day.isoformat() for day in conflicts],
+            },
+            status=status.HTTP_409_CONFLICT
+        )
+
+
+class WaitlistViewSet(ShardedQuerysetMixin, IdempotencyMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                      mixins.CreateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    The booking user's waitlist entries.
+
+    Joining grabs the desk straight away when it is free; otherwise the entry
+    waits and is promoted to a confirmed reservation when a booking for the
+    desk (or area) is released. Nothing is pushed to clients: they poll with
+    ?status=promoted to pick up promotions (in-process receivers can connect
+    to core.waitlist.waitlist_promoted).
+    """
+    queryset = WaitlistEntry.objects.select_related('desk')
+    serializer_class = WaitlistEntrySerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset().filter(user=get_booking_user(self.request))
+        entry_status = self.request.query_params.get('status')
+        if entry_status:
+            queryset = queryset.filter(status=entry_status)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.list_across_shards(
+            queryset, lambda part: self.get_serializer(part, many=True).data
+        ))
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        user = get_booking_user(request)
+        if not user:
+            return Response(
+                {'error': 'No users found in system'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if not has_area_permission(user.id, data['area'].id):
+            return Response(
+                {'error': f"No permission to book desks in {data['area'].name}"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        db = shard_for_area(data['area'].id)
+        if WaitlistEntry.objects.using(db).filter(
+            user=user, area=data['area'], desk=data.get('desk'), date=data['date'], status='waiting'
+        ).exists():
+            return Response(
+                {'error': 'Already on the waitlist'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        with transaction.atomic(using=db):
+            entry = serializer.save(user=user)
+            free_desk = self._free_desk(entry, db)
+            if free_desk is not None:
+                promote_next(free_desk, entry.date)
+                entry.refresh_from_db()
+        return Response(self.get_serializer(entry).data, status=status.HTTP_201_CREATED)
+
+    @idempotent
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
+    def _free_desk(self, entry, db):
+        """A bookable desk for the entry with no active reservation in its shard `db`, if any."""
+        desks = Desk.objects.using(db).filter(status='available')
+        if entry.desk_id:
+            desks = desks.filter(pk=entry.desk_id)
+        else:
+            desks = desks.filter(room__area_id=entry.area_id, room__is_bookable=True)
+        taken = Reservation.objects.using(db).filter(date=entry.date, status__in=ACTIVE_STATUSES).values('desk_id')
+        claimed = pending_claims(entry.date, entry.date, using=db, desk__room__area_id=entry.area_id)
+        desks = desks.exclude(id__in=taken).exclude(id__in=[desk_id for desk_id, _ in claimed])
+        return desks.order_by('id').values_list('id', flat=True).first()
+
+
+class ReservationEventViewSet(viewsets.ViewSet):
+    """
+    Append-only reservation change log.
+
+    GET ?after=<sequence>&limit=<n> returns events with a larger sequence,
+    oldest first. Pass the returned `next` as `after` to continue; `gap`
+    is true when events after the requested sequence were already pruned.
+
+    With sharding each shard keeps its own log: pick one with ?shard=<name>
+    (one of `shards`; defaults to the first).
+    """
+
+    def list(self, request):
+        try:
+            after = int(request.query_params.get('after', 0))
+            limit = int(request.query_params.get('limit', MAX_BATCH_SIZE))
+        except ValueError:
+            return Response(
+                {'error': 'after and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        databases = all_databases()
+        shard = request.query_params.get('shard', databases[0])
+        if shard not in databases:
+            return Response(
+                {'error': f"Unknown shard. Use one of: {', '.join(databases)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        events, has_more, oldest = read_events(after, limit, using=shard)
+        # A shard's sequence starts at the base of its id range.
+        first = id_base(shard) if shard in shard_aliases() else 1
+        return Response({
+            'events': events,
+            'next': events[-1]['id'] if events else after,
+            'has_more': has_more,
+            'gap': oldest is not None and max(after, first - 1) < oldest - 1,
+            'shard': shard,
+            'shards': databases,
+        })
+
+
+class PermissionViewSet(viewsets.ViewSet):
+    """
+    Bulk area permissions for administrators (SRS 3.4.2). POST to grant/,
+    revoke/ or replace/ with users selected by `user_ids`, `employee_ids`
+    and/or `departments`, and `areas` (ids). replace/ leaves each user with
+    exactly those areas. With `dry_run` the counts are reported and nothing
+    is changed. Unknown users or areas reject the whole request.
+    """
+    ACTIONS = {'grant': bulk_grant, 'revoke': bulk_revoke, 'replace': bulk_replace}
+
+    def apply(self, request, action_name):
+        user = request.user
+        if not (user.is_authenticated and (user.is_admin or user.is_staff)):
+            return Response(
+                {'error': 'Only administrators can manage permissions'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        serializer = BulkPermissionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if not data['areas'] and action_name != 'replace':
+            return Response(
+                {'error': 'areas must not be empty'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        result = self.ACTIONS[action_name](data['resolved_user_ids'], data['areas'], dry_run=data['dry_run'])
+        return Response({'action': action_name, 'dry_run': data['dry_run'], **result._asdict()})
+
+    @action(detail=False, methods=['post'])
+    def grant(self, request):
+        return self.apply(request, 'grant')
+
+    @action(detail=False, methods=['post'])
+    def revoke(self, request):
+        return self.apply(request, 'revoke')
+
+    @action(detail=False, methods=['post'])
+    def replace(self, request):
+        return self.apply(request, 'replace')
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    Fuzzy search across desks, rooms, areas and users: ?q=<text> (at least
+    two characters), optional ?types=desk,room,area,user and ?limit=.
+    Results are limited to the caller's permitted areas (and users permitted
+    in them); administrators see everything. Anonymous callers are refused.
+    """
+    MAX_LIMIT = 50
+
+    def list(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            return Response(
+                {'error': 'Sign in to search'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        query = request.query_params.get('q', '')
+        if len(normalize(query)) < MIN_QUERY_LENGTH:
+            return Response(
+                {'error': f'q must be at least {MIN_QUERY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        kinds = parse_list_param(request.query_params.get('types')) or SEARCH_KINDS
+        unknown = set(kinds) - set(SEARCH_KINDS)
+        if unknown:
+            return Response(
+                {'error': f"Unknown types: {', '.join(sorted(unknown))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.MAX_LIMIT:
+            return Response(
+                {'error': f'limit must be between 1 and {self.MAX_LIMIT}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        areas = None
+        if not (user.is_admin or user.is_staff):
+            areas = permitted_area_ids(user.id)
+        results = search(query, kinds=tuple(kinds), areas=areas, limit=limit)
+        return Response({
+            'query': query,
+            'results': [
+                {'type': doc.kind, 'id': doc.pk, 'label': doc.label, 'detail': doc.detail}
+                for doc in results
+            ],
+        })
+
+
+class PopularityViewSet(CachedResponseMixin, viewsets.ViewSet):
+    """
+    Hot desks and areas (SRS 3.6.1): the most booked desks and areas between
+    ?from= and ?to= (inclusive, default the last 30 days), ?limit= of each.
+    """
+    MAX_LIMIT = 100
+
+    @cache_response(bookings=True)
+    def list(self, request):
+        end = parse_date_param(request.query_params.get('to'), default=date.today())
+        start = parse_date_param(request.query_params.get('from'), default=end and end - timedelta(days=29))
+        if start is None or end is None:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start > end:
+            return Response(
+                {'error': 'from must not be after to'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.MAX_LIMIT:
+            return Response(
+                {'error': f'limit must be between 1 and {self.MAX_LIMIT}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(popularity_report(start, end, limit))
+
+
+class CalendarViewSet(viewsets.ViewSet):
+    """The booking user's calendar subscription URL."""
+
+    def list(self, request):
+        user = get_booking_user(request)
+        if not user:
+            return Response(
+                {'error': 'No users found in system'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        token = make_token(user.pk)
+        return Response({
+            'token': token,
+            'url': request.build_absolute_uri(reverse('calendar-feed', kwargs={'token': token})),
+        })
+
+
+class CalendarFeedView(APIView):
+    """
+    iCalendar feed of a user's bookings, addressed by a signed token.
+
+    Supports If-None-Match/If-Modified-Since; unchanged feeds are answered
+    from the cache without touching the database.
+    """
+    authentication_classes = []
+    permission_classes = []
+    throttle_classes = [CalendarFeedThrottle]
+
+    def get(self, request, token):
+        user_id = read_token(token)
+        if user_id is None:
+            return Response({'error': 'Invalid calendar token'}, status=status.HTTP_404_NOT_FOUND)
+
+        version = get_feed_version(user_id)
+        etag = f'"{user_id}-{version}"'
+        last_modified = version // 1000
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            body = get_cached_feed(user_id, version)
+            content_type = 'text/calendar; charset=utf-8'
+            if body is not None:
+                response = HttpResponse(body, content_type=content_type)
+            else:
+                response = StreamingHttpResponse(stream_feed(user_id, version), content_type=content_type)
+            response['Content-Disposition'] = 'inline; filename="bookings.ics"'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, max-age=300'
+        return response
@@ -56,6 +56,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "booking_api.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "booking_system.urls"
@@ -86,9 +87,30 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # A file rather than shared-cache memory, so concurrent test
+        # transactions wait for SQLite's write lock as in production
+        # instead of failing with "database table is locked".
+        "TEST": {"NAME": BASE_DIR / "test-db.sqlite3"},
     }
 }
 
+# Area sharding (see core/sharding.py). With BOOKING_SHARD_COUNT > 0,
+# reservations and their per-area tables live in db-shard-<n>.sqlite3 files
+# chosen by area; the default database keeps users, areas, rooms and desks,
+# which are replicated to every shard. Run `manage.py migrate_shards`.
+BOOKING_SHARD_COUNT = config('BOOKING_SHARD_COUNT', default=0, cast=int)
+BOOKING_SHARDS = [f'shard_{n}' for n in range(BOOKING_SHARD_COUNT)]
+# At least two shard databases are declared even with sharding off, so the
+# shard tests can turn it on with override_settings; nothing is routed to
+# them (or connects) unless BOOKING_SHARDS names them.
+for _n in range(max(BOOKING_SHARD_COUNT, 2)):
+    DATABASES[f'shard_{_n}'] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"db-shard-{_n}.sqlite3",
+        "OPTIONS": {"timeout": 30},
+    }
+DATABASE_ROUTERS = ['core.routers.AreaShardRouter'] if BOOKING_SHARDS else []
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -144,8 +166,66 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Allow anonymous access for now
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'booking_api.throttling.ReadRateThrottle',
+        'booking_api.throttling.BookingRateThrottle',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'booking_api.renderers.FastJSONRenderer',  # orjson when installed
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Cache configuration
+# LocMemCache is per-process; multi-worker deployments should point
+# CACHE_BACKEND/CACHE_LOCATION at a shared cache (e.g. Redis or Memcached)
+# so that write-driven invalidation reaches every worker.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='booking-system'),
+    }
+}
+
+# API response cache (see booking_api/cache.py)
+BOOKING_RESPONSE_CACHE_ENABLED = config('BOOKING_RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+BOOKING_RESPONSE_CACHE_TIMEOUT = config('BOOKING_RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+# Longest a request waits for an identical one already computing its body.
+BOOKING_COALESCE_WAIT = config('BOOKING_COALESCE_WAIT', default=5, cast=float)
+
+# Token-bucket throttle rates per user (or client IP) and endpoint class
+# (see booking_api/throttling.py). 'N/period' allows bursts of N requests,
+# refilling at N per period.
+BOOKING_THROTTLE_RATES = {
+    'read': config('THROTTLE_READ_RATE', default='600/min'),
+    'booking': config('THROTTLE_BOOKING_RATE', default='60/min'),
+    'calendar': config('THROTTLE_CALENDAR_RATE', default='30/min'),
+}
+
+# Idempotency-Key replay store for booking writes (see booking_api/idempotency.py)
+BOOKING_IDEMPOTENCY_CACHE = config('BOOKING_IDEMPOTENCY_CACHE', default='default')
+BOOKING_IDEMPOTENCY_TTL = config('BOOKING_IDEMPOTENCY_TTL', default=24 * 60 * 60, cast=int)
+BOOKING_IDEMPOTENCY_WAIT = config('BOOKING_IDEMPOTENCY_WAIT', default=5, cast=float)
+
+# Group commit for quick_book (see core/group_commit.py): concurrent bookings
+# are committed together, one transaction per window or per MAX bookings.
+BOOKING_GROUP_COMMIT = config('BOOKING_GROUP_COMMIT', default=False, cast=bool)
+BOOKING_GROUP_COMMIT_WINDOW_MS = config('BOOKING_GROUP_COMMIT_WINDOW_MS', default=2, cast=float)
+BOOKING_GROUP_COMMIT_MAX = config('BOOKING_GROUP_COMMIT_MAX', default=50, cast=int)
+BOOKING_GROUP_COMMIT_TIMEOUT = config('BOOKING_GROUP_COMMIT_TIMEOUT', default=10, cast=float)
+
+# On-demand request profiling (see booking_api/profiling.py): staff requests
+# sent with `X-Profile: 1` or `?_profile=1` are profiled and stored here,
+# keeping the newest BOOKING_PROFILE_KEEP. Listed under /admin/profiles/.
+BOOKING_PROFILING_ENABLED = config('BOOKING_PROFILING_ENABLED', default=True, cast=bool)
+BOOKING_PROFILE_DIR = config('BOOKING_PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+BOOKING_PROFILE_KEEP = config('BOOKING_PROFILE_KEEP', default=100, cast=int)
+
+# Reservation event log retention (see core/events.py, prune_reservation_events)
+BOOKING_EVENT_RETENTION_DAYS = config('BOOKING_EVENT_RETENTION_DAYS', default=90, cast=int)
+# Events younger than this are not yet served to consumers (not on SQLite)
+BOOKING_EVENT_READ_LAG = config('BOOKING_EVENT_READ_LAG', default=5, cast=float)
+
 # CORS configuration
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='', cast=Csv())
 
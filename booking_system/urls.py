@@ -20,7 +20,10 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from booking_api.admin import profile_urls
+
 urlpatterns = [
+    path("admin/profiles/", include(profile_urls)),
     path("admin/", admin.site.urls),
     path('api/', include('booking_api.urls')),
 ]
@@ -1,13 +1,174 @@
-from django.contrib import admin
+from datetime import timedelta
+
+from xml.etree.ElementTree import ParseError
+
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Area, Room, Desk, Reservation, UserPermission
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import (
+    User, Area, Room, Desk, Reservation, ReservationSeries, RoomReservation, UserPermission, GroupPermission,
+    WaitlistEntry, ReservationEvent, DeskUsage
+)
+from .floor_plans import import_desk_positions
+from .popularity import popularity_report
+from .search import MIN_QUERY_LENGTH, normalize, search
+from .series import WEEKDAY_NAMES, mask_weekdays
+from .sharding import all_databases, shard_aliases, shard_for_id
+
+# Below this many rows an exact COUNT(*) is cheap enough.
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+# How long other databases reuse the exact count of a large table.
+CACHED_COUNT_TIMEOUT = 10 * 60
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Avoids a COUNT(*) per page view for unfiltered changelists on large tables.
+
+    PostgreSQL answers with the planner's row estimate (pg_class.reltuples).
+    Other databases keep no cheap estimate: there the exact count of a large
+    table is cached for CACHED_COUNT_TIMEOUT and may lag behind by that much.
+    Whenever filters or searches apply, the exact count is used.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+        table = queryset.model._meta.db_table
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+                row = cursor.fetchone()
+            if row and row[0] > ESTIMATED_COUNT_THRESHOLD:
+                return row[0]
+            return super().count
+        key = f'core:admin:count:{queryset.db}:{table}'
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            if count > ESTIMATED_COUNT_THRESHOLD:
+                cache.set(key, count, CACHED_COUNT_TIMEOUT)
+        return count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow without bound."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """The shard a sharded changelist shows; the first one unless picked."""
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shard_aliases()]
+
+    def shard(self):
+        databases = all_databases()
+        return self.value() if self.value() in databases else databases[0]
+
+    def queryset(self, request, queryset):
+        return queryset.using(self.shard())
+
+    def choices(self, changelist):
+        # No "All": rows are listed one shard at a time.
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == self.shard(),
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+
+class ShardedTableAdmin(LargeTableAdmin):
+    """For tables split across shards (core/sharding.py): lists pick a shard, ids find theirs."""
+
+    def get_list_filter(self, request):
+        return [ShardFilter, *super().get_list_filter(request)]
+
+    def get_object(self, request, object_id, from_field=None):
+        queryset = self.get_queryset(request).using(shard_for_id(object_id))
+        model = queryset.model
+        field = model._meta.pk if from_field is None else model._meta.get_field(from_field)
+        try:
+            return queryset.get(**{field.name: field.to_python(object_id)})
+        except (model.DoesNotExist, ValidationError, ValueError):
+            return None
+
+
+class UpcomingDateFilter(admin.SimpleListFilter):
+    """Date ranges served by an index range scan, unlike date_hierarchy."""
+    title = 'date'
+    parameter_name = 'when'
+
+    def lookups(self, request, model_admin):
+        return [
+            ('today', 'Today'),
+            ('next7', 'Next 7 days'),
+            ('next30', 'Next 30 days'),
+            ('past7', 'Past 7 days'),
+            ('past30', 'Past 30 days'),
+        ]
+
+    def queryset(self, request, queryset):
+        today = timezone.localdate()
+        ranges = {
+            'today': (today, today),
+            'next7': (today, today + timedelta(days=6)),
+            'next30': (today, today + timedelta(days=29)),
+            'past7': (today - timedelta(days=7), today - timedelta(days=1)),
+            'past30': (today - timedelta(days=30), today - timedelta(days=1)),
+        }
+        if self.value() in ranges:
+            return queryset.filter(date__range=ranges[self.value()])
+        return queryset
+
+
+class IndexedSearchMixin:
+    """
+    Answers changelist and autocomplete searches from core.search instead of
+    LIKE scans. Only the best search_limit matches are listed; the changelist
+    says so when there may be more.
+    """
+    search_kind = None
+    search_limit = 1000
+
+    def get_search_results(self, request, queryset, search_term):
+        if len(normalize(search_term)) < MIN_QUERY_LENGTH:
+            return super().get_search_results(request, queryset, search_term)
+        found = search(search_term, kinds=(self.search_kind,), limit=self.search_limit)
+        autocomplete = request.resolver_match is not None and request.resolver_match.url_name == 'autocomplete'
+        if len(found) >= self.search_limit and not autocomplete:
+            self.message_user(
+                request,
+                f'Only the best {self.search_limit} matches for "{search_term}" are listed; refine the search '
+                'to see others.',
+                messages.WARNING,
+            )
+        return queryset.filter(pk__in=[document.pk for document in found]), False
 
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(IndexedSearchMixin, UserAdmin):
     list_display = ['username', 'email', 'employee_id', 'department', 'is_admin', 'is_staff']
     list_filter = ['is_admin', 'is_staff', 'is_active', 'department']
     search_fields = ['username', 'email', 'employee_id']
+    search_kind = 'user'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = UserAdmin.fieldsets + (
         ('Employee Info', {
@@ -27,14 +188,48 @@ class AreaAdmin(admin.ModelAdmin):
     search_fields = ['name']
     readonly_fields = ['created_at', 'updated_at']
     inlines = [RoomInline]
+    actions = ['import_desk_positions']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            _room_count=Count('rooms', distinct=True),
+            _desk_count=Count('rooms__desks', distinct=True),
+        )
+
+    def save_related(self, request, form, formsets, change):
+        # After the inlines, so desks added on the same page get positions too.
+        super().save_related(request, form, formsets, change)
+        if 'map_svg' in form.changed_data and form.instance.map_svg:
+            self._import_positions(request, form.instance)
+
+    @admin.action(description='Set desk positions from the floor plan')
+    def import_desk_positions(self, request, queryset):
+        for area in queryset.exclude(map_svg=''):
+            self._import_positions(request, area)
+
+    def _import_positions(self, request, area):
+        try:
+            result = import_desk_positions(area)
+        except (ParseError, OSError, ValueError) as exc:  # ValueError: defusedxml refusing entities
+            self.message_user(request, f'{area}: could not read the floor plan ({exc})', messages.ERROR)
+            return
+        self.message_user(request, f'{area}: {result.located} desks found on the floor plan, {result.updated} moved')
+        if result.missing:
+            self.message_user(
+                request, f'{area}: not on the floor plan: {", ".join(result.missing[:50])}', messages.WARNING
+            )
+        if result.unknown:
+            self.message_user(
+                request, f'{area}: no such desk in this area: {", ".join(result.unknown[:50])}', messages.WARNING
+            )
     
+    @admin.display(description='Rooms', ordering='_room_count')
     def room_count(self, obj):
-        return obj.rooms.count()
-    room_count.short_description = 'Rooms'
+        return obj._room_count
     
+    @admin.display(description='Desks', ordering='_desk_count')
     def desk_count(self, obj):
-        return Desk.objects.filter(room__area=obj).count()
-    desk_count.short_description = 'Desks'
+        return obj._desk_count
 
 
 class DeskInline(admin.TabularInline):
@@ -46,38 +241,125 @@ class DeskInline(admin.TabularInline):
 class RoomAdmin(admin.ModelAdmin):
     list_display = ['name', 'area', 'is_bookable', 'desk_count', 'created_at']
     list_filter = ['area', 'is_bookable']
+    list_select_related = ['area']
     search_fields = ['name', 'area__name']
     readonly_fields = ['created_at', 'updated_at']
     inlines = [DeskInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_desk_count=Count('desks'))
     
+    @admin.display(description='Desks', ordering='_desk_count')
     def desk_count(self, obj):
-        return obj.desks.count()
-    desk_count.short_description = 'Desks'
+        return obj._desk_count
 
 
 @admin.register(Desk)
 class DeskAdmin(admin.ModelAdmin):
     list_display = ['identifier', 'room', 'area_name', 'status', 'pos_x', 'pos_y']
     list_filter = ['status', 'room__area']
+    list_select_related = ['room__area']
     search_fields = ['identifier', 'room__name']
+    autocomplete_fields = ['room']
     readonly_fields = ['created_at', 'updated_at']
     
+    @admin.display(description='Area', ordering='room__area__name')
     def area_name(self, obj):
         return obj.room.area.name
-    area_name.short_description = 'Area'
 
 
 @admin.register(Reservation)
-class ReservationAdmin(admin.ModelAdmin):
+class ReservationAdmin(ShardedTableAdmin):
     list_display = ['user', 'desk', 'date', 'status', 'created_at']
-    list_filter = ['status', 'date', 'desk__room__area']
+    list_filter = [UpcomingDateFilter, 'status', 'desk__room__area']
+    list_select_related = ['user', 'desk']
     search_fields = ['user__username', 'desk__identifier']
+    autocomplete_fields = ['user', 'desk']
+    readonly_fields = ['created_at']
+
+
+@admin.register(ReservationSeries)
+class ReservationSeriesAdmin(ShardedTableAdmin):
+    list_display = ['user', 'desk', 'weekday_names', 'start_date', 'end_date', 'status', 'materialized_until']
+    list_filter = ['status', 'desk__room__area']
+    list_select_related = ['user', 'desk']
+    search_fields = ['user__username', 'desk__identifier']
+    autocomplete_fields = ['user', 'desk']
+    readonly_fields = ['materialized_until', 'created_at']
+
+    @admin.display(description='Weekdays')
+    def weekday_names(self, obj):
+        return ', '.join(WEEKDAY_NAMES[day] for day in mask_weekdays(obj.weekdays))
+
+
+@admin.register(RoomReservation)
+class RoomReservationAdmin(LargeTableAdmin):
+    list_display = ['room', 'user', 'date', 'start_time', 'end_time', 'created_at']
+    list_filter = [UpcomingDateFilter, 'room__area']
+    list_select_related = ['room__area', 'user']
+    search_fields = ['user__username', 'room__name']
+    autocomplete_fields = ['user', 'room']
     readonly_fields = ['created_at']
-    date_hierarchy = 'date'
 
 
 @admin.register(UserPermission)
-class UserPermissionAdmin(admin.ModelAdmin):
+class UserPermissionAdmin(LargeTableAdmin):
     list_display = ['user', 'area', 'created_at']
     list_filter = ['area']
+    list_select_related = ['user', 'area']
     search_fields = ['user__username', 'area__name']
+    autocomplete_fields = ['user', 'area']
+
+
+@admin.register(GroupPermission)
+class GroupPermissionAdmin(admin.ModelAdmin):
+    list_display = ['area', 'group', 'department', 'created_at']
+    list_filter = ['area', 'group']
+    list_select_related = ['area', 'group']
+    search_fields = ['department', 'group__name', 'area__name']
+    autocomplete_fields = ['area', 'group']
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(ShardedTableAdmin):
+    list_display = ['user', 'area', 'desk', 'date', 'status', 'created_at', 'promoted_at']
+    list_filter = [UpcomingDateFilter, 'status', 'area']
+    list_select_related = ['user', 'area', 'desk']
+    search_fields = ['user__username', 'desk__identifier', 'area__name']
+    autocomplete_fields = ['user', 'area', 'desk', 'reservation']
+    readonly_fields = ['created_at', 'promoted_at']
+
+
+@admin.register(ReservationEvent)
+class ReservationEventAdmin(ShardedTableAdmin):
+    list_display = ['id', 'event_type', 'reservation_id', 'user_id', 'desk_id', 'date', 'status', 'created_at']
+    list_filter = ['event_type']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DeskUsage)
+class DeskUsageAdmin(ShardedTableAdmin):
+    """Monthly desk counters, with the hot desk/area report above the list."""
+    list_display = ['desk', 'area', 'month', 'bookings']
+    list_filter = ['area', 'month']
+    list_select_related = ['desk', 'area']
+    ordering = ['-month', '-bookings']
+    change_list_template = 'admin/core/deskusage/change_list.html'
+    report_days = 30
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        end = timezone.localdate()
+        start = end - timedelta(days=self.report_days - 1)
+        extra_context = {**(extra_context or {}), 'popularity': popularity_report(start, end)}
+        return super().changelist_view(request, extra_context=extra_context)
@@ -0,0 +1,59 @@
+"""Booking rules shared by the API, the waitlist and admin tooling."""
+from datetime import timedelta
+
+from .models import Reservation
+from .permissions import permitted_area_ids
+from .sharding import count_across_shards, exists_in_any_shard
+
+# SRS 3.3.2: at most 3 weekdays (Mon-Fri) per calendar week (Mon-Sun).
+WEEKLY_WEEKDAY_QUOTA = 3
+
+# Cancelled bookings are credited back to the quota (SRS 3.3.4).
+QUOTA_EXEMPT_STATUSES = ('cancelled',)
+
+# Statuses that occupy a desk for the day.
+ACTIVE_STATUSES = ('confirmed', 'pending_approval', 'checked_in')
+
+# Statuses that give a desk back; their rows stay on record (see Reservation.Meta).
+RELEASED_STATUSES = ('cancelled', 'no_show')
+
+
+def week_bounds(day):
+    """Monday and Sunday of the calendar week containing day."""
+    monday = day - timedelta(days=day.weekday())
+    return monday, monday + timedelta(days=6)
+
+
+def weekday_bookings(user_id, day):
+    """
+    Number of the user's quota-counted weekday bookings in day's week,
+    recurring occurrences not yet materialized included.
+    """
+    from .series import pending_user_occurrences  # series.py builds on these rules
+
+    monday, sunday = week_bounds(day)
+    return count_across_shards(
+        lambda db: Reservation.objects.using(db)
+        .filter(user_id=user_id, date__range=(monday, sunday))
+        .exclude(status__in=QUOTA_EXEMPT_STATUSES)
+        .exclude(date__week_day__in=(1, 7))  # Sunday, Saturday
+    ) + pending_user_occurrences(user_id, monday, monday + timedelta(days=4))
+
+
+def exceeds_quota(user_id, day):
+    """Whether booking day would take the user past the weekly quota."""
+    if day.weekday() >= 5:
+        return False
+    return weekday_bookings(user_id, day) >= WEEKLY_WEEKDAY_QUOTA
+
+
+def has_area_permission(user_id, area_id):
+    return area_id in permitted_area_ids(user_id)
+
+
+def has_booking_on(user_id, day):
+    from .series import pending_user_occurrences
+
+    return exists_in_any_shard(
+        lambda db: Reservation.objects.using(db).filter(user_id=user_id, date=day, status__in=ACTIVE_STATUSES)
+    ) or pending_user_occurrences(user_id, day, day) > 0
@@ -0,0 +1,66 @@
+"""
+Per-area change tracking for delta sync.
+
+Every reservation or desk write bumps its area's AreaVersion counter and
+stamps the new version on the affected (desk, date) DeskChange row, or on
+the desk's dateless row when the desk itself changed. One row is kept per
+(desk, date), so the table stays as small as the reservations it tracks.
+
+Counters live in the area's shard (see sharding.py).
+
+Changes that a delta can't express (rooms edited, desks deleted or moved
+away) raise the area's floor to the new version instead; clients behind
+the floor must reload a full snapshot.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Area, AreaVersion, Desk, DeskChange
+from .sharding import shard_for_area
+
+
+def bump_version(area_id, reset=False):
+    """Increment the area's version and return it; reset also raises the floor."""
+    db = shard_for_area(area_id)
+    counters = AreaVersion.objects.using(db)
+    changes = {'version': F('version') + 1}
+    if reset:
+        changes['floor'] = F('version') + 1
+    if not counters.filter(area_id=area_id).update(**changes):
+        if not Area.objects.using(db).filter(pk=area_id).exists():
+            return None  # area is being deleted
+        try:
+            with transaction.atomic(using=db):
+                counters.create(area_id=area_id, version=1, floor=1 if reset else 0)
+        except IntegrityError:
+            # Created concurrently: bump that row instead.
+            counters.filter(area_id=area_id).update(**changes)
+    return counters.filter(area_id=area_id).values_list('version', flat=True).get()
+
+
+def desk_area_id(desk_id, using=None):
+    """The desk's area, or None when the desk no longer exists in `using`."""
+    return Desk.objects.using(using).filter(pk=desk_id).values_list('room__area_id', flat=True).first()
+
+
+def record_desk_change(area_id, desk_id, day=None):
+    version = bump_version(area_id)
+    if version is None:
+        return None
+    DeskChange.objects.using(shard_for_area(area_id)).update_or_create(
+        desk_id=desk_id, date=day, defaults={'area_id': area_id, 'version': version}
+    )
+    return version
+
+
+def reset_changes(area_id):
+    return bump_version(area_id, reset=True)
+
+
+def get_change_version(area_id):
+    """(version, floor) for the area; (0, 0) before its first change."""
+    row = (
+        AreaVersion.objects.using(shard_for_area(area_id)).filter(area_id=area_id)
+        .values_list('version', 'floor').first()
+    )
+    return row or (0, 0)
@@ -0,0 +1,219 @@
+"""
+Whole-dataset checks of booking invariants (see check_bookings).
+
+- desk_unavailable: active bookings on disabled or permanently assigned desks
+- no_permission: active bookings in an area the user may not access (see
+  permissions.py)
+- over_quota: weekday bookings past the weekly quota that aren't pending approval
+- checked_in_at_missing / checked_in_at_stray: checked_in_at must be set
+  exactly when the status is checked_in
+
+The first two and the check-in pair are area-local: one task per area loads
+the area's unavailable desks and permitted users as sets of ids and streams
+the area's reservations through the (desk, date) index, a batch of desks per
+query. The quota spans areas, so it runs as separate tasks over user id
+ranges, streaming each user's bookings in (user, date) order from every
+shard and holding one week at a time; creation times, which decide which
+bookings of a week are past the quota, are read for offending weeks only. Tasks return violation ids in compact
+arrays plus a few sample rows, so they can run in worker processes.
+"""
+import heapq
+from array import array
+from collections import namedtuple
+from itertools import groupby
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils import timezone
+
+from .booking_rules import ACTIVE_STATUSES, QUOTA_EXEMPT_STATUSES, WEEKLY_WEEKDAY_QUOTA, week_bounds
+from .models import Desk, Reservation, ReservationEvent
+from .permissions import permitted_user_ids
+from .sharding import all_databases, shard_for_area
+
+CHECKS = {
+    'desk_unavailable': 'Active booking on a disabled or permanently assigned desk',
+    'no_permission': 'Active booking in an area the user has no permission for',
+    'over_quota': 'Weekday booking past the weekly quota without pending approval',
+    'checked_in_at_missing': 'Checked in without a check-in time',
+    'checked_in_at_stray': 'Check-in time on a booking that is not checked in',
+}
+UNAVAILABLE_DESK_STATUSES = ('disabled', 'permanent')
+DESK_BATCH = 500  # ids per IN (...) clause
+CHUNK_SIZE = 5000
+SAMPLE_SIZE = 10
+
+Sample = namedtuple('Sample', 'id user_id desk_id date status')
+
+
+class Result:
+    """Violations found by one or more tasks."""
+
+    def __init__(self):
+        self.rows = 0
+        self.ids = {check: array('q') for check in CHECKS}
+        self.samples = {check: [] for check in CHECKS}
+
+    def add(self, check, row):
+        self.ids[check].append(row.id)
+        if len(self.samples[check]) < SAMPLE_SIZE:
+            self.samples[check].append(row)
+
+    def merge(self, other):
+        self.rows += other.rows
+        for check in CHECKS:
+            self.ids[check].extend(other.ids[check])
+            room = SAMPLE_SIZE - len(self.samples[check])
+            self.samples[check].extend(other.samples[check][:room])
+        return self
+
+    def count(self, check):
+        return len(self.ids[check])
+
+    @property
+    def total(self):
+        return sum(len(ids) for ids in self.ids.values())
+
+
+def _reservations(queryset, since):
+    if since is not None:
+        queryset = queryset.filter(date__gte=since)
+    return queryset
+
+
+def check_area(area_id, since=None, chunk_size=CHUNK_SIZE):
+    """Area-local checks for the reservations on area's desks."""
+    result = Result()
+    desks = Desk.objects.using(DEFAULT_DB_ALIAS).filter(room__area_id=area_id)
+    desk_ids = sorted(desks.values_list('id', flat=True))
+    unavailable = set(desks.filter(status__in=UNAVAILABLE_DESK_STATUSES).values_list('id', flat=True))
+    permitted = permitted_user_ids(area_id)
+    active = frozenset(ACTIVE_STATUSES)
+
+    reservations = _reservations(Reservation.objects.using(shard_for_area(area_id)), since).annotate(
+        has_check_in=ExpressionWrapper(Q(checked_in_at__isnull=False), output_field=BooleanField())
+    )
+    for start in range(0, len(desk_ids), DESK_BATCH):
+        rows = (
+            reservations.filter(desk_id__in=desk_ids[start:start + DESK_BATCH])
+            .order_by('desk_id', 'date')
+            .values_list('id', 'user_id', 'desk_id', 'date', 'status', 'has_check_in')
+        )
+        for pk, user_id, desk_id, day, status, has_check_in in rows.iterator(chunk_size=chunk_size):
+            result.rows += 1
+            checked_in = status == 'checked_in'
+            if status in active:
+                if desk_id in unavailable:
+                    result.add('desk_unavailable', Sample(pk, user_id, desk_id, day, status))
+                if user_id not in permitted:
+                    result.add('no_permission', Sample(pk, user_id, desk_id, day, status))
+            if checked_in and not has_check_in:
+                result.add('checked_in_at_missing', Sample(pk, user_id, desk_id, day, status))
+            elif has_check_in and not checked_in:
+                result.add('checked_in_at_stray', Sample(pk, user_id, desk_id, day, status))
+    return result
+
+
+def check_quota(first_user_id, last_user_id, since=None, chunk_size=CHUNK_SIZE):
+    """Quota check for users with ids in [first_user_id, last_user_id]."""
+    result = Result()
+    if since is not None:
+        since = week_bounds(since)[0]  # whole weeks only
+    streams = [
+        _reservations(Reservation.objects.using(db), since)
+        .filter(user_id__gte=first_user_id, user_id__lte=last_user_id)
+        .exclude(status__in=QUOTA_EXEMPT_STATUSES)
+        .order_by('user_id', 'date', 'id')
+        .values_list('user_id', 'date', 'id', 'desk_id', 'status')
+        .iterator(chunk_size=chunk_size)
+        for db in all_databases()
+    ]
+    # A user's bookings may sit in several shards; merge them back in order.
+    rows = heapq.merge(*streams) if len(streams) > 1 else streams[0]
+    # Weekends are skipped here: on SQLite a week_day filter calls back into
+    # Python for every row.
+    rows = (row for row in rows if row[1].weekday() < 5)
+    # Ordinal 1 (0001-01-01) is a Monday, so this numbers calendar weeks.
+    over = []
+    for _, week in groupby(rows, key=lambda row: (row[0], (row[1].toordinal() - 1) // 7)):
+        holding = [row for row in week if row[4] != 'pending_approval']
+        if len(holding) > WEEKLY_WEEKDAY_QUOTA:
+            over.append(holding)
+    if not over:
+        return result
+
+    # Only these weeks need creation times: the earliest-made bookings keep
+    # their places.
+    created = {}
+    ids = [row[2] for holding in over for row in holding]
+    for db in all_databases():
+        for start in range(0, len(ids), DESK_BATCH):
+            created.update(
+                Reservation.objects.using(db).filter(id__in=ids[start:start + DESK_BATCH])
+                .values_list('id', 'created_at')
+            )
+    for holding in over:
+        holding.sort(key=lambda row: (created[row[2]], row[2]))
+        for user_id, day, pk, desk_id, status in holding[WEEKLY_WEEKDAY_QUOTA:]:
+            result.add('over_quota', Sample(pk, user_id, desk_id, day, status))
+    return result
+
+
+# Fixes
+
+FIXES = {
+    'desk_unavailable': {'status': 'cancelled'},
+    'no_permission': {'status': 'cancelled'},
+    'over_quota': {'status': 'pending_approval'},
+    'checked_in_at_stray': {'checked_in_at': None},
+    # checked_in_at_missing has no safe fix: the check-in time is unknown.
+}
+
+
+def _fixable(check, db, batch):
+    """The part of batch that FIXES[check] may change in db."""
+    queryset = Reservation.objects.using(db).filter(id__in=batch)
+    if check != 'over_quota':
+        return queryset
+    # Past bookings are history, and a booking an admin approved out of
+    # pending_approval stays approved; only future confirmed ones go back
+    # for approval.
+    approved = ReservationEvent.objects.using(db).filter(
+        reservation_id__in=batch, previous_status='pending_approval', status='confirmed',
+    ).values('reservation_id')
+    return queryset.filter(status='confirmed', date__gte=timezone.localdate()).exclude(id__in=approved)
+
+
+def fix_violations(result, batch_size=CHUNK_SIZE):
+    """
+    Apply FIXES to the violating reservations; returns ({check: rows
+    changed}, {check: rows left unchanged}).
+
+    Rows are saved one by one, in a transaction per batch and database, so
+    the event log, change tracking, usage counters and waitlist promotion
+    see every change. Cancellations go first; a cancelled booking keeps
+    its status when it also broke the quota. Over-quota bookings that are
+    past, checked in or approved by an admin are left for a person to
+    review.
+    """
+    fixed = {}
+    left = {}
+    cancelled = set()
+    for check, changes in FIXES.items():
+        ids = result.ids[check]
+        if 'status' in changes:
+            ids = [pk for pk in ids if pk not in cancelled]
+        fixed[check] = 0
+        for start in range(0, len(ids), batch_size):
+            batch = list(ids[start:start + batch_size])
+            for db in all_databases():
+                with transaction.atomic(using=db):
+                    for reservation in _fixable(check, db, batch).select_for_update():
+                        for field, value in changes.items():
+                            setattr(reservation, field, value)
+                        reservation.save(update_fields=list(changes))
+                        fixed[check] += 1
+        left[check] = len(ids) - fixed[check]
+        if changes.get('status') == 'cancelled':
+            cancelled.update(ids)
+    return fixed, left
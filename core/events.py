@@ -0,0 +1,121 @@
+"""
+Append-only reservation event log.
+
+Every reservation save or delete appends a ReservationEvent in the same
+transaction. Event ids are the sequence numbers: consumers remember the
+last id they processed and read forward from it.
+
+Old events are dropped in id-ordered segments. Retention deletes whole
+segments older than a cutoff. Compaction keeps only the newest event per
+reservation up to a sequence number, which is all a state-syncing
+consumer needs.
+
+With sharding each shard keeps its own log, in its own id range, written
+in the same transaction as the shard's reservations; consumers read each
+shard's log separately.
+
+Ids are handed out at insert but become visible at commit, so on a
+database with concurrent writers (PostgreSQL) an event can appear below
+an id a consumer has already read. Reads there stop short of the first
+event younger than BOOKING_EVENT_READ_LAG seconds, which must exceed the
+longest booking transaction. SQLite commits one writer at a time, in id
+order, and is read without the lag.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Exists, Max, Min, OuterRef
+from django.utils import timezone
+
+from .models import ReservationEvent
+
+EVENT_FIELDS = (
+    'id', 'event_type', 'reservation_id', 'user_id', 'desk_id', 'date',
+    'status', 'previous_status', 'created_at',
+)
+MAX_BATCH_SIZE = 1000
+SEGMENT_SIZE = 5000
+
+
+def event_type_for(status, previous_status, created, deleted=False):
+    if deleted:
+        return 'deleted'
+    if created:
+        return 'created'
+    if status == previous_status:
+        return 'updated'
+    if status in ('cancelled', 'checked_in'):
+        return status
+    return 'status_changed'
+
+
+def record_event(reservation, event_type, previous_status=''):
+    return ReservationEvent.objects.using(reservation._state.db).create(
+        event_type=event_type,
+        reservation_id=reservation.pk,
+        user_id=reservation.user_id,
+        desk_id=reservation.desk_id,
+        date=reservation.date,
+        status=reservation.status,
+        previous_status=previous_status or '',
+    )
+
+
+def read_events(after=0, limit=MAX_BATCH_SIZE, using=None):
+    """
+    Events with id > after, oldest first, as dicts.
+
+    Returns (events, has_more, oldest) where oldest is the smallest id still
+    stored; a consumer whose `after` is below oldest - 1 has missed events
+    dropped by retention or compaction. Recent events may be held back, see
+    the module docstring.
+    """
+    limit = max(1, min(limit, MAX_BATCH_SIZE))
+    log = ReservationEvent.objects.using(using)
+    visible = log.filter(id__gt=after)
+    if connections[using or DEFAULT_DB_ALIAS].vendor != 'sqlite':
+        cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'BOOKING_EVENT_READ_LAG', 5))
+        recent = visible.filter(created_at__gt=cutoff).aggregate(first=Min('id'))['first']
+        if recent is not None:
+            visible = visible.filter(id__lt=recent)
+    events = list(visible.order_by('id').values(*EVENT_FIELDS)[:limit + 1])
+    has_more = len(events) > limit
+    oldest = log.aggregate(oldest=Min('id'))['oldest']
+    return events[:limit], has_more, oldest
+
+
+def _segments(queryset, segment_size):
+    """Yield (low, high) id bounds covering queryset in segment_size steps."""
+    bounds = queryset.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    for low in range(bounds['low'], bounds['high'] + 1, segment_size):
+        yield low, min(low + segment_size - 1, bounds['high'])
+
+
+def prune_events(before, segment_size=SEGMENT_SIZE, using=None):
+    """Delete events created before `before`. Returns the number deleted."""
+    old = ReservationEvent.objects.using(using).filter(created_at__lt=before)
+    deleted = 0
+    for low, high in _segments(old, segment_size):
+        deleted += old.filter(id__range=(low, high)).delete()[0]
+    return deleted
+
+
+def compact_events(upto, segment_size=SEGMENT_SIZE, using=None):
+    """
+    Keep only the newest event per reservation among events with id <= upto.
+
+    A reservation's newest event is kept even when it lies below upto, so
+    replaying a compacted log still yields every reservation's last state.
+    Returns the number of events deleted.
+    """
+    scope = ReservationEvent.objects.using(using).filter(id__lte=upto)
+    newer = ReservationEvent.objects.using(using).filter(
+        reservation_id=OuterRef('reservation_id'), id__gt=OuterRef('id')
+    )
+    deleted = 0
+    for low, high in _segments(scope, segment_size):
+        deleted += scope.filter(Exists(newer), id__range=(low, high)).delete()[0]
+    return deleted
@@ -0,0 +1,283 @@
+"""
+Desk positions from floor-plan SVGs (SRS 3.4.3).
+
+An element stands for a desk when its `data-desk` attribute, or failing
+that its `id`, is the desk's identifier. Its position is the centre of
+the bounding box of everything it draws (itself and its children) after
+applying every transform on the way down from the root, in the SVG's user
+units. Content that isn't drawn in place (<defs>, <symbol>, clip paths,
+masks...) is skipped.
+
+The file is read with iterparse and every element is dropped as soon as it
+ends, so memory stays flat however large the plan is: only the open
+elements, their transforms and the boxes of open desk elements are held.
+Paths contribute their end and control points, which bound the curve;
+arcs their end points only.
+"""
+import math
+import re
+from collections import namedtuple
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+try:
+    from defusedxml.ElementTree import iterparse
+except ImportError:  # pragma: no cover - optional dependency
+    from xml.etree.ElementTree import iterparse
+
+from .changes import reset_changes
+from .models import Desk
+from .sharding import shard_aliases
+
+DESK_ATTRIBUTE = 'data-desk'
+NOT_RENDERED = frozenset({
+    'defs', 'symbol', 'clipPath', 'mask', 'pattern', 'marker', 'linearGradient', 'radialGradient',
+    'filter', 'metadata', 'title', 'desc', 'style', 'script',
+})
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+# Sent inside the transaction replacing desk positions in bulk, with the area
+# and desk ids and the database.
+positions_changed = Signal()
+
+ImportResult = namedtuple('ImportResult', 'updated located missing unknown')
+
+NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+NUMBER_RE = re.compile(NUMBER)
+TRANSFORM_RE = re.compile(r'(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)')
+PATH_TOKEN_RE = re.compile(rf'([MmZzLlHhVvCcSsQqTtAa])|({NUMBER})')
+PATH_ARITY = {'M': 2, 'L': 2, 'T': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'A': 7, 'Z': 0}
+
+
+# Transforms: (a, b, c, d, e, f) maps (x, y) to (ax + cy + e, bx + dy + f).
+
+def _multiply(m, n):
+    """The transform applying n, then m."""
+    return (
+        m[0] * n[0] + m[2] * n[1],
+        m[1] * n[0] + m[3] * n[1],
+        m[0] * n[2] + m[2] * n[3],
+        m[1] * n[2] + m[3] * n[3],
+        m[0] * n[4] + m[2] * n[5] + m[4],
+        m[1] * n[4] + m[3] * n[5] + m[5],
+    )
+
+
+def _apply(m, x, y):
+    return m[0] * x + m[2] * y + m[4], m[1] * x + m[3] * y + m[5]
+
+
+def parse_transform(value):
+    """The matrix of an SVG transform list such as 'translate(10 20) rotate(45)'."""
+    matrix = IDENTITY
+    for name, arguments in TRANSFORM_RE.findall(value):
+        args = [float(number) for number in NUMBER_RE.findall(arguments)]
+        if name == 'matrix' and len(args) == 6:
+            step = tuple(args)
+        elif name == 'translate' and args:
+            step = (1.0, 0.0, 0.0, 1.0, args[0], args[1] if len(args) > 1 else 0.0)
+        elif name == 'scale' and args:
+            step = (args[0], 0.0, 0.0, args[1] if len(args) > 1 else args[0], 0.0, 0.0)
+        elif name == 'rotate' and args:
+            angle = math.radians(args[0])
+            cos, sin = math.cos(angle), math.sin(angle)
+            step = (cos, sin, -sin, cos, 0.0, 0.0)
+            if len(args) == 3:
+                cx, cy = args[1], args[2]
+                step = _multiply(_multiply((1.0, 0.0, 0.0, 1.0, cx, cy), step), (1.0, 0.0, 0.0, 1.0, -cx, -cy))
+        elif name == 'skewX' and args:
+            step = (1.0, 0.0, math.tan(math.radians(args[0])), 1.0, 0.0, 0.0)
+        elif name == 'skewY' and args:
+            step = (1.0, math.tan(math.radians(args[0])), 0.0, 1.0, 0.0, 0.0)
+        else:
+            continue
+        matrix = _multiply(matrix, step)
+    return matrix
+
+
+# Geometry, in the element's own coordinates
+
+def _length(element, name, default=0.0):
+    value = element.get(name)
+    if value is None:
+        return default
+    match = NUMBER_RE.match(value.strip())
+    if match is None or value.strip().endswith('%'):
+        return default
+    return float(match.group())
+
+
+def _numbers(value):
+    return [float(number) for number in NUMBER_RE.findall(value or '')]
+
+
+def _path_points(d):
+    """End and control points of a path, absolute."""
+    points = []
+    x = y = start_x = start_y = 0.0
+    command, args = None, []
+    tokens = [(letter, number) for letter, number in PATH_TOKEN_RE.findall(d or '')]
+    tokens.append(('Z', ''))  # flushes the last command's arguments
+
+    def run(command, args):
+        nonlocal x, y, start_x, start_y
+        upper = command.upper()
+        relative = command != upper
+        arity = PATH_ARITY[upper]
+        if arity == 0:
+            x, y = start_x, start_y
+            return
+        for i in range(0, len(args) - arity + 1, arity):
+            group = args[i:i + arity]
+            if upper == 'H':
+                x = group[0] + (x if relative else 0.0)
+            elif upper == 'V':
+                y = group[0] + (y if relative else 0.0)
+            elif upper == 'A':
+                x, y = group[5] + (x if relative else 0.0), group[6] + (y if relative else 0.0)
+            else:
+                base_x, base_y = (x, y) if relative else (0.0, 0.0)
+                for j in range(0, arity, 2):
+                    points.append((group[j] + base_x, group[j + 1] + base_y))
+                x, y = points[-1]
+                if upper == 'M' and i == 0:
+                    start_x, start_y = x, y
+                continue
+            points.append((x, y))
+
+    for letter, number in tokens:
+        if letter:
+            if command is not None:
+                run(command, args)
+            command, args = letter, []
+        elif command is not None:
+            args.append(float(number))
+    return points
+
+
+def _points(tag, element):
+    """Points whose bounding box is the element's own drawing."""
+    if tag == 'rect' or tag == 'image' or tag == 'use':
+        x, y = _length(element, 'x'), _length(element, 'y')
+        width, height = _length(element, 'width'), _length(element, 'height')
+        return [(x, y), (x + width, y), (x, y + height), (x + width, y + height)]
+    if tag == 'circle' or tag == 'ellipse':
+        cx, cy = _length(element, 'cx'), _length(element, 'cy')
+        rx = _length(element, 'r') if tag == 'circle' else _length(element, 'rx')
+        ry = _length(element, 'r') if tag == 'circle' else _length(element, 'ry')
+        return [(cx - rx, cy - ry), (cx + rx, cy - ry), (cx - rx, cy + ry), (cx + rx, cy + ry)]
+    if tag == 'line':
+        return [(_length(element, 'x1'), _length(element, 'y1')), (_length(element, 'x2'), _length(element, 'y2'))]
+    if tag == 'polyline' or tag == 'polygon':
+        numbers = _numbers(element.get('points'))
+        return list(zip(numbers[0::2], numbers[1::2]))
+    if tag == 'path':
+        return _path_points(element.get('d'))
+    if tag == 'text':
+        return [(_length(element, 'x'), _length(element, 'y'))]
+    return []
+
+
+def _local_name(tag):
+    return tag.rpartition('}')[2] if isinstance(tag, str) else ''
+
+
+def extract_desk_positions(source, identifiers):
+    """
+    Stream the SVG in source (a path or binary file) and return
+    ({identifier: (x, y)}, {data-desk values matching none of identifiers}).
+    """
+    identifiers = set(identifiers)
+    positions = {}
+    unknown = set()
+    matrices = [IDENTITY]
+    elements = []  # open elements, to detach each from its parent when it ends
+    opened = []  # per open element: its desk box, or None
+    boxes = []  # open desk boxes: [identifier, min x, min y, max x, max y]
+    hidden = 0  # depth inside content that isn't drawn in place
+
+    for event, element in iterparse(source, events=('start', 'end')):
+        tag = _local_name(element.tag)
+        if event == 'start':
+            transform = element.get('transform')
+            matrices.append(_multiply(matrices[-1], parse_transform(transform)) if transform else matrices[-1])
+            elements.append(element)
+            if hidden or tag in NOT_RENDERED:
+                hidden += 1
+                opened.append(None)
+                continue
+
+            box = None
+            tagged = element.get(DESK_ATTRIBUTE)
+            identifier = tagged if tagged is not None else element.get('id')
+            if identifier in identifiers:
+                box = [identifier, math.inf, math.inf, -math.inf, -math.inf]
+                boxes.append(box)
+            elif tagged is not None:
+                unknown.add(tagged)
+            opened.append(box)
+
+            if boxes:
+                for point in _points(tag, element):
+                    x, y = _apply(matrices[-1], *point)
+                    for open_box in boxes:
+                        open_box[1] = min(open_box[1], x)
+                        open_box[2] = min(open_box[2], y)
+                        open_box[3] = max(open_box[3], x)
+                        open_box[4] = max(open_box[4], y)
+            continue
+
+        matrices.pop()
+        elements.pop()
+        box = opened.pop()
+        if hidden:
+            hidden -= 1
+        if box is not None:
+            boxes.pop()
+            identifier, min_x, min_y, max_x, max_y = box
+            if min_x <= max_x and identifier not in positions:
+                positions[identifier] = ((min_x + max_x) / 2, (min_y + max_y) / 2)
+        element.clear()
+        if elements:
+            # Ended elements are their parent's only child by now.
+            elements[-1].remove(element)
+    return positions, unknown
+
+
+def import_desk_positions(area):
+    """
+    Set the positions of the area's desks from its floor plan with one
+    bulk update; returns an ImportResult with the counts, the area's desks
+    the plan doesn't show (missing) and desk tags naming no desk of the
+    area (unknown).
+    """
+    desks = {
+        desk.identifier: desk
+        for desk in Desk.objects.filter(room__area=area).only('id', 'identifier', 'pos_x', 'pos_y', 'room_id')
+    }
+    with area.map_svg.open('rb') as handle:
+        positions, unknown = extract_desk_positions(handle, desks)
+
+    now = timezone.now()
+    changed = []
+    for identifier, (x, y) in positions.items():
+        desk = desks[identifier]
+        x, y = round(x), round(y)
+        if (desk.pos_x, desk.pos_y) != (x, y):
+            desk.pos_x, desk.pos_y, desk.updated_at = x, y, now
+            changed.append(desk)
+
+    if changed:
+        # bulk_update() sends no signals: replicate, record and notify here.
+        with transaction.atomic():
+            Desk.objects.bulk_update(changed, ['pos_x', 'pos_y', 'updated_at'])
+            for alias in shard_aliases():
+                Desk.objects.using(alias).bulk_update(changed, ['pos_x', 'pos_y', 'updated_at'])
+            # One reload for clients instead of a change per desk.
+            reset_changes(area.pk)
+            positions_changed.send(
+                sender=Desk, area_id=area.pk, desk_ids=[desk.pk for desk in changed], using=DEFAULT_DB_ALIAS
+            )
+    return ImportResult(len(changed), len(positions), sorted(set(desks) - set(positions)), sorted(unknown))
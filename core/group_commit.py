@@ -0,0 +1,115 @@
+"""
+Group commit for booking writes (BOOKING_GROUP_COMMIT).
+
+On SQLite every transaction ends in an fsync, so one transaction per
+booking caps bookings/s at the disk's commit rate. With group commit on,
+a request hands its write to submit() and blocks; one writer thread per
+database collects the writes queued within BOOKING_GROUP_COMMIT_WINDOW_MS
+(up to BOOKING_GROUP_COMMIT_MAX of them) and runs them in one transaction,
+each inside its own savepoint. A write that fails (e.g. an IntegrityError
+from the (desk, date) unique constraint, also against an earlier write of
+the same batch) rolls back its savepoint only and its exception is raised
+in its request; the others commit together. Requests return only after
+their batch has committed, and on_commit callbacks run at that commit.
+A request waits at most BOOKING_GROUP_COMMIT_TIMEOUT seconds and then
+raises TimeoutError; a write still queued then is dropped unwritten.
+
+The writer runs the writes on its own connection, so they must not depend
+on the request's open transaction (there is none unless the caller opened
+one, which defeats the purpose).
+"""
+import queue
+import threading
+import time
+from concurrent import futures
+
+from django.conf import settings
+from django.db import connections, transaction
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, 'BOOKING_GROUP_COMMIT', False)
+
+
+class _Writer:
+    """Commits the writes queued for one database in batches, on one thread."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name=f'group-commit-{alias}', daemon=True)
+        self.thread.start()
+
+    def _next_batch(self):
+        batch = [self.queue.get()]
+        window = getattr(settings, 'BOOKING_GROUP_COMMIT_WINDOW_MS', 2) / 1000
+        limit = getattr(settings, 'BOOKING_GROUP_COMMIT_MAX', 50)
+        deadline = time.monotonic() + window
+        while len(batch) < limit:
+            try:
+                # Writes queued during the previous commit are taken at once.
+                batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Writes whose request gave up waiting are dropped.
+            batch = [(write, future) for write, future in self._next_batch()
+                     if future.set_running_or_notify_cancel()]
+            try:
+                self._commit(batch)
+            except Exception as exc:
+                # The connection or the commit itself failed: nothing in the
+                # batch was written. The thread carries on with the next one.
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def _commit(self, batch):
+        if not batch:
+            return
+        connections[self.alias].close_if_unusable_or_obsolete()
+        results = []
+        with transaction.atomic(using=self.alias):
+            for write, future in batch:
+                try:
+                    with transaction.atomic(using=self.alias):
+                        results.append((future, write(), None))
+                except Exception as exc:
+                    results.append((future, None, exc))
+        for future, result, exc in results:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+def _writer(alias):
+    with _writers_lock:
+        writer = _writers.get(alias)
+        if writer is None or not writer.thread.is_alive():
+            writer = _writers[alias] = _Writer(alias)
+        return writer
+
+
+def submit(alias, write):
+    """
+    Run write() in the next batch committed on database alias and return
+    its result once the batch has committed, or raise its exception.
+
+    Raises TimeoutError after BOOKING_GROUP_COMMIT_TIMEOUT seconds. If the
+    write was still queued it never runs; if its batch was already
+    committing, it may or may not have been written.
+    """
+    future = futures.Future()
+    _writer(alias).queue.put((write, future))
+    try:
+        return future.result(timeout=getattr(settings, 'BOOKING_GROUP_COMMIT_TIMEOUT', 10))
+    except futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f'No commit on {alias} within the group commit timeout') from None
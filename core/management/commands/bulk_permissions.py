@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Area
+from core.permissions import bulk_grant, bulk_replace, bulk_revoke, resolve_users
+
+ACTIONS = {'grant': bulk_grant, 'revoke': bulk_revoke, 'replace': bulk_replace}
+
+
+def _csv(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def _ids(value):
+    try:
+        return [int(part) for part in _csv(value)]
+    except ValueError:
+        raise CommandError(f'Expected comma-separated ids, got {value!r}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Grant, revoke or replace the area permissions of many users at once. '
+        'Users are selected by id, employee id or department; replace leaves '
+        'each of them with exactly the given areas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=sorted(ACTIONS))
+        parser.add_argument('--areas', type=_ids, default=[], help='Comma-separated area ids')
+        parser.add_argument('--user-ids', type=_ids, default=[], help='Comma-separated user ids')
+        parser.add_argument('--employee-ids', type=_csv, default=[], help='Comma-separated employee ids')
+        parser.add_argument(
+            '--employee-ids-file',
+            help='File with one employee id per line (for onboarding lists)',
+        )
+        parser.add_argument('--departments', type=_csv, default=[], help='Comma-separated departments')
+        parser.add_argument('--dry-run', action='store_true', help='Report the counts without changing anything')
+
+    def handle(self, *args, **options):
+        action = options['action']
+        employee_ids = list(options['employee_ids'])
+        if options['employee_ids_file']:
+            with open(options['employee_ids_file']) as handle:
+                employee_ids += [line.strip() for line in handle if line.strip()]
+        if not (options['user_ids'] or employee_ids or options['departments']):
+            raise CommandError('Select users with --user-ids, --employee-ids(-file) or --departments')
+
+        area_ids = set(options['areas'])
+        if not area_ids and action != 'replace':
+            raise CommandError('--areas is required')
+        missing = area_ids - set(Area.objects.filter(id__in=area_ids).values_list('id', flat=True))
+        if missing:
+            raise CommandError(f'Unknown areas: {sorted(missing)}')
+
+        user_ids, unknown = resolve_users(options['user_ids'], employee_ids, options['departments'])
+        if unknown:
+            details = '; '.join(f'{name}: {", ".join(map(str, values[:20]))}' for name, values in unknown.items())
+            raise CommandError(f'No users match {details}')
+
+        started = time.monotonic()
+        result = ACTIONS[action](user_ids, area_ids, dry_run=options['dry_run'])
+        self.stdout.write(
+            f'{action}: {result.users} users, {result.areas} areas, {result.created} permissions created, '
+            f'{result.deleted} deleted in {time.monotonic() - started:.2f} s'
+            + (' (dry run, nothing changed)' if options['dry_run'] else '')
+        )
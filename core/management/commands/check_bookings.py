@@ -0,0 +1,134 @@
+import csv
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+
+from core.consistency import CHECKS, CHUNK_SIZE, Result, check_area, check_quota, fix_violations
+from core.models import Area, User
+
+# Quota tasks per worker, so that uneven id ranges still keep every worker busy.
+QUOTA_TASKS_PER_WORKER = 4
+
+
+def _setup_worker():
+    # Spawned workers start without Django; forked ones just reconnect.
+    import django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        'Check every reservation against the booking invariants (unavailable '
+        'desks, area permissions, weekly quota, check-in times), report the '
+        'violations and optionally fix them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes; 0 checks in this process',
+        )
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='Only check reservations on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Rows fetched per round trip',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write every violation (check, reservation id) to this CSV file',
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Cancel bookings on unavailable desks or without permission, mark future confirmed '
+                 'over-quota bookings pending approval and clear stray check-in times',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 0 or options['chunk_size'] < 1:
+            raise CommandError('--workers must be >= 0 and --chunk-size >= 1')
+        started = time.monotonic()
+        result = self.run_checks(options['workers'], options['since'], options['chunk_size'])
+        self.stdout.write(
+            f'Checked {result.rows} reservation rows in {time.monotonic() - started:.1f} s '
+            f'({options["workers"] or "no"} workers)'
+        )
+        self.report(result)
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as handle:
+                writer = csv.writer(handle)
+                writer.writerow(['check', 'reservation_id'])
+                for check in CHECKS:
+                    writer.writerows((check, pk) for pk in result.ids[check])
+            self.stdout.write(f'Wrote {result.total} violations to {options["output"]}')
+
+        if options['fix'] and result.total:
+            fixed, left = fix_violations(result, batch_size=options['chunk_size'])
+            for check, count in fixed.items():
+                self.stdout.write(f'Fixed {count} {check}')
+            if left['over_quota']:
+                self.stdout.write(self.style.WARNING(
+                    f'{left["over_quota"]} over_quota are past, checked in or approved and were left unchanged'
+                ))
+            if result.count('checked_in_at_missing'):
+                self.stdout.write(self.style.WARNING(
+                    f'{result.count("checked_in_at_missing")} checked_in_at_missing need a manual fix'
+                ))
+
+    def run_checks(self, workers, since, chunk_size):
+        tasks = [(check_area, (area_id, since, chunk_size))
+                 for area_id in Area.objects.order_by('id').values_list('id', flat=True)]
+        tasks += [(check_quota, (first, last, since, chunk_size))
+                  for first, last in self.user_ranges(max(workers, 1) * QUOTA_TASKS_PER_WORKER)]
+
+        result = Result()
+        if workers == 0:
+            for function, args in tasks:
+                result.merge(function(*args))
+            return result
+
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context(), initializer=_setup_worker
+        ) as pool:
+            for future in as_completed([pool.submit(function, *args) for function, args in tasks]):
+                result.merge(future.result())
+        return result
+
+    def user_ranges(self, count):
+        """Split the user ids into up to `count` contiguous [first, last] ranges."""
+        bounds = User.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            return []
+        first, last = bounds['first'], bounds['last']
+        step = max(1, -(-(last - first + 1) // count))
+        return [(start, min(start + step - 1, last)) for start in range(first, last + 1, step)]
+
+    def report(self, result):
+        if not result.total:
+            self.stdout.write(self.style.SUCCESS('No violations found'))
+            return
+        for check, description in CHECKS.items():
+            count = result.count(check)
+            style = self.style.ERROR if count else self.style.SUCCESS
+            self.stdout.write(style(f'{check:22} {count:>10}  {description}'))
+            for row in result.samples[check]:
+                self.stdout.write(
+                    f'    #{row.id} user {row.user_id} desk {row.desk_id} on {row.date} ({row.status})'
+                )
@@ -5,6 +5,7 @@ from datetime import date, timedelta
 import random
 
 from core.models import Area, Room, Desk, Reservation, UserPermission
+from core.sharding import all_databases, count_across_shards, shard_for_desk
 
 User = get_user_model()
 
@@ -39,7 +40,8 @@ class Command(BaseCommand):
 
     def clear_data(self):
         """Clear existing data in correct order (foreign keys)"""
-        Reservation.objects.all().delete()
+        for db in all_databases():
+            Reservation.objects.using(db).all().delete()
         UserPermission.objects.all().delete()
         Desk.objects.all().delete()
         Room.objects.all().delete()
@@ -256,7 +258,7 @@ class Command(BaseCommand):
                             weights=[20, 70, 10]  # Most people check in
                         )[0]
                         
-                        reservation, created = Reservation.objects.get_or_create(
+                        reservation, created = Reservation.objects.using(shard_for_desk(desk.id)).get_or_create(
                             user=user,
                             desk=desk,
                             date=current_date,
@@ -265,7 +267,7 @@ class Command(BaseCommand):
                         
             current_date += timedelta(days=1)
             
-        reservation_count = Reservation.objects.count()
+        reservation_count = count_across_shards(lambda db: Reservation.objects.using(db))
         self.stdout.write(f'Created {reservation_count} sample reservations')
 
     def print_summary(self):
@@ -278,7 +280,7 @@ class Command(BaseCommand):
         self.stdout.write(f'Desks: {Desk.objects.count()}')
         self.stdout.write(f'Users: {User.objects.filter(is_superuser=False).count()}')
         self.stdout.write(f'User Permissions: {UserPermission.objects.count()}')
-        self.stdout.write(f'Reservations: {Reservation.objects.count()}')
+        self.stdout.write(f'Reservations: {count_across_shards(lambda db: Reservation.objects.using(db))}')
         self.stdout.write('\nDESK STATUS DISTRIBUTION:')
         for status, label in Desk.STATUS_CHOICES:
             count = Desk.objects.filter(status=status).count()
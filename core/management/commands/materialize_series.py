@@ -0,0 +1,35 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.series import BATCH_SIZE, HORIZON_DAYS, materialize
+
+
+class Command(BaseCommand):
+    help = (
+        f'Create the reservations of recurring bookings for the next {HORIZON_DAYS} days. '
+        'Run daily; later occurrences stay pending on their series'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Series materialized per transaction',
+        )
+        parser.add_argument(
+            '--today',
+            type=date.fromisoformat,
+            help='Materialize as of this date (YYYY-MM-DD) instead of today',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be >= 1')
+        started = time.monotonic()
+        created = materialize(options['today'], batch_size=options['batch_size'])
+        self.stdout.write(
+            f'Created {created} reservations from recurring bookings in {time.monotonic() - started:.1f} s'
+        )
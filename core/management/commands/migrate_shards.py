@@ -0,0 +1,149 @@
+from contextlib import ExitStack
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from core.changes import reset_changes
+from core.models import (
+    Area, AreaVersion, Desk, DeskChange, DeskUsage, Reservation, ReservationEvent, ReservationSeries, Room, User,
+    UserPermission, WaitlistEntry,
+)
+from core.popularity import rebuild_usage
+from core.sharding import seed_id_ranges, shard_aliases, shard_for_area, shard_for_desk
+
+# Parents before children, for the foreign keys.
+REFERENCE_MODELS = (User, Area, Room, Desk, UserPermission)
+# Derived per-area tables: rebuilt in the shards rather than moved.
+DERIVED_MODELS = (AreaVersion, DeskChange, DeskUsage)
+
+
+class Command(BaseCommand):
+    help = (
+        'Migrate every shard database (settings.BOOKING_SHARDS), start its '
+        'id ranges and copy the reference data (users, areas, rooms, desks, '
+        'permissions) from the default database into it. Bookings made before '
+        'sharding (series, reservations, waitlist entries, events) are then '
+        'moved from the default database to their area\'s shard'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows copied per insert',
+        )
+
+    def handle(self, *args, **options):
+        shards = shard_aliases()
+        if not shards:
+            self.stdout.write('Sharding is off (BOOKING_SHARD_COUNT=0); nothing to do.')
+            return
+
+        for alias in shards:
+            self.stdout.write(f'Migrating {alias}...')
+            call_command('migrate', database=alias, interactive=False, verbosity=0)
+            seed_id_ranges(alias)
+            with transaction.atomic(using=alias):
+                for model in REFERENCE_MODELS:
+                    copied = self.copy(model, alias, options['batch_size'])
+                    self.stdout.write(f'  {model._meta.verbose_name_plural}: {copied}')
+        self.move_bookings(shards, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{len(shards)} shards up to date'))
+
+    def copy(self, model, alias, batch_size):
+        """Insert or update every default-database row of model in alias."""
+        fields = [field.attname for field in model._meta.concrete_fields]
+        rows = model._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk')
+        copied = 0
+        batch = []
+        for row in rows.values(*fields).iterator(chunk_size=batch_size):
+            batch.append(model(**row))
+            if len(batch) == batch_size:
+                copied += self.upsert(model, alias, batch, fields)
+                batch = []
+        if batch:
+            copied += self.upsert(model, alias, batch, fields)
+        return copied
+
+    def upsert(self, model, alias, batch, fields):
+        pk = model._meta.pk.attname
+        model._base_manager.using(alias).bulk_create(
+            batch, update_conflicts=True, unique_fields=[pk],
+            update_fields=[name for name in fields if name != pk],
+        )
+        return len(batch)
+
+    def move_bookings(self, shards, batch_size):
+        """
+        Move the sharded rows still in the default database to their shard,
+        in one transaction per database. Rows get ids in their shard's range
+        (shard_for_id() must find them) and references between them follow.
+        """
+        if not Reservation.objects.using(DEFAULT_DB_ALIAS).exists() \
+                and not ReservationSeries.objects.using(DEFAULT_DB_ALIAS).exists() \
+                and not WaitlistEntry.objects.using(DEFAULT_DB_ALIAS).exists() \
+                and not ReservationEvent.objects.using(DEFAULT_DB_ALIAS).exists():
+            return
+        with ExitStack() as stack:
+            for alias in [DEFAULT_DB_ALIAS, *shards]:
+                stack.enter_context(transaction.atomic(using=alias))
+            series_ids = self.move(ReservationSeries, lambda row: shard_for_desk(row['desk_id']), batch_size)
+            reservation_ids = self.move(
+                Reservation, lambda row: shard_for_desk(row['desk_id']), batch_size, series_id=series_ids,
+            )
+            self.move(
+                WaitlistEntry, lambda row: shard_for_area(row['area_id']), batch_size, reservation_id=reservation_ids,
+            )
+            # Events keep their order; their consumers must restart from each shard's log.
+            self.move(
+                ReservationEvent, lambda row: shard_for_desk(row['desk_id']), batch_size,
+                reservation_id=reservation_ids,
+            )
+            for model in DERIVED_MODELS:
+                model.objects.using(DEFAULT_DB_ALIAS).all().delete()
+        # Usage counters are recomputed; delta-sync clients reload their snapshots.
+        rebuild_usage()
+        for area_id in Area.objects.using(DEFAULT_DB_ALIAS).values_list('pk', flat=True):
+            reset_changes(area_id)
+
+    def move(self, model, shard_of, batch_size, **remap):
+        """
+        Move model's default-database rows to shard_of(row), giving them new
+        ids and translating the fields in remap ({field: {old id: new id}});
+        returns {old id: new id}.
+        """
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        names = [field.attname for field in fields]
+        rows = model._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk')
+        new_ids = {}
+        last = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last).values('id', *names)[:batch_size])
+            if not batch:
+                break
+            last = batch[-1]['id']
+            by_shard = {}
+            for row in batch:
+                for name, ids in remap.items():
+                    row[name] = ids.get(row[name], row[name])
+                by_shard.setdefault(shard_of(row), []).append(row)
+            for alias, shard_rows in by_shard.items():
+                new_ids.update(zip((row['id'] for row in shard_rows), self.insert(model, alias, fields, shard_rows)))
+        # A raw delete: the rows live on in their shards, nothing cascades.
+        model._base_manager.using(DEFAULT_DB_ALIAS).all()._raw_delete(DEFAULT_DB_ALIAS)
+        self.stdout.write(f'  {model._meta.verbose_name_plural} moved: {len(new_ids)}')
+        return new_ids
+
+    def insert(self, model, alias, fields, rows):
+        """Insert rows as they are (raw: created_at keeps its value) and return their new ids."""
+        objs = [model(**{field.attname: row[field.attname] for field in fields}) for row in rows]
+        size = max(connections[alias].ops.bulk_batch_size(fields, objs), 1)
+        ids = []
+        for start in range(0, len(objs), size):
+            returned = model._base_manager.using(alias)._insert(
+                objs[start:start + size], fields, returning_fields=[model._meta.pk], raw=True,
+            )
+            ids += [row[0] for row in returned]
+        return ids
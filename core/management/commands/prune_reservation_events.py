@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.events import SEGMENT_SIZE, compact_events, prune_events
+from core.models import ReservationEvent
+from core.sharding import all_databases
+
+
+class Command(BaseCommand):
+    help = 'Drop reservation events past retention and optionally compact older ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=getattr(settings, 'BOOKING_EVENT_RETENTION_DAYS', 90),
+            help='Delete events older than this many days',
+        )
+        parser.add_argument(
+            '--compact-days',
+            type=int,
+            help='Keep only the newest event per reservation among events older than this many days',
+        )
+        parser.add_argument(
+            '--segment-size',
+            type=int,
+            default=SEGMENT_SIZE,
+            help='Number of sequence ids deleted per statement',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        segment_size = options['segment_size']
+
+        # Each shard keeps its own log.
+        databases = all_databases()
+        before = now - timedelta(days=options['retention_days'])
+        pruned = sum(prune_events(before, segment_size, using=db) for db in databases)
+        self.stdout.write(f'Pruned {pruned} events older than {options["retention_days"]} days')
+
+        if options['compact_days'] is not None:
+            cutoff = now - timedelta(days=options['compact_days'])
+            compacted = 0
+            for db in databases:
+                upto = (
+                    ReservationEvent.objects.using(db).filter(created_at__lt=cutoff)
+                    .order_by('-id').values_list('id', flat=True).first()
+                )
+                if upto:
+                    compacted += compact_events(upto, segment_size, using=db)
+            self.stdout.write(f'Compacted {compacted} superseded events')
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.7 on 2026-10-19 18:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('promoted', 'Promoted')], default='waiting', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('promoted_at', models.DateTimeField(blank=True, null=True)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='core.area')),
+                ('desk', models.ForeignKey(blank=True, help_text='Leave empty to wait for any desk in the area', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='core.desk')),
+                ('reservation', models.ForeignKey(blank=True, help_text='Reservation created when the entry was promoted', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.reservation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'waitlist entries',
+                'ordering': ['date', 'created_at', 'id'],
+                'indexes': [models.Index(fields=['desk', 'date', 'status', 'created_at'], name='core_waitli_desk_id_2d9714_idx'), models.Index(fields=['area', 'date', 'status', 'created_at'], name='core_waitli_area_id_6791fc_idx'), models.Index(fields=['user', 'status'], name='core_waitli_user_id_b6e6ac_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.7 on 2026-10-19 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['date', 'created_at'], name='core_reserv_date_e05e67_idx'),
+        ),
+    ]
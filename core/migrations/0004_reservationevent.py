@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-19 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_reservation_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('status_changed', 'Status Changed'), ('cancelled', 'Cancelled'), ('checked_in', 'Checked In'), ('deleted', 'Deleted')], max_length=20)),
+                ('reservation_id', models.BigIntegerField(db_index=True)),
+                ('user_id', models.BigIntegerField()),
+                ('desk_id', models.BigIntegerField()),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('previous_status', models.CharField(blank=True, max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
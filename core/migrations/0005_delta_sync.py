@@ -0,0 +1,36 @@
+# Generated by Django 5.0.7 on 2026-10-19 18:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_reservationevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AreaVersion',
+            fields=[
+                ('area', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='change_version', serialize=False, to='core.area')),
+                ('version', models.BigIntegerField(default=0)),
+                ('floor', models.BigIntegerField(default=0, help_text='Oldest version a client can sync from without a full snapshot')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DeskChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(blank=True, help_text='Empty for changes to the desk itself, which affect every date', null=True)),
+                ('version', models.BigIntegerField()),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='desk_changes', to='core.area')),
+                ('desk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='core.desk')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['area', 'version'], name='core_deskch_area_id_ffe843_idx')],
+                'unique_together': {('desk', 'date')},
+            },
+        ),
+    ]
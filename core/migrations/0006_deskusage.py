@@ -0,0 +1,53 @@
+# Generated by Django 5.0.7 on 2026-10-19 18:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def backfill_usage(apps, schema_editor):
+    Reservation = apps.get_model('core', 'Reservation')
+    DeskUsage = apps.get_model('core', 'DeskUsage')
+    db = schema_editor.connection.alias
+    rows = (
+        Reservation.objects.using(db).exclude(status='cancelled')
+        .annotate(month=TruncMonth('date'))
+        .values('desk_id', 'desk__room__area_id', 'month')
+        .annotate(bookings=Count('id'))
+        .order_by()
+    )
+    DeskUsage.objects.using(db).bulk_create(
+        [
+            DeskUsage(desk_id=row['desk_id'], area_id=row['desk__room__area_id'],
+                      month=row['month'], bookings=row['bookings'])
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_delta_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeskUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('bookings', models.IntegerField(default=0)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='desk_usage', to='core.area')),
+                ('desk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='core.desk')),
+            ],
+            options={
+                'verbose_name_plural': 'desk usage',
+                'indexes': [models.Index(fields=['month'], name='core_deskus_month_48728a_idx')],
+                'unique_together': {('desk', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.7 on 2026-10-19 18:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_deskusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.room')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_reservations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date', 'start_time'],
+                'indexes': [models.Index(fields=['room', 'date', 'start_time'], name='core_roomre_room_id_f00f15_idx'), models.Index(fields=['user', 'date'], name='core_roomre_user_id_c7839c_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='roomreservation',
+            constraint=models.CheckConstraint(check=models.Q(('end_time__gt', models.F('start_time'))), name='room_reservation_ends_after_start'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.7 on 2026-10-19 18:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0007_roomreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupPermission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(blank=True, help_text='Grant access to every user whose department is exactly this value', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_permissions', to='core.area')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='area_permissions', to='auth.group')),
+            ],
+            options={
+                'ordering': ['area', 'department', 'group'],
+                'indexes': [models.Index(fields=['department'], name='core_groupp_departm_3617f4_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='grouppermission',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('department', ''), ('group__isnull', False)), models.Q(('group__isnull', True), models.Q(('department', ''), _negated=True)), _connector='OR'), name='group_permission_one_grantee'),
+        ),
+        migrations.AddConstraint(
+            model_name='grouppermission',
+            constraint=models.UniqueConstraint(condition=models.Q(('group__isnull', False)), fields=('area', 'group'), name='unique_group_area_permission'),
+        ),
+        migrations.AddConstraint(
+            model_name='grouppermission',
+            constraint=models.UniqueConstraint(condition=models.Q(('department', ''), _negated=True), fields=('area', 'department'), name='unique_department_area_permission'),
+        ),
+    ]
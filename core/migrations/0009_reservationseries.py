@@ -0,0 +1,59 @@
+# Generated by Django 5.0.7 on 2026-10-19 18:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_grouppermission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.PositiveSmallIntegerField(help_text='Bitmask of the booked weekdays: Monday = 1, Tuesday = 2, ... Sunday = 64')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, help_text='Last date of the series; leave empty to repeat indefinitely', null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('cancelled', 'Cancelled')], default='active', max_length=20)),
+                ('materialized_until', models.DateField(blank=True, help_text='Occurrences up to this date exist as reservations', null=True)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('desk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservation_series', to='core.desk')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservation_series', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'reservation series',
+                'ordering': ['start_date', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='series',
+            field=models.ForeignKey(blank=True, help_text='Recurring booking this reservation is an occurrence of', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='core.reservationseries'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationseries',
+            index=models.Index(fields=['status', 'materialized_until'], name='core_reserv_status_9e51f3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationseries',
+            index=models.Index(fields=['desk', 'status'], name='core_reserv_desk_id_19e275_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationseries',
+            index=models.Index(fields=['user', 'status'], name='core_reserv_user_id_204bb8_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reservationseries',
+            constraint=models.CheckConstraint(check=models.Q(('weekdays__gt', 0), ('weekdays__lt', 128)), name='reservation_series_weekdays'),
+        ),
+        migrations.AddConstraint(
+            model_name='reservationseries',
+            constraint=models.CheckConstraint(check=models.Q(('end_date__isnull', True), ('end_date__gte', models.F('start_date')), _connector='OR'), name='reservation_series_ends_after_start'),
+        ),
+    ]
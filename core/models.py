@@ -1,5 +1,8 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, models, router, transaction
+from django.contrib.auth.models import AbstractUser, Group
+
+from .sharding import ShardedQuerySet, shard_move_error
 
 
 class User(AbstractUser):
@@ -66,6 +69,19 @@ class Room(models.Model):
     def __str__(self):
         return f"{self.area.name} - {self.name}"
 
+    def clean(self):
+        super().clean()
+        error = shard_move_error(self)
+        if error:
+            raise ValidationError({'area': error})
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        error = shard_move_error(self) if using == DEFAULT_DB_ALIAS else None
+        if error:
+            raise ValidationError(error)
+        super().save(*args, **kwargs)
+
 
 class Desk(models.Model):
     """Represents a bookable desk"""
@@ -109,6 +125,26 @@ class Desk(models.Model):
     def __str__(self):
         return f"Desk {self.identifier}"
 
+    def clean(self):
+        super().clean()
+        error = shard_move_error(self)
+        if error:
+            raise ValidationError({'room': error})
+
+    # Change tracking (core/changes.py) commits together with the desk.
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        error = shard_move_error(self) if using == DEFAULT_DB_ALIAS else None
+        if error:
+            raise ValidationError(error)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            return super().delete(*args, **kwargs)
+
 
 class Reservation(models.Model):
     """Represents a desk booking by a user"""
@@ -139,18 +175,114 @@ class Reservation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     checked_in_at = models.DateTimeField(null=True, blank=True)
     notes = models.TextField(blank=True)
+    series = models.ForeignKey(
+        'ReservationSeries',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reservations',
+        help_text="Recurring booking this reservation is an occurrence of"
+    )
+
+    objects = ShardedQuerySet.as_manager()
 
     class Meta:
         ordering = ['-date', '-created_at']
-        unique_together = ['desk', 'date']  # Prevent double booking
+        constraints = [
+            # Prevent double booking. Released bookings (booking_rules.RELEASED_STATUSES)
+            # stay on record without holding the desk.
+            models.UniqueConstraint(
+                fields=['desk', 'date'], condition=~models.Q(status__in=['cancelled', 'no_show']),
+                name='unique_active_desk_date',
+            ),
+        ]
         indexes = [
             models.Index(fields=['user', 'date']),
             models.Index(fields=['desk', 'date']),
+            # Admin changelist: default ordering and date range filters
+            models.Index(fields=['date', 'created_at']),
         ]
 
     def __str__(self):
         return f"{self.user.username} - {self.desk.identifier} on {self.date}"
 
+    # Signal handlers (event log, waitlist promotion) write in the same
+    # transaction as the change itself.
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            return super().delete(*args, **kwargs)
+
+
+class ReservationSeries(models.Model):
+    """A desk booked on the same weekdays every week (see core/series.py)"""
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='reservation_series'
+    )
+    desk = models.ForeignKey(
+        Desk,
+        on_delete=models.CASCADE,
+        related_name='reservation_series'
+    )
+    weekdays = models.PositiveSmallIntegerField(
+        help_text="Bitmask of the booked weekdays: Monday = 1, Tuesday = 2, ... Sunday = 64"
+    )
+    start_date = models.DateField()
+    end_date = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Last date of the series; leave empty to repeat indefinitely"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='active'
+    )
+    materialized_until = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Occurrences up to this date exist as reservations"
+    )
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['start_date', 'id']
+        verbose_name_plural = 'reservation series'
+        indexes = [
+            # Materialization: active series behind the horizon
+            models.Index(fields=['status', 'materialized_until']),
+            models.Index(fields=['desk', 'status']),
+            models.Index(fields=['user', 'status']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(weekdays__gt=0, weekdays__lt=128),
+                name='reservation_series_weekdays',
+            ),
+            models.CheckConstraint(
+                check=models.Q(end_date__isnull=True) | models.Q(end_date__gte=models.F('start_date')),
+                name='reservation_series_ends_after_start',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.desk.identifier} weekly from {self.start_date}"
+
 
 class UserPermission(models.Model):
     """Links users to areas they can access"""
@@ -172,3 +304,248 @@ class UserPermission(models.Model):
 
     def __str__(self):
         return f"{self.user.username} can access {self.area.name}"
+
+
+class GroupPermission(models.Model):
+    """Links a group of users (a Django group or a department) to an area they can access"""
+    area = models.ForeignKey(
+        Area,
+        on_delete=models.CASCADE,
+        related_name='group_permissions'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='area_permissions'
+    )
+    department = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Grant access to every user whose department is exactly this value"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['area', 'department', 'group']
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(group__isnull=False, department='')
+                    | models.Q(group__isnull=True) & ~models.Q(department='')
+                ),
+                name='group_permission_one_grantee',
+            ),
+            models.UniqueConstraint(
+                fields=['area', 'group'], condition=models.Q(group__isnull=False),
+                name='unique_group_area_permission',
+            ),
+            models.UniqueConstraint(
+                fields=['area', 'department'], condition=~models.Q(department=''),
+                name='unique_department_area_permission',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['department']),
+        ]
+
+    def __str__(self):
+        grantee = f"group {self.group.name}" if self.group_id else f"department {self.department}"
+        return f"{grantee} can access {self.area.name}"
+
+
+class RoomReservation(models.Model):
+    """A meeting-room booking for a time slot on one date"""
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='room_reservations'
+    )
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['date', 'start_time']
+        indexes = [
+            # A room's schedule for a day, already in start order
+            models.Index(fields=['room', 'date', 'start_time']),
+            models.Index(fields=['user', 'date']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(end_time__gt=models.F('start_time')),
+                name='room_reservation_ends_after_start',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.room.name} on {self.date} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
+class WaitlistEntry(models.Model):
+    """A user waiting for a specific desk, or any desk in an area, on a date"""
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting'),
+        ('promoted', 'Promoted'),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries'
+    )
+    area = models.ForeignKey(
+        Area,
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries'
+    )
+    desk = models.ForeignKey(
+        Desk,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='waitlist_entries',
+        help_text="Leave empty to wait for any desk in the area"
+    )
+    date = models.DateField()
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='waiting'
+    )
+    reservation = models.ForeignKey(
+        Reservation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Reservation created when the entry was promoted"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    promoted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['date', 'created_at', 'id']
+        verbose_name_plural = 'waitlist entries'
+        indexes = [
+            # Queue heads: first waiter for a desk, first waiter for an area
+            models.Index(fields=['desk', 'date', 'status', 'created_at']),
+            models.Index(fields=['area', 'date', 'status', 'created_at']),
+            models.Index(fields=['user', 'status']),
+        ]
+
+    def __str__(self):
+        target = self.desk.identifier if self.desk_id else self.area.name
+        return f"{self.user.username} waiting for {target} on {self.date}"
+
+
+class ReservationEvent(models.Model):
+    """Append-only record of a reservation change; the id is its sequence number"""
+    EVENT_TYPES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('status_changed', 'Status Changed'),
+        ('cancelled', 'Cancelled'),
+        ('checked_in', 'Checked In'),
+        ('deleted', 'Deleted'),
+    ]
+
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPES)
+    # Plain ids rather than foreign keys: events outlive the rows they describe.
+    reservation_id = models.BigIntegerField(db_index=True)
+    user_id = models.BigIntegerField()
+    desk_id = models.BigIntegerField()
+    date = models.DateField()
+    status = models.CharField(max_length=20)
+    previous_status = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {self.event_type} reservation {self.reservation_id}"
+
+
+class AreaVersion(models.Model):
+    """Per-area change counter for delta sync"""
+    area = models.OneToOneField(
+        Area,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='change_version'
+    )
+    version = models.BigIntegerField(default=0)
+    floor = models.BigIntegerField(
+        default=0,
+        help_text="Oldest version a client can sync from without a full snapshot"
+    )
+
+    def __str__(self):
+        return f"{self.area.name} at version {self.version}"
+
+
+class DeskChange(models.Model):
+    """Latest area version at which a desk's state changed (for one date, or all dates)"""
+    area = models.ForeignKey(
+        Area,
+        on_delete=models.CASCADE,
+        related_name='desk_changes'
+    )
+    desk = models.ForeignKey(
+        Desk,
+        on_delete=models.CASCADE,
+        related_name='changes'
+    )
+    date = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Empty for changes to the desk itself, which affect every date"
+    )
+    version = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ['desk', 'date']
+        indexes = [
+            models.Index(fields=['area', 'version']),
+        ]
+
+    def __str__(self):
+        return f"Desk {self.desk_id} changed at version {self.version}"
+
+
+class DeskUsage(models.Model):
+    """Bookings of a desk in one calendar month, kept current on reservation writes"""
+    desk = models.ForeignKey(
+        Desk,
+        on_delete=models.CASCADE,
+        related_name='usage'
+    )
+    area = models.ForeignKey(
+        Area,
+        on_delete=models.CASCADE,
+        related_name='desk_usage'
+    )
+    month = models.DateField(help_text="First day of the month")
+    bookings = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['desk', 'month']
+        indexes = [
+            models.Index(fields=['month']),
+        ]
+        verbose_name_plural = 'desk usage'
+
+    def __str__(self):
+        return f"Desk {self.desk_id} in {self.month:%Y-%m}: {self.bookings}"
@@ -0,0 +1,240 @@
+"""
+Effective area permissions.
+
+A user may access an area through a UserPermission row of their own, or
+through a GroupPermission granted to one of their Django groups or to their
+department. permitted_area_ids() resolves the union from three kinds of
+cache entries:
+
+- per user: (department, group ids, directly permitted areas)
+- per department and per group: the areas granted to it
+
+so a warm lookup is two cache reads, and every change invalidates exactly
+one entry: a UserPermission, department or group membership change drops
+the user's entry, a GroupPermission change drops its grantee's. Granting a
+department of thousands of users is one row and one cache delete.
+Invalidation happens after commit (see signals.py), so a read between the
+write and the commit can't cache the old answer past it.
+
+bulk_grant(), bulk_revoke() and bulk_replace() change UserPermission rows
+for many users at once with set-based inserts and deletes in one
+transaction, a batch of users per statement. They skip the per-row signal
+handlers and apply the same side effects once per call instead: shard
+replicas, the cache entries above, the search index, and
+permissions_changed for the API caches.
+"""
+import functools
+import hashlib
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from django.dispatch import Signal
+
+from . import search
+from .models import GroupPermission, User, UserPermission
+from .sharding import shard_aliases
+
+KEY_PREFIX = 'core:permissions'
+TIMEOUT = 60 * 60
+BATCH_SIZE = 500  # users per statement, well within SQLite's bound parameter limit
+
+# Sent inside the transaction of a bulk change, with the user and area ids and
+# the database; receivers defer their work to its commit.
+permissions_changed = Signal()
+
+BulkResult = namedtuple('BulkResult', 'users areas created deleted')
+
+
+def _user_key(user_id):
+    return f'{KEY_PREFIX}:user:{user_id}'
+
+
+def _department_key(department):
+    # Department names are free text; cache keys must not be.
+    return f'{KEY_PREFIX}:department:{hashlib.sha256(department.encode("utf-8")).hexdigest()}'
+
+
+def _group_key(group_id):
+    return f'{KEY_PREFIX}:group:{group_id}'
+
+
+def _load_user(user_id):
+    department = User.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id).values_list('department', flat=True).first()
+    group_ids = tuple(
+        User.groups.through.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).values_list('group_id', flat=True)
+    )
+    areas = frozenset(
+        UserPermission.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).values_list('area_id', flat=True)
+    )
+    return department or '', group_ids, areas
+
+
+def _load_grants(department, group_ids):
+    """{cache key: frozenset of area ids} for the department and groups, in one query."""
+    keys = {_group_key(group_id): set() for group_id in group_ids}
+    grantees = Q(group_id__in=group_ids)
+    if department:
+        keys[_department_key(department)] = set()
+        grantees |= Q(department=department)
+    rows = GroupPermission.objects.using(DEFAULT_DB_ALIAS).filter(grantees)
+    for group_id, row_department, area_id in rows.values_list('group_id', 'department', 'area_id'):
+        key = _group_key(group_id) if group_id is not None else _department_key(row_department)
+        keys[key].add(area_id)
+    return {key: frozenset(areas) for key, areas in keys.items()}
+
+
+def permitted_area_ids(user_id):
+    """Ids of the areas user_id may access, directly or through a group or department."""
+    entry = cache.get(_user_key(user_id))
+    if entry is None:
+        entry = _load_user(user_id)
+        cache.set(_user_key(user_id), entry, TIMEOUT)
+    department, group_ids, areas = entry
+    if not department and not group_ids:
+        return areas
+
+    keys = [_group_key(group_id) for group_id in group_ids]
+    if department:
+        keys.append(_department_key(department))
+    grants = cache.get_many(keys)
+    if len(grants) < len(keys):
+        loaded = _load_grants(department, group_ids)
+        cache.set_many({key: loaded[key] for key in keys if key not in grants}, TIMEOUT)
+        grants.update(loaded)
+    return areas.union(*grants.values())
+
+
+def permitted_user_ids(area_id, using=DEFAULT_DB_ALIAS):
+    """Set of the ids of users who may access area_id, for bulk checks."""
+    grants = GroupPermission.objects.using(using).filter(area_id=area_id)
+    users = User.objects.using(using)
+    # Three simple queries; one OR across the joins scans far more rows.
+    direct = UserPermission.objects.using(using).filter(area_id=area_id)
+    members = users.filter(groups__in=grants.filter(group__isnull=False).values('group_id'))
+    departments = users.filter(department__in=grants.exclude(department='').values('department'))
+    return (
+        set(direct.values_list('user_id', flat=True))
+        | set(members.values_list('id', flat=True))
+        | set(departments.values_list('id', flat=True))
+    )
+
+
+def invalidate_user(user_id):
+    cache.delete(_user_key(user_id))
+
+
+def invalidate_grantee(group_id=None, department=''):
+    if group_id is not None:
+        cache.delete(_group_key(group_id))
+    if department:
+        cache.delete(_department_key(department))
+
+
+# Bulk changes
+
+def _batches(values, size=BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def resolve_users(ids=(), employee_ids=(), departments=()):
+    """
+    The ids of the users selected by id, employee id or department, and the
+    selectors that matched nobody: (user ids, {'ids': [...], ...}).
+    """
+    users = User.objects.using(DEFAULT_DB_ALIAS)
+    found = set()
+    unknown = {}
+    for name, values, field in (('ids', ids, 'id'), ('employee_ids', employee_ids, 'employee_id'),
+                                ('departments', departments, 'department')):
+        values = set(values)
+        matched = set()
+        for batch in _batches(sorted(values)):
+            for value, pk in users.filter(**{f'{field}__in': batch}).values_list(field, 'id'):
+                matched.add(value)
+                found.add(pk)
+        if values - matched:
+            unknown[name] = sorted(values - matched)
+    return found, unknown
+
+
+def _raw_delete(queryset):
+    # QuerySet.delete() would fetch every row to send post_delete; the
+    # handlers' work is done in bulk by the caller instead.
+    return queryset._raw_delete(queryset.db)
+
+
+def _bulk_change(mode, user_ids, area_ids, dry_run):
+    user_ids, area_ids = sorted(set(user_ids)), sorted(set(area_ids))
+    permissions = UserPermission.objects.using(DEFAULT_DB_ALIAS)
+    created = deleted = 0
+    touched_areas = set(area_ids) if mode != 'revoke' else set()
+
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        for batch in _batches(user_ids):
+            rows = permissions.filter(user_id__in=batch)
+            if mode != 'grant':
+                if mode == 'revoke':
+                    doomed = rows.filter(area_id__in=area_ids)
+                else:
+                    doomed = rows.exclude(area_id__in=area_ids)
+                touched_areas.update(doomed.values_list('area_id', flat=True).distinct())
+                deleted += doomed.count() if dry_run else _raw_delete(doomed)
+            if mode != 'revoke' and area_ids:
+                existing = set(rows.filter(area_id__in=area_ids).values_list('user_id', 'area_id'))
+                missing = [
+                    UserPermission(user_id=user_id, area_id=area_id)
+                    for user_id in batch for area_id in area_ids if (user_id, area_id) not in existing
+                ]
+                if not dry_run:
+                    # A concurrent grant of the same pair is not an error.
+                    permissions.bulk_create(missing, ignore_conflicts=True)
+                created += len(missing)
+
+        if not dry_run and (created or deleted):
+            _replicate_users(user_ids)
+            permissions_changed.send(
+                sender=UserPermission, user_ids=user_ids, area_ids=sorted(touched_areas), using=DEFAULT_DB_ALIAS
+            )
+            transaction.on_commit(functools.partial(_forget_users, user_ids), using=DEFAULT_DB_ALIAS)
+    return BulkResult(len(user_ids), len(area_ids), created, deleted)
+
+
+def _replicate_users(user_ids):
+    """Make every shard's copy of these users' permissions match the default database."""
+    fields = ['id', 'user_id', 'area_id', 'created_at']
+    for alias in shard_aliases():
+        replicas = UserPermission.objects.using(alias)
+        for batch in _batches(user_ids):
+            _raw_delete(replicas.filter(user_id__in=batch))
+            rows = UserPermission.objects.using(DEFAULT_DB_ALIAS).filter(user_id__in=batch).values(*fields)
+            replicas.bulk_create([UserPermission(**row) for row in rows])
+
+
+def _forget_users(user_ids):
+    for batch in _batches(user_ids, 1000):
+        cache.delete_many([_user_key(user_id) for user_id in batch])
+    # Past a replay's worth of changes, processes rebuild their index anyway.
+    if len(user_ids) > search.MAX_REPLAY:
+        search.log_rebuild()
+    else:
+        for user_id in user_ids:
+            search.log_change('user', user_id)
+
+
+def bulk_grant(user_ids, area_ids, dry_run=False):
+    """Let every user access every area; returns a BulkResult."""
+    return _bulk_change('grant', user_ids, area_ids, dry_run)
+
+
+def bulk_revoke(user_ids, area_ids, dry_run=False):
+    """Remove the users' direct permissions for the areas; returns a BulkResult."""
+    return _bulk_change('revoke', user_ids, area_ids, dry_run)
+
+
+def bulk_replace(user_ids, area_ids, dry_run=False):
+    """Make area_ids exactly the areas each user is directly permitted; returns a BulkResult."""
+    return _bulk_change('replace', user_ids, area_ids, dry_run)
@@ -0,0 +1,153 @@
+"""
+Hot-desk and hot-area popularity (SRS 3.6.1).
+
+DeskUsage keeps per-desk booking counts per calendar month, adjusted on
+every reservation write. A top-K query for a date range reads the counters
+for the whole months it covers and counts reservations only for the
+partial months at either end, then picks the K largest with a heap.
+Cancelled bookings don't count.
+"""
+import heapq
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+
+from .models import Area, Desk, DeskUsage, Reservation
+from .sharding import all_databases, shard_for_desk
+
+UNCOUNTED_STATUSES = ('cancelled',)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def counts(status):
+    return status is not None and status not in UNCOUNTED_STATUSES
+
+
+def adjust_usage(desk_id, day, delta):
+    """Add delta to the desk's bookings for day's month."""
+    db = shard_for_desk(desk_id)
+    usage = DeskUsage.objects.using(db)
+    month = month_start(day)
+    if usage.filter(desk_id=desk_id, month=month).update(bookings=F('bookings') + delta):
+        return
+    area_id = Desk.objects.using(db).filter(pk=desk_id).values_list('room__area_id', flat=True).first()
+    if area_id is None:
+        return  # desk is being deleted
+    try:
+        with transaction.atomic(using=db):
+            usage.create(desk_id=desk_id, area_id=area_id, month=month, bookings=delta)
+    except IntegrityError:
+        usage.filter(desk_id=desk_id, month=month).update(bookings=F('bookings') + delta)
+
+
+def rebuild_usage():
+    """Recompute all counters from reservations, e.g. after bulk imports."""
+    for db in all_databases():
+        rows = (
+            Reservation.objects.using(db).exclude(status__in=UNCOUNTED_STATUSES)
+            .annotate(month=TruncMonth('date'))
+            .values('desk_id', 'desk__room__area_id', 'month')
+            .annotate(bookings=Count('id'))
+            .order_by()
+        )
+        with transaction.atomic(using=db):
+            DeskUsage.objects.using(db).all().delete()
+            DeskUsage.objects.using(db).bulk_create(
+                [
+                    DeskUsage(desk_id=row['desk_id'], area_id=row['desk__room__area_id'],
+                              month=row['month'], bookings=row['bookings'])
+                    for row in rows
+                ],
+                batch_size=1000,
+            )
+
+
+def _range_counts(start, end, key):
+    """Bookings per desk ('desk') or area ('area') from start to end inclusive."""
+    column = 'desk_id' if key == 'desk' else 'area_id'
+    totals = Counter()
+
+    first_full = start if start.day == 1 else next_month(start)
+    last_full = month_start(end + timedelta(days=1))  # exclusive
+    if first_full < last_full:
+        for db in all_databases():
+            usage = DeskUsage.objects.using(db).filter(month__gte=first_full, month__lt=last_full)
+            for ident, bookings in usage.values_list(column, 'bookings').iterator():
+                totals[ident] += bookings
+        edges = [(start, first_full - timedelta(days=1)), (last_full, end)]
+    else:
+        edges = [(start, end)]
+
+    reservation_column = 'desk_id' if key == 'desk' else 'desk__room__area_id'
+    for low, high in edges:
+        if low > high:
+            continue
+        for db in all_databases():
+            partial = (
+                Reservation.objects.using(db).filter(date__range=(low, high))
+                .exclude(status__in=UNCOUNTED_STATUSES)
+                .values_list(reservation_column)
+                .annotate(bookings=Count('id'))
+                .order_by()
+            )
+            for ident, bookings in partial:
+                totals[ident] += bookings
+    return totals
+
+
+def _top(totals, limit):
+    # Most bookings first; lower id breaks ties deterministically.
+    return heapq.nsmallest(
+        limit, ((ident, count) for ident, count in totals.items() if count > 0),
+        key=lambda item: (-item[1], item[0]),
+    )
+
+
+def top_desks(start, end, limit=10):
+    """[(desk_id, bookings)] for the most booked desks, most booked first."""
+    return _top(_range_counts(start, end, 'desk'), limit)
+
+
+def top_areas(start, end, limit=10):
+    """[(area_id, bookings)] for the most booked areas, most booked first."""
+    return _top(_range_counts(start, end, 'area'), limit)
+
+
+def popularity_report(start, end, limit=10):
+    """Top desks and areas with their names, as plain dicts."""
+    desks = top_desks(start, end, limit)
+    areas = top_areas(start, end, limit)
+    desk_info = {
+        row['id']: row for row in Desk.objects.filter(id__in=[ident for ident, _ in desks])
+        .values('id', 'identifier', 'room__name', 'room__area_id', 'room__area__name')
+    }
+    area_names = dict(Area.objects.filter(id__in=[ident for ident, _ in areas]).values_list('id', 'name'))
+    return {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'desks': [
+            {
+                'desk': ident,
+                'identifier': desk_info[ident]['identifier'],
+                'room_name': desk_info[ident]['room__name'],
+                'area': desk_info[ident]['room__area_id'],
+                'area_name': desk_info[ident]['room__area__name'],
+                'bookings': count,
+            }
+            for ident, count in desks if ident in desk_info
+        ],
+        'areas': [
+            {'area': ident, 'name': area_names[ident], 'bookings': count}
+            for ident, count in areas if ident in area_names
+        ],
+    }
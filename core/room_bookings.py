@@ -0,0 +1,135 @@
+"""
+Time-slot bookings of meeting rooms.
+
+A room's bookings on a date never overlap, so sorted by start time their
+end times are sorted too. RoomSchedule keeps them as two parallel sorted
+lists: an overlap check is one binary search plus a look at the booking
+just before the insertion point, and the free slots are the gaps between
+neighbours within opening hours. Schedules are loaded per room and date
+through the (room, date, start_time) index, never by scanning bookings.
+
+Bookings of one room are serialised by writing its row before the schedule
+is read (see lock_row()): SELECT ... FOR UPDATE is a no-op on SQLite, where
+two bookings could otherwise both find the slot free.
+"""
+import bisect
+from datetime import time
+from itertools import groupby
+
+from django.db import models, transaction
+
+from .models import Room, RoomReservation
+
+OPENING_TIME = time(7, 0)
+CLOSING_TIME = time(20, 0)
+
+
+class RoomSchedule:
+    """Non-overlapping [start, end) intervals of one room on one date."""
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        self.keys = []
+        for start, end, key in intervals:
+            self.add(start, end, key)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start, end):
+        """Whether [start, end) intersects a booked interval."""
+        # Intervals before index start before `end`; only the last of them
+        # can reach past `start`, since ends are sorted as well.
+        index = bisect.bisect_left(self.starts, end)
+        return index > 0 and self.ends[index - 1] > start
+
+    def add(self, start, end, key=None):
+        if self.overlaps(start, end):
+            raise ValueError(f'{start}-{end} overlaps a booked interval')
+        index = bisect.bisect_left(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.keys.insert(index, key)
+
+    def booked(self):
+        return list(zip(self.starts, self.ends, self.keys))
+
+    def free_slots(self, opening=OPENING_TIME, closing=CLOSING_TIME):
+        """Gaps between bookings within [opening, closing), in order."""
+        slots = []
+        cursor = opening
+        for start, end in zip(self.starts, self.ends):
+            if start > cursor:
+                slots.append((cursor, min(start, closing)))
+            cursor = max(cursor, end)
+            if cursor >= closing:
+                break
+        if cursor < closing:
+            slots.append((cursor, closing))
+        return [(start, end) for start, end in slots if start < end]
+
+
+def _rows(queryset):
+    return queryset.order_by('start_time').values_list('start_time', 'end_time', 'id')
+
+
+def lock_row(model, pk, using=None):
+    """
+    Lock model's row pk until the transaction ends, with a no-op UPDATE: a
+    row lock on PostgreSQL, the database's write lock on SQLite. Call it
+    before the reads it guards, first thing in the transaction: on SQLite a
+    transaction that has read can't wait for the write lock. Returns
+    whether the row exists.
+    """
+    name = model._meta.pk.attname
+    return model._base_manager.using(using).filter(pk=pk).update(**{name: models.F(name)}) > 0
+
+
+def load_schedule(room_id, day):
+    return RoomSchedule(_rows(RoomReservation.objects.filter(room_id=room_id, date=day)))
+
+
+def book_room(user, room, day, start, end, notes=''):
+    """Book [start, end) of room on day; None when it overlaps a booking."""
+    with transaction.atomic():
+        lock_row(Room, room.pk)
+        if load_schedule(room.pk, day).overlaps(start, end):
+            return None
+        return RoomReservation.objects.create(
+            room=room, user=user, date=day, start_time=start, end_time=end, notes=notes
+        )
+
+
+def area_room_slots(area, day):
+    """Bookable rooms of area with their bookings and free slots on day (two queries)."""
+    rooms = list(
+        Room.objects.filter(area=area, is_bookable=True).order_by('name').values('id', 'name')
+    )
+    bookings = (
+        RoomReservation.objects.filter(room__area=area, room__is_bookable=True, date=day)
+        .order_by('room_id', 'start_time')
+        .values_list('room_id', 'start_time', 'end_time', 'id', 'user_id')
+    )
+    schedules = {}
+    for room_id, rows in groupby(bookings, key=lambda row: row[0]):
+        schedules[room_id] = RoomSchedule((start, end, (pk, user_id)) for _, start, end, pk, user_id in rows)
+
+    for room in rooms:
+        schedule = schedules.get(room['id'], RoomSchedule())
+        room['booked'] = [
+            {'id': pk, 'user': user_id, 'start': _clock(start), 'end': _clock(end)}
+            for start, end, (pk, user_id) in schedule.booked()
+        ]
+        room['free'] = [{'start': _clock(start), 'end': _clock(end)} for start, end in schedule.free_slots()]
+    return {
+        'area': area.id,
+        'date': day.isoformat(),
+        'opening': _clock(OPENING_TIME),
+        'closing': _clock(CLOSING_TIME),
+        'rooms': rooms,
+    }
+
+
+def _clock(value):
+    return value.strftime('%H:%M')
@@ -0,0 +1,53 @@
+"""Database router for area sharding (installed when BOOKING_SHARDS is set)."""
+from django.db import DEFAULT_DB_ALIAS
+
+from .sharding import is_sharded, shard_for_area, shard_for_desk
+
+
+def _shard_for_instance(instance):
+    """The shard holding rows of, or belonging to, instance; None if unknown."""
+    if instance is None:
+        return None
+    # Unsaved rows pick up a database from whichever related object was
+    # assigned first (e.g. the user), so only a saved row's db is trusted.
+    if is_sharded(type(instance)) and not instance._state.adding and instance._state.db:
+        return instance._state.db
+    name = instance._meta.model_name
+    if name in ('reservation', 'reservationseries', 'reservationevent'):
+        return shard_for_desk(instance.desk_id)
+    if name in ('waitlistentry', 'areaversion', 'deskchange', 'deskusage', 'room'):
+        return shard_for_area(instance.area_id)
+    if name == 'area':
+        return shard_for_area(instance.pk)
+    if name == 'desk':
+        return shard_for_desk(instance.pk)
+    return None
+
+
+class AreaShardRouter:
+    """
+    Sends sharded models to their area's shard and everything else to the
+    default database.
+
+    Without an instance hint (e.g. Reservation.objects.filter(...)) sharded
+    reads go to the default database; callers pick the shard with .using().
+    Related managers pass their parent as the hint, so desk.reservations and
+    area.waitlist_entries find the right shard by themselves.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not is_sharded(model):
+            return DEFAULT_DB_ALIAS
+        return _shard_for_instance(hints.get('instance')) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return self.db_for_read(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Reference rows are replicated, so relations hold in every database.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Every database gets the full schema: shards need the replicated
+        # reference tables for their foreign keys.
+        return True
@@ -0,0 +1,290 @@
+"""
+Fuzzy search over desks, rooms, areas and users.
+
+Each process keeps an in-memory trigram index: every document's
+normalised text (' ' + text + ' ') is split into trigrams, and each
+trigram maps to the set of documents containing it. A query's candidates
+are the intersection of its trigrams' sets, smallest first, checked for
+the query as a substring. When that finds too few, documents sharing most
+of the query's trigrams are added as fuzzy matches.
+
+Writes are logged to a changelog in the cache (an epoch, a sequence
+counter and one key per change) after they commit. Before answering, a
+process replays the entries it hasn't seen by re-reading just the changed
+rows; it rebuilds from scratch when it falls too far behind or the cache
+was cleared.
+"""
+import heapq
+import math
+import threading
+import unicodedata
+import uuid
+from collections import defaultdict, namedtuple
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Area, Desk, GroupPermission, Room, User, UserPermission
+
+KINDS = ('desk', 'room', 'area', 'user')
+MIN_QUERY_LENGTH = 2
+FUZZY_SIMILARITY = 0.6  # share of the query's trigrams a fuzzy match must have
+MAX_REPLAY = 500
+CHANGE_TIMEOUT = 24 * 60 * 60
+
+LOG_PREFIX = 'core:search'
+EPOCH_KEY = f'{LOG_PREFIX}:epoch'
+SEQ_KEY = f'{LOG_PREFIX}:seq'
+
+Document = namedtuple('Document', 'kind pk label detail text areas')
+
+
+def normalize(value):
+    """Lowercase, strip accents and collapse whitespace."""
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.lower().split())
+
+
+def trigrams(text):
+    padded = f' {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def query_trigrams(query):
+    # Two characters only match at the start of a word.
+    return {f' {query}'} if len(query) < 3 else {query[i:i + 3] for i in range(len(query) - 2)}
+
+
+class SearchIndex:
+    def __init__(self):
+        self.documents = {}
+        self.ids = {}
+        self.postings = defaultdict(set)
+        self.next_id = 0
+        self.epoch = None
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def put(self, document):
+        self.remove(document.kind, document.pk)
+        doc_id = self.next_id
+        self.next_id += 1
+        self.documents[doc_id] = document
+        self.ids[document.kind, document.pk] = doc_id
+        for gram in trigrams(document.text):
+            self.postings[gram].add(doc_id)
+
+    def remove(self, kind, pk):
+        doc_id = self.ids.pop((kind, pk), None)
+        if doc_id is None:
+            return
+        document = self.documents.pop(doc_id)
+        for gram in trigrams(document.text):
+            posting = self.postings[gram]
+            posting.discard(doc_id)
+            if not posting:
+                del self.postings[gram]
+
+    def clear(self):
+        self.documents.clear()
+        self.ids.clear()
+        self.postings.clear()
+
+    def search(self, query, kinds=KINDS, areas=None, limit=20):
+        """
+        Up to `limit` documents matching query, best first. `areas` limits
+        results to documents in (or users permitted in) those areas.
+        """
+        query = normalize(query)
+        if len(query) < MIN_QUERY_LENGTH:
+            return []
+        grams = query_trigrams(query)
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        documents = self.documents
+        kinds = frozenset(kinds)
+        word_start = f' {query}'
+
+        # (rank, tie-break, text length, doc id) tuples; this loop is the hot
+        # path for common names, so checks are inlined.
+        ranked = []
+        seen = set()
+        if postings[0]:
+            for doc_id in postings[0].intersection(*postings[1:]):
+                document = documents[doc_id]
+                text = document.text
+                if document.kind not in kinds or (areas is not None and document.areas.isdisjoint(areas)):
+                    continue
+                if text.startswith(query):
+                    rank = 0 if text == query else 1
+                elif word_start in text:
+                    rank = 2
+                elif len(query) >= 3 and query in text:
+                    rank = 3
+                else:
+                    continue
+                ranked.append((rank, 0, len(text), doc_id))
+                seen.add(doc_id)
+
+        if len(ranked) < limit and len(grams) >= 3:
+            # A document sharing `need` of the trigrams is in at least one
+            # of the len - need + 1 smallest sets.
+            need = math.ceil(len(grams) * FUZZY_SIMILARITY)
+            candidates = set().union(*postings[:len(grams) - need + 1])
+            for doc_id in candidates - seen:
+                shared = sum(1 for posting in postings if doc_id in posting)
+                document = documents[doc_id]
+                if shared < need or document.kind not in kinds:
+                    continue
+                if areas is None or not document.areas.isdisjoint(areas):
+                    ranked.append((4, -shared / len(grams), len(document.text), doc_id))
+
+        return [documents[item[-1]] for item in heapq.nsmallest(limit, ranked)]
+
+
+# Documents from rows
+
+def _area_documents(queryset):
+    for pk, name in queryset.values_list('id', 'name'):
+        yield Document('area', pk, name, '', normalize(name), frozenset({pk}))
+
+
+def _room_documents(queryset):
+    for pk, name, area_id, area_name in queryset.values_list('id', 'name', 'area_id', 'area__name'):
+        yield Document('room', pk, name, area_name, normalize(f'{name} {area_name}'), frozenset({area_id}))
+
+
+def _desk_documents(queryset):
+    rows = queryset.values_list('id', 'identifier', 'room__name', 'room__area_id', 'room__area__name')
+    for pk, identifier, room_name, area_id, area_name in rows:
+        yield Document(
+            'desk', pk, identifier, f'{area_name} - {room_name}', normalize(identifier), frozenset({area_id})
+        )
+
+
+def _user_documents(queryset):
+    areas = defaultdict(set)
+    permissions = UserPermission.objects.using(DEFAULT_DB_ALIAS).filter(user__in=queryset)
+    for user_id, area_id in permissions.values_list('user_id', 'area_id').iterator(chunk_size=5000):
+        areas[user_id].add(area_id)
+    # Group and department grants are few; map them once.
+    group_areas, department_areas = defaultdict(set), defaultdict(set)
+    grants = GroupPermission.objects.using(DEFAULT_DB_ALIAS).values_list('group_id', 'department', 'area_id')
+    for group_id, department, area_id in grants:
+        if group_id is not None:
+            group_areas[group_id].add(area_id)
+        else:
+            department_areas[department].add(area_id)
+    if group_areas:
+        memberships = User.groups.through.objects.using(DEFAULT_DB_ALIAS).filter(
+            user__in=queryset, group_id__in=group_areas
+        )
+        for user_id, group_id in memberships.values_list('user_id', 'group_id').iterator(chunk_size=5000):
+            areas[user_id] |= group_areas[group_id]
+    rows = queryset.values_list(
+        'id', 'username', 'first_name', 'last_name', 'email', 'employee_id', 'department', 'is_active'
+    )
+    for pk, username, first, last, email, employee_id, department, is_active in rows.iterator(chunk_size=5000):
+        if department in department_areas:
+            areas[pk] |= department_areas[department]
+        name = f'{first} {last}'.strip() or username
+        detail = ' · '.join(part for part in (employee_id, department) if part)
+        text = normalize(f'{name} {username} {email} {employee_id or ""}')
+        # Inactive users stay findable for admins (unscoped searches) only.
+        yield Document('user', pk, name, detail, text, frozenset(areas[pk] if is_active else ()))
+
+
+BUILDERS = {'area': _area_documents, 'room': _room_documents, 'desk': _desk_documents, 'user': _user_documents}
+
+
+def _refresh(index, kind, pks):
+    """Re-read rows of kind (and documents derived from them) into index."""
+    areas = Area.objects.using(DEFAULT_DB_ALIAS)
+    rooms = Room.objects.using(DEFAULT_DB_ALIAS)
+    desks = Desk.objects.using(DEFAULT_DB_ALIAS)
+    users = User.objects.using(DEFAULT_DB_ALIAS)
+    if kind == 'area':
+        refreshes = [('area', areas.filter(id__in=pks), pks), ('room', rooms.filter(area__in=pks), None),
+                     ('desk', desks.filter(room__area__in=pks), None)]
+    elif kind == 'room':
+        refreshes = [('room', rooms.filter(id__in=pks), pks), ('desk', desks.filter(room__in=pks), None)]
+    elif kind == 'desk':
+        refreshes = [('desk', desks.filter(id__in=pks), pks)]
+    elif kind == 'user':
+        refreshes = [('user', users.filter(id__in=pks), pks)]
+    elif kind == 'group':
+        # An area grant to a group or department changed its members' areas.
+        refreshes = [('user', users.filter(groups__in=pks).distinct(), None)]
+    else:
+        refreshes = [('user', users.filter(department__in=pks), None)]
+
+    for refreshed_kind, queryset, expected in refreshes:
+        found = set()
+        for document in BUILDERS[refreshed_kind](queryset):
+            index.put(document)
+            found.add(document.pk)
+        for pk in set(expected or ()) - found:
+            index.remove(refreshed_kind, pk)
+
+
+def _rebuild(index):
+    index.clear()
+    for kind, model in (('area', Area), ('room', Room), ('desk', Desk), ('user', User)):
+        for document in BUILDERS[kind](model.objects.using(DEFAULT_DB_ALIAS).all()):
+            index.put(document)
+
+
+# Changelog
+
+def log_change(kind, pk):
+    """Record that a row of kind changed; call after the change committed."""
+    cache.add(EPOCH_KEY, uuid.uuid4().hex, None)
+    cache.add(SEQ_KEY, 0, None)
+    try:
+        seq = cache.incr(SEQ_KEY)
+    except ValueError:
+        return  # cleared meanwhile; the new epoch forces a rebuild
+    cache.set(f'{LOG_PREFIX}:change:{seq}', (kind, pk), CHANGE_TIMEOUT)
+
+
+def log_rebuild():
+    """Make every process rebuild its index, e.g. after a bulk change."""
+    cache.set(EPOCH_KEY, uuid.uuid4().hex, None)
+
+
+def _sync(index):
+    state = cache.get_many([EPOCH_KEY, SEQ_KEY])
+    epoch, seq = state.get(EPOCH_KEY), state.get(SEQ_KEY, 0)
+    if index.epoch is not None and epoch == index.epoch and seq == index.seq:
+        return
+
+    replayable = index.epoch is not None and epoch == index.epoch and 0 < seq - index.seq <= MAX_REPLAY
+    if replayable:
+        keys = [f'{LOG_PREFIX}:change:{n}' for n in range(index.seq + 1, seq + 1)]
+        changes = cache.get_many(keys)
+        replayable = len(changes) == len(keys)
+    if replayable:
+        changed = defaultdict(set)
+        for kind, pk in changes.values():
+            changed[kind].add(pk)
+        for kind in ('area', 'room', 'desk', 'user', 'group', 'department'):
+            if changed[kind]:
+                _refresh(index, kind, changed[kind])
+    else:
+        if epoch is None:
+            # Give the empty log an epoch, so that later changes are replayed
+            # rather than mistaken for a cleared cache.
+            cache.add(EPOCH_KEY, uuid.uuid4().hex, None)
+            epoch = cache.get(EPOCH_KEY)
+        _rebuild(index)
+    index.epoch, index.seq = epoch, seq
+
+
+_index = SearchIndex()
+
+
+def search(query, kinds=KINDS, areas=None, limit=20):
+    """Search the process-wide index after catching up with the changelog."""
+    with _index.lock:
+        _sync(_index)
+        return _index.search(query, kinds=kinds, areas=areas, limit=limit)
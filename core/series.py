@@ -0,0 +1,354 @@
+"""
+Recurring desk bookings (SRS 3.3.5).
+
+A ReservationSeries books one desk on a set of weekdays from start_date to
+end_date, or indefinitely. Only the occurrences within HORIZON_DAYS of
+today exist as Reservation rows: materialize() turns the next ones into
+rows, a batch of series per transaction, and is run daily by the
+materialize_series command; materialized_until records how far each series
+got. Later occurrences are pending, and pending_claims() expands them from
+the series rows themselves, so availability (snapshots, the availability
+matrix, recommendations, new bookings) and the weekly quota see a series'
+whole future without a row per date.
+
+Materialized occurrences are ordinary reservations that can be checked
+into or cancelled one by one. Cancelling or moving a series changes the
+series row and the few occurrences already materialized ahead, never one
+row per occurrence.
+
+Series live in their desk's shard, next to their reservations.
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .booking_rules import ACTIVE_STATUSES, QUOTA_EXEMPT_STATUSES, WEEKLY_WEEKDAY_QUOTA, week_bounds
+from .models import Desk, Reservation, ReservationSeries, User
+from .room_bookings import lock_row
+from .sharding import all_databases, shard_for_desk
+
+HORIZON_DAYS = 21
+BATCH_SIZE = 200  # series per transaction
+MAX_CONFLICTS = 20
+WEEKDAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+WORKWEEK = 0b0011111  # Monday to Friday
+
+
+def weekday_mask(weekdays):
+    """Bitmask for weekday numbers (Monday = 0)."""
+    return sum(1 << day for day in set(weekdays))
+
+
+def mask_weekdays(mask):
+    return [day for day in range(7) if mask >> day & 1]
+
+
+def occurrence_dates(mask, first, last):
+    """Dates in [first, last] on the mask's weekdays, in order."""
+    day = first
+    while day <= last:
+        if mask >> day.weekday() & 1:
+            yield day
+        day += timedelta(days=1)
+
+
+def _pending_range(start, end, materialized_until, first, last):
+    """The part of [first, last] where a series has occurrences not yet materialized."""
+    first = max(first, start)
+    if materialized_until is not None:
+        first = max(first, materialized_until + timedelta(days=1))
+    if end is not None:
+        last = min(last, end)
+    return first, last
+
+
+def _pending_between(first, last, using=None, **filters):
+    """Active series matching filters that may have pending occurrences in [first, last]."""
+    return (
+        ReservationSeries.objects.using(using)
+        .filter(status='active', start_date__lte=last, **filters)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=first))
+        .filter(Q(materialized_until__isnull=True) | Q(materialized_until__lt=last))
+    )
+
+
+def pending_on(day, **filters):
+    """The series with a pending occurrence on day, as a queryset (e.g. for subqueries)."""
+    return _pending_between(day, day, **filters).alias(
+        on_weekday=F('weekdays').bitand(1 << day.weekday())
+    ).filter(on_weekday__gt=0)
+
+
+def pending_claims(first, last, using=None, extra=(), **filters):
+    """
+    {(desk id, date): (series id, user id, *extra fields)} for the
+    occurrences in [first, last] of the active series matching filters that
+    are not yet reservations. One query, in the `using` shard.
+    """
+    rows = _pending_between(first, last, using, **filters).values_list(
+        'desk_id', 'weekdays', 'start_date', 'end_date', 'materialized_until', 'id', 'user_id', *extra
+    )
+    claims = {}
+    for desk_id, mask, start, end, until, *claim in rows:
+        for day in occurrence_dates(mask, *_pending_range(start, end, until, first, last)):
+            claims[(desk_id, day)] = tuple(claim)
+    return claims
+
+
+def claim_on(desk_id, day):
+    """(series id, user id) of the pending occurrence holding desk on day, or None."""
+    return pending_claims(day, day, using=shard_for_desk(desk_id), desk_id=desk_id).get((desk_id, day))
+
+
+def pending_user_occurrences(user_id, first, last):
+    """Number of the user's pending occurrences in [first, last], across shards."""
+    return sum(len(pending_claims(first, last, using=db, user_id=user_id)) for db in all_databases())
+
+
+# Creating, cancelling and moving series
+
+def _overlapping(queryset, start, end):
+    """Active series in queryset whose date range meets [start, end]."""
+    queryset = queryset.filter(status='active').filter(Q(end_date__isnull=True) | Q(end_date__gte=start))
+    return queryset if end is None else queryset.filter(start_date__lte=end)
+
+
+def find_conflicts(desk_id, mask, start, end, exclude=None):
+    """
+    Dates of [start, end] on which the pattern collides with an active
+    booking of the desk or another series on it; at most MAX_CONFLICTS.
+    """
+    db = shard_for_desk(desk_id)
+    bookings = Reservation.objects.using(db).filter(desk_id=desk_id, date__gte=start, status__in=ACTIVE_STATUSES)
+    if end is not None:
+        bookings = bookings.filter(date__lte=end)
+    others = _overlapping(ReservationSeries.objects.using(db).filter(desk_id=desk_id), start, end)
+    if exclude is not None:
+        bookings = bookings.exclude(series_id=exclude)
+        others = others.exclude(pk=exclude)
+    # Existing bookings are few next to an open-ended range of dates.
+    taken = {day for day in bookings.values_list('date', flat=True) if mask >> day.weekday() & 1}
+
+    for other_mask, other_start, other_end, until in others.values_list(
+        'weekdays', 'start_date', 'end_date', 'materialized_until'
+    ):
+        # Materialized occurrences are among the bookings above; of the rest,
+        # the first week of the overlap shows which weekdays collide.
+        first, last = _pending_range(other_start, other_end, until, start, end or date.max)
+        taken.update(occurrence_dates(mask & other_mask, first, min(last, first + timedelta(days=6))))
+    return sorted(taken)[:MAX_CONFLICTS]
+
+
+def rule_error(user_id, desk, mask, start, end, exclude=None):
+    """Why the user may not book the series (area permissions aside), or None."""
+    if desk.status != 'available':
+        return f'Desk {desk.identifier} is not available for booking'
+    booked = mask & WORKWEEK
+    for db in all_databases():
+        others = _overlapping(ReservationSeries.objects.using(db).filter(user_id=user_id), start, end)
+        if exclude is not None:
+            others = others.exclude(pk=exclude)
+        for other_mask in others.values_list('weekdays', flat=True):
+            if mask & other_mask:
+                return 'Another recurring booking already covers some of these weekdays'
+            booked |= other_mask & WORKWEEK
+    if bin(booked).count('1') > WEEKLY_WEEKDAY_QUOTA:
+        return f'Recurring bookings may cover at most {WEEKLY_WEEKDAY_QUOTA} weekdays a week'
+    return None
+
+
+def _lock(user_id, desk_id, db):
+    """
+    Serialise a user's series on the user's row and the series and bookings
+    of a desk on the desk's row. First thing in the transactions of both
+    databases, see lock_row().
+    """
+    lock_row(User, user_id)
+    lock_row(Desk, desk_id, using=db)
+
+
+def create_series(user, desk, mask, start, end=None, notes='', today=None):
+    """
+    Book desk on the mask's weekdays from start to end and materialize the
+    occurrences within the horizon. Returns (series, []), or (None, conflicting
+    dates) when the desk is taken on some of them. Raises ValidationError
+    when rule_error() refuses the series.
+    """
+    db = shard_for_desk(desk.pk)
+    with transaction.atomic(), transaction.atomic(using=db):
+        _lock(user.pk, desk.pk, db)
+        error = rule_error(user.pk, desk, mask, start, end)
+        if error is not None:
+            raise ValidationError(error)
+        conflicts = find_conflicts(desk.pk, mask, start, end)
+        if conflicts:
+            return None, conflicts
+        series = ReservationSeries.objects.using(db).create(
+            user=user, desk=desk, weekdays=mask, start_date=start, end_date=end, notes=notes
+        )
+        _materialize([series], db, *_horizon(today))
+    return series, []
+
+
+def cancel_series(series, today=None):
+    """Cancel the series and its occurrences from today on; returns the number of reservations cancelled."""
+    today = today or timezone.localdate()
+    db = series._state.db
+    with transaction.atomic(using=db):
+        series.status = 'cancelled'
+        series.save(update_fields=['status'])
+        return _release(series, today, lambda reservation: reservation.save(update_fields=['status']))
+
+
+def move_series(series, desk, today=None):
+    """
+    Move the series' occurrences from today on to another desk. Returns
+    (series, []), or (None, conflicting dates); raises ValidationError when
+    rule_error() refuses the move. A desk in another shard gets a new series
+    there; the old one keeps the past occurrences.
+    """
+    today = today or timezone.localdate()
+    old_db, db = series._state.db, shard_for_desk(desk.pk)
+    start = max(series.start_date, today)
+    with transaction.atomic(), transaction.atomic(using=old_db), transaction.atomic(using=db):
+        _lock(series.user_id, desk.pk, db)
+        error = rule_error(series.user_id, desk, series.weekdays, series.start_date, series.end_date, series.pk)
+        if error is not None:
+            raise ValidationError(error)
+        conflicts = find_conflicts(desk.pk, series.weekdays, start, series.end_date, exclude=series.pk)
+        if conflicts:
+            return None, conflicts
+        # Cancelled ones no longer hold their desk/date slots.
+        _release(series, start, lambda reservation: reservation.save(update_fields=['status']))
+
+        if db == old_db:
+            series.desk = desk
+            if series.materialized_until is not None and series.materialized_until >= start:
+                series.materialized_until = start - timedelta(days=1)
+            series.save(update_fields=['desk', 'materialized_until'])
+            moved = series
+        else:
+            moved = ReservationSeries.objects.using(db).create(
+                user_id=series.user_id, desk=desk, weekdays=series.weekdays,
+                start_date=start, end_date=series.end_date, notes=series.notes,
+            )
+            if series.start_date < start:
+                series.end_date = start - timedelta(days=1)
+                series.save(update_fields=['end_date'])
+            else:
+                series.delete()
+        _materialize([moved], db, *_horizon(today))
+    return moved, []
+
+
+def _release(series, since, apply):
+    count = 0
+    occurrences = series.reservations.filter(date__gte=since, status__in=ACTIVE_STATUSES).select_for_update()
+    for reservation in occurrences:
+        reservation.status = 'cancelled'
+        apply(reservation)
+        count += 1
+    return count
+
+
+# Materialization
+
+def _horizon(today=None):
+    today = today or timezone.localdate()
+    return today, today + timedelta(days=HORIZON_DAYS)
+
+
+def _weekday_counts(user_ids, first, last):
+    """Counter of quota-counted weekday bookings by (user id, Monday), across shards."""
+    counts = Counter()
+    for db in all_databases():
+        rows = (
+            Reservation.objects.using(db)
+            .filter(user_id__in=user_ids, date__range=(first, last))
+            .exclude(status__in=QUOTA_EXEMPT_STATUSES)
+            .values_list('user_id', 'date')
+        )
+        counts.update((user_id, week_bounds(day)[0]) for user_id, day in rows if day.weekday() < 5)
+    return counts
+
+
+def _materialize(series_list, db, today, horizon):
+    """
+    Create the reservations of series_list (all in db) up to horizon, inside
+    the caller's transaction; returns how many were created.
+
+    Occurrences whose desk is already booked that day are skipped. Weekday
+    occurrences past the weekly quota are created pending approval.
+    """
+    planned = []
+    for series in series_list:
+        first, last = _pending_range(series.start_date, series.end_date, series.materialized_until, today, horizon)
+        planned += [(day, series) for day in occurrence_dates(series.weekdays, first, last)]
+    created = 0
+    if planned:
+        planned.sort(key=lambda item: (item[0], item[1].pk))
+        first, last = planned[0][0], planned[-1][0]
+        booked = set(Reservation.objects.using(db).filter(
+            desk_id__in={series.desk_id for series in series_list}, date__range=(first, last),
+            status__in=ACTIVE_STATUSES,
+        ).values_list('desk_id', 'date'))
+        counts = _weekday_counts(
+            {series.user_id for series in series_list}, week_bounds(first)[0], week_bounds(last)[1]
+        )
+
+        for day, series in planned:
+            if (series.desk_id, day) in booked:
+                continue
+            status = 'confirmed'
+            if day.weekday() < 5:
+                week = (series.user_id, week_bounds(day)[0])
+                if counts[week] >= WEEKLY_WEEKDAY_QUOTA:
+                    status = 'pending_approval'
+                counts[week] += 1
+            try:
+                with transaction.atomic(using=db):
+                    Reservation.objects.using(db).create(
+                        user_id=series.user_id, desk_id=series.desk_id, date=day,
+                        status=status, notes=series.notes, series=series,
+                    )
+            except IntegrityError:
+                continue  # booked concurrently
+            created += 1
+
+    # No signals: the series' pending occurrences just became reservations.
+    ReservationSeries.objects.using(db).filter(pk__in=[series.pk for series in series_list]).filter(
+        Q(materialized_until__isnull=True) | Q(materialized_until__lt=horizon)
+    ).update(materialized_until=horizon)
+    for series in series_list:
+        series.materialized_until = max(series.materialized_until or horizon, horizon)
+    return created
+
+
+def materialize(today=None, batch_size=BATCH_SIZE):
+    """Materialize every active series up to the horizon; returns the number of reservations created."""
+    today, horizon = _horizon(today)
+    created = 0
+    for db in all_databases():
+        due = (
+            ReservationSeries.objects.using(db)
+            .filter(status='active')
+            .filter(Q(materialized_until__isnull=True) | Q(materialized_until__lt=horizon))
+            .filter(
+                Q(end_date__isnull=True) | Q(materialized_until__isnull=True)
+                | Q(end_date__gt=F('materialized_until'))
+            )
+            .order_by('id')
+        )
+        last_id = 0
+        while True:
+            with transaction.atomic(using=db):
+                batch = list(due.filter(id__gt=last_id).select_for_update()[:batch_size])
+                if not batch:
+                    break
+                created += _materialize(batch, db, today, horizon)
+            last_id = batch[-1].pk
+    return created
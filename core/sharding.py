@@ -0,0 +1,235 @@
+"""
+Area-based sharding of reservations.
+
+settings.BOOKING_SHARDS lists the shard database aliases; when it is empty
+(the default) everything lives in the default database and every helper
+here resolves to it. Otherwise:
+
+- Areas are assigned to shards by id (area_id % shard count). A shard holds
+  the reservations of its areas together with the per-area tables derived
+  from them (waitlist, event log, change and usage counters), so a booking
+  and its side effects commit in one local transaction and bookings in
+  different shards commit in parallel. Recurring series live with their
+  desk's reservations.
+- Users, areas, rooms, desks and area permissions are written to the
+  default database and replicated to every shard (see signals.py), so
+  foreign keys and joins work inside a shard. Meeting-room bookings stay
+  in the default database.
+- Sharded tables draw ids from disjoint ranges ((index + 1) << ID_SHIFT), so
+  an id is unique across shards and identifies its shard.
+
+- A desk or room can move to another area only within its shard (see
+  shard_move_error()); its rows would otherwise be stranded in the old one.
+
+Queries scoped to an area go to shard_for_area(); user-centric and
+reporting queries use the cross-shard helpers below.
+"""
+import heapq
+import time
+from itertools import chain
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, models, router
+
+ID_SHIFT = 40
+DESK_AREAS_VERSION_KEY = 'core:sharding:desk-areas'
+MAX_DESK_AREAS = 65536
+
+SHARDED_MODELS = frozenset({
+    'reservation', 'reservationseries', 'waitlistentry', 'reservationevent', 'areaversion', 'deskchange',
+    'deskusage',
+})
+REPLICATED_MODELS = frozenset({'user', 'area', 'room', 'desk', 'userpermission'})
+
+
+class ShardedQuerySet(models.QuerySet):
+    """
+    create() writes to the new row's shard. (QuerySet.create() would ask the
+    router without the instance, which always answers the default database.)
+    """
+
+    def create(self, **kwargs):
+        if self._db is None and shard_aliases():
+            db = router.db_for_write(self.model, instance=self.model(**kwargs))
+            return self.using(db).create(**kwargs)
+        return super().create(**kwargs)
+
+
+def shard_aliases():
+    return list(getattr(settings, 'BOOKING_SHARDS', []))
+
+
+def all_databases():
+    """Every database holding sharded rows."""
+    return shard_aliases() or [DEFAULT_DB_ALIAS]
+
+
+def is_sharded(model):
+    return model._meta.app_label == 'core' and model._meta.model_name in SHARDED_MODELS
+
+
+def is_replicated(model):
+    return model._meta.app_label == 'core' and model._meta.model_name in REPLICATED_MODELS
+
+
+def shard_for_area(area_id):
+    shards = shard_aliases()
+    if not shards or area_id is None:
+        return DEFAULT_DB_ALIAS
+    return shards[int(area_id) % len(shards)]
+
+
+class _DeskAreas:
+    """This process's desk id -> area id lookups, valid for one shared version."""
+
+    def __init__(self, version=None):
+        self.version = version
+        self.areas = {}
+
+
+_desk_areas = _DeskAreas()
+
+
+def _desk_areas_version():
+    version = cache.get(DESK_AREAS_VERSION_KEY)
+    if version is None:
+        # Not 1: a re-created key must not match a version some process
+        # still holds lookups for.
+        cache.add(DESK_AREAS_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(DESK_AREAS_VERSION_KEY)
+    return version
+
+
+def _desk_area_id(desk_id):
+    global _desk_areas
+    version = _desk_areas_version()
+    lookups = _desk_areas
+    if lookups.version != version or len(lookups.areas) >= MAX_DESK_AREAS:
+        lookups = _desk_areas = _DeskAreas(version)
+    area_id = lookups.areas.get(desk_id)
+    if area_id is None:
+        from .models import Desk
+        area_id = (
+            Desk.objects.using(DEFAULT_DB_ALIAS).filter(pk=desk_id)
+            .values_list('room__area_id', flat=True).first()
+        )
+        # Unknown desks aren't remembered: the id may be created later.
+        if area_id is not None:
+            lookups.areas[desk_id] = area_id
+    return area_id
+
+
+def clear_desk_areas():
+    """Forget cached desk -> area lookups (desks or rooms moved) in every process."""
+    try:
+        cache.incr(DESK_AREAS_VERSION_KEY)
+    except ValueError:
+        cache.set(DESK_AREAS_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def shard_for_desk(desk_id):
+    if not shard_aliases() or desk_id is None:
+        return DEFAULT_DB_ALIAS
+    return shard_for_area(_desk_area_id(desk_id))
+
+
+def shard_move_error(instance):
+    """
+    Why saving instance (a Desk or Room) may not happen, or None: with
+    sharding on, it may not move to an area in another shard.
+    """
+    if not shard_aliases() or instance.pk is None:
+        return None
+    from .models import Desk, Room
+    rooms = Room.objects.using(DEFAULT_DB_ALIAS)
+    if isinstance(instance, Desk):
+        previous = Desk.objects.using(DEFAULT_DB_ALIAS).filter(pk=instance.pk).values_list('room__area_id', flat=True)
+        area_id = rooms.filter(pk=instance.room_id).values_list('area_id', flat=True).first()
+    else:
+        previous = rooms.filter(pk=instance.pk).values_list('area_id', flat=True)
+        area_id = instance.area_id
+    previous = previous.first()
+    if previous is None or area_id is None or shard_for_area(previous) == shard_for_area(area_id):
+        return None
+    return (
+        f'{instance} can only move to an area in the same shard ({shard_for_area(previous)}); '
+        'its bookings would be left behind'
+    )
+
+
+def shard_for_id(pk):
+    """The shard a sharded row with this id was created in."""
+    shards = shard_aliases()
+    try:
+        index = (int(pk) >> ID_SHIFT) - 1
+    except (TypeError, ValueError):
+        return DEFAULT_DB_ALIAS
+    return shards[index] if 0 <= index < len(shards) else DEFAULT_DB_ALIAS
+
+
+def id_base(alias):
+    """First id handed out by the alias's sharded tables."""
+    return (shard_aliases().index(alias) + 1) << ID_SHIFT
+
+
+def seed_id_ranges(alias):
+    """Start the alias's sharded tables at its id range. Idempotent."""
+    from django.apps import apps
+
+    base = id_base(alias)
+    connection = connections[alias]
+    tables = [
+        model._meta.db_table for model in apps.get_app_config('core').get_models()
+        if is_sharded(model) and model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField')
+    ]
+    with connection.cursor() as cursor:
+        for table in tables:
+            if connection.vendor == 'sqlite':
+                cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, base - 1])
+                elif row[0] < base - 1:
+                    cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [base - 1, table])
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    "GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM " + connection.ops.quote_name(table) + ")))",
+                    [table, base - 1],
+                )
+
+
+def replicate(instance):
+    """Copy a default-database row to every shard."""
+    model = type(instance)
+    fields = {field.attname: getattr(instance, field.attname) for field in model._meta.concrete_fields}
+    for alias in shard_aliases():
+        rows = model._base_manager.using(alias)
+        if not rows.filter(pk=instance.pk).update(**fields):
+            rows.bulk_create([model(**fields)])
+
+
+def unreplicate(instance):
+    """Delete a row's replicas (cascading to the shard's dependent rows)."""
+    model = type(instance)
+    for alias in shard_aliases():
+        model._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+
+def across_shards(build):
+    """Concatenate build(alias) over all databases into one list."""
+    return list(chain.from_iterable(build(alias) for alias in all_databases()))
+
+
+def merge_across_shards(build, key):
+    """Merge per-shard iterables that are each sorted by key."""
+    return heapq.merge(*(build(alias) for alias in all_databases()), key=key)
+
+
+def count_across_shards(build):
+    return sum(build(alias).count() for alias in all_databases())
+
+
+def exists_in_any_shard(build):
+    return any(build(alias).exists() for alias in all_databases())
@@ -0,0 +1,311 @@
+"""Signal handlers for the reservation event log, delta-sync changes, popularity
+counters, waitlist promotion, shard replication, the permission cache and the
+search index."""
+import functools
+
+from django.contrib.auth.models import Group
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .booking_rules import RELEASED_STATUSES
+from .changes import desk_area_id, record_desk_change, reset_changes
+from .events import event_type_for, record_event
+from .models import (
+    Area, Desk, DeskUsage, GroupPermission, Reservation, ReservationSeries, Room, User, UserPermission,
+)
+from .permissions import invalidate_grantee, invalidate_user
+from .popularity import adjust_usage, counts, month_start
+from .search import log_change
+from .sharding import (
+    clear_desk_areas, replicate, seed_id_ranges, shard_aliases, shard_for_area, unreplicate,
+)
+from .waitlist import promote_next
+
+
+def _cascaded_from(origin, *models):
+    """Whether a post_delete is part of deleting an instance of one of models."""
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(origin_model, models)
+
+
+# Replication runs before the handlers below, which may write shard rows
+# referencing the new row.
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Area)
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Desk)
+@receiver(post_save, sender=UserPermission)
+def replicate_reference_row(sender, instance, using=None, **kwargs):
+    """Copy reference rows written to the default database to every shard."""
+    if using == DEFAULT_DB_ALIAS and shard_aliases():
+        replicate(instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Area)
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=Desk)
+@receiver(post_delete, sender=UserPermission)
+def unreplicate_reference_row(sender, instance, origin=None, using=None, **kwargs):
+    # Rows deleted by a cascade go with their parent's replica.
+    if using != DEFAULT_DB_ALIAS or not shard_aliases():
+        return
+    if origin is None or not _cascaded_from(origin, *{User, Area, Room, Desk} - {sender}):
+        unreplicate(instance)
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_previous_state(sender, instance, using=None, **kwargs):
+    """Status, (desk, date) slot and user before this save, for the handlers below."""
+    previous = None
+    if instance.pk is not None:
+        previous = (
+            Reservation.objects.using(using).filter(pk=instance.pk)
+            .values_list('status', 'desk_id', 'date', 'user_id').first()
+        )
+    instance._previous_status, instance._previous_slot, instance._previous_user_id = (
+        (previous[0], previous[1:3], previous[3]) if previous else (None, None, None)
+    )
+
+
+# The event log receivers are connected first so that a release is logged
+# before the reservation that replaces it.
+@receiver(post_save, sender=Reservation)
+def log_reservation_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_status', None)
+    record_event(instance, event_type_for(instance.status, previous, created), previous)
+
+
+@receiver(post_delete, sender=Reservation)
+def log_reservation_deleted(sender, instance, **kwargs):
+    record_event(instance, 'deleted', instance.status)
+
+
+@receiver(post_save, sender=Reservation)
+def record_reservation_change(sender, instance, using=None, **kwargs):
+    slots = {(instance.desk_id, instance.date), getattr(instance, '_previous_slot', None)}
+    for slot in slots - {None}:
+        area_id = desk_area_id(slot[0], using)
+        if area_id is not None:
+            record_desk_change(area_id, *slot)
+
+
+@receiver(post_delete, sender=Reservation)
+def record_reservation_removed(sender, instance, origin=None, using=None, **kwargs):
+    # Deleting the desk, room or area is recorded by their own handlers.
+    if _cascaded_from(origin, Area, Room, Desk):
+        return
+    area_id = desk_area_id(instance.desk_id, using)
+    if area_id is not None:
+        record_desk_change(area_id, instance.desk_id, instance.date)
+
+
+@receiver(post_save, sender=Reservation)
+def update_usage_on_save(sender, instance, **kwargs):
+    previous_slot = getattr(instance, '_previous_slot', None)
+    was_counted = previous_slot is not None and counts(instance._previous_status)
+    is_counted = counts(instance.status)
+    if was_counted and is_counted and previous_slot[0] == instance.desk_id \
+            and month_start(previous_slot[1]) == month_start(instance.date):
+        return
+    if was_counted:
+        adjust_usage(*previous_slot, -1)
+    if is_counted:
+        adjust_usage(instance.desk_id, instance.date, 1)
+
+
+@receiver(post_delete, sender=Reservation)
+def update_usage_on_delete(sender, instance, origin=None, **kwargs):
+    if counts(instance.status) and not _cascaded_from(origin, Area, Room, Desk):
+        adjust_usage(instance.desk_id, instance.date, -1)
+
+
+# A series' pending occurrences may cover any future date of its desk.
+@receiver(pre_save, sender=ReservationSeries)
+def remember_previous_series_desk(sender, instance, using=None, **kwargs):
+    instance._previous_desk_id = instance._previous_area_id = None
+    if instance.pk is not None:
+        instance._previous_desk_id = (
+            ReservationSeries.objects.using(using).filter(pk=instance.pk).values_list('desk_id', flat=True).first()
+        )
+        if instance._previous_desk_id is not None:
+            instance._previous_area_id = desk_area_id(instance._previous_desk_id, using)
+
+
+@receiver(post_save, sender=ReservationSeries)
+@receiver(post_delete, sender=ReservationSeries)
+def record_series_change(sender, instance, origin=None, using=None, **kwargs):
+    if origin is not None and _cascaded_from(origin, Area, Room, Desk):
+        return
+    for desk_id in {instance.desk_id, getattr(instance, '_previous_desk_id', None)} - {None}:
+        area_id = desk_area_id(desk_id, using)
+        if area_id is not None:
+            record_desk_change(area_id, desk_id)
+
+
+# Desk and room handlers act on the default database only; shard replicas
+# are written by the replication receivers below and raise no changes.
+@receiver(pre_save, sender=Desk)
+@receiver(pre_save, sender=Room)
+def remember_previous_area(sender, instance, using=None, **kwargs):
+    instance._previous_area_id = None
+    if instance.pk is not None and using == DEFAULT_DB_ALIAS:
+        lookup = 'room__area_id' if sender is Desk else 'area_id'
+        instance._previous_area_id = sender.objects.filter(pk=instance.pk).values_list(lookup, flat=True).first()
+
+
+@receiver(post_save, sender=Desk)
+def record_desk_saved(sender, instance, using=None, **kwargs):
+    if using != DEFAULT_DB_ALIAS:
+        return
+    area_id = desk_area_id(instance.pk)
+    previous = getattr(instance, '_previous_area_id', None)
+    if previous is not None and previous != area_id:
+        transaction.on_commit(clear_desk_areas, using=using)
+        reset_changes(previous)
+        # The counters are where the desk's bookings were; Desk.save() refuses
+        # moves to another shard, so that is the new area's shard as well.
+        DeskUsage.objects.using(shard_for_area(previous)).filter(desk=instance).update(area_id=area_id)
+    record_desk_change(area_id, instance.pk)
+
+
+@receiver(post_delete, sender=Desk)
+def record_desk_deleted(sender, instance, origin=None, using=None, **kwargs):
+    if using != DEFAULT_DB_ALIAS or _cascaded_from(origin, Area, Room):
+        return
+    area_id = Room.objects.filter(pk=instance.room_id).values_list('area_id', flat=True).first()
+    if area_id is not None:
+        reset_changes(area_id)
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def record_room_changed(sender, instance, origin=None, using=None, **kwargs):
+    # Room edits reshape the snapshot; clients reload it in full.
+    if using != DEFAULT_DB_ALIAS or (origin is not None and _cascaded_from(origin, Area)):
+        return
+    previous = getattr(instance, '_previous_area_id', None)
+    if previous is not None and previous != instance.area_id:
+        transaction.on_commit(clear_desk_areas, using=using)
+        reset_changes(previous)
+        # As for desks above; Room.save() refuses moves to another shard.
+        DeskUsage.objects.using(shard_for_area(previous)).filter(desk__room=instance) \
+            .update(area_id=instance.area_id)
+    reset_changes(instance.area_id)
+
+
+@receiver(post_save, sender=Reservation)
+def promote_on_release(sender, instance, created, **kwargs):
+    """Runs inside the transaction opened by Reservation.save()."""
+    previous = getattr(instance, '_previous_status', None)
+    if instance.status in RELEASED_STATUSES and not created and previous not in RELEASED_STATUSES:
+        promote_next(instance.desk_id, instance.date)
+
+
+@receiver(post_delete, sender=Reservation)
+def promote_on_delete(sender, instance, origin=None, **kwargs):
+    # Deleting a released row frees nothing new, and neither does deleting
+    # the desk itself.
+    if instance.status not in RELEASED_STATUSES and not _cascaded_from(origin, Area, Room, Desk):
+        promote_next(instance.desk_id, instance.date)
+
+
+# Permission cache (see permissions.py). Entries are dropped after commit,
+# so that a read in between can't cache the old answer past it.
+
+def _login_only(sender, update_fields):
+    return sender is User and update_fields is not None and set(update_fields) <= {'last_login'}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=UserPermission)
+@receiver(post_delete, sender=UserPermission)
+def invalidate_user_permissions(sender, instance, using=None, update_fields=None, **kwargs):
+    if using != DEFAULT_DB_ALIAS or _login_only(sender, update_fields):
+        return
+    user_id = instance.pk if sender is User else instance.user_id
+    transaction.on_commit(functools.partial(invalidate_user, user_id), using=using)
+
+
+@receiver(pre_save, sender=GroupPermission)
+def remember_previous_grantee(sender, instance, using=None, **kwargs):
+    instance._previous_grantee = None
+    if instance.pk is not None:
+        instance._previous_grantee = (
+            GroupPermission.objects.using(using).filter(pk=instance.pk).values_list('group_id', 'department').first()
+        )
+
+
+@receiver(post_save, sender=GroupPermission)
+@receiver(post_delete, sender=GroupPermission)
+def invalidate_group_permissions(sender, instance, using=None, **kwargs):
+    if using != DEFAULT_DB_ALIAS:
+        return
+    grantees = {(instance.group_id, instance.department), getattr(instance, '_previous_grantee', None)} - {None}
+    for group_id, department in grantees:
+        transaction.on_commit(functools.partial(invalidate_grantee, group_id, department), using=using)
+        # Search results are scoped by the users' areas too.
+        kind, key = ('group', group_id) if group_id is not None else ('department', department)
+        transaction.on_commit(functools.partial(log_change, kind, key), using=using)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_members(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    """Group memberships changed, from either side (user.groups or group.user_set)."""
+    if using != DEFAULT_DB_ALIAS:
+        return
+    if action == 'pre_clear' and reverse:
+        # group.user_set.clear() doesn't say whom it removed.
+        instance._cleared_user_ids = list(instance.user_set.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_user_ids', [])
+    else:
+        user_ids = pk_set or []
+    for user_id in user_ids:
+        transaction.on_commit(functools.partial(invalidate_user, user_id), using=using)
+        transaction.on_commit(functools.partial(log_change, 'user', user_id), using=using)
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group_members(sender, instance, using=None, **kwargs):
+    # The memberships go in a cascade that sends no m2m_changed.
+    if using != DEFAULT_DB_ALIAS:
+        return
+    for user_id in instance.user_set.values_list('id', flat=True):
+        transaction.on_commit(functools.partial(invalidate_user, user_id), using=using)
+        transaction.on_commit(functools.partial(log_change, 'user', user_id), using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Area)
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Desk)
+@receiver(post_save, sender=UserPermission)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Area)
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=Desk)
+@receiver(post_delete, sender=UserPermission)
+def log_search_change(sender, instance, using=None, update_fields=None, **kwargs):
+    if using != DEFAULT_DB_ALIAS or _login_only(sender, update_fields):
+        return  # logins change nothing searchable
+    if sender is UserPermission:
+        kind, pk = 'user', instance.user_id
+    else:
+        kind, pk = sender._meta.model_name, instance.pk
+    # After commit, so that processes replaying the log read the new rows.
+    transaction.on_commit(functools.partial(log_change, kind, pk), using=using)
+
+
+@receiver(post_migrate)
+def seed_shard_id_ranges(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if sender.label == 'core' and using in shard_aliases():
+        seed_id_ranges(using)
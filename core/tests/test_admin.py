@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from datetime import date, timedelta
+from core.admin import CustomUserAdmin, EstimatedCountPaginator
+from core.models import Area, Room, Desk, Reservation, UserPermission, WaitlistEntry
+from core.sharding import all_databases, shard_for_area
+
+User = get_user_model()
+
+
+class AdminChangelistQueryTest(TestCase):
+    """Changelist query counts must not grow with the number of rows"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', employee_id='ADM001', password='x')
+        self.client.force_login(self.admin)
+        self.area_count = 0
+
+    def add_rows(self, count):
+        """Add `count` areas, each with a room, desk, user, permission, booking and waiter"""
+        day = date.today()
+        for _ in range(count):
+            self.area_count += 1
+            n = self.area_count
+            area = Area.objects.create(name=f"Area {n}")
+            room = Room.objects.create(area=area, name=f"Room {n}")
+            desk = Desk.objects.create(room=room, identifier=f"D.{n}")
+            user = User.objects.create_user(username=f'user{n}', employee_id=f'EMP{n:03d}')
+            UserPermission.objects.create(user=user, area=area)
+            Reservation.objects.create(user=user, desk=desk, date=day + timedelta(days=n))
+            WaitlistEntry.objects.create(user=user, area=area, desk=desk, date=day + timedelta(days=n))
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:core_{model}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_counts_are_bounded(self):
+        """Ten times the rows costs the same number of queries"""
+        models = ['area', 'room', 'desk', 'reservation', 'user', 'userpermission', 'waitlistentry']
+        self.add_rows(2)
+        small = {model: self.changelist_queries(model) for model in models}
+        self.add_rows(18)
+        large = {model: self.changelist_queries(model) for model in models}
+        self.assertEqual(small, large)
+        for model, count in large.items():
+            self.assertLessEqual(count, 10, model)
+
+    def test_reservation_changelist_skips_full_count(self):
+        """Filtered reservation lists don't run a second unfiltered COUNT(*)"""
+        self.add_rows(3)
+        url = reverse('admin:core_reservation_changelist')
+        shard = shard_for_area(Area.objects.get(name="Area 3").id)
+        with CaptureQueriesContext(connections[shard]) as queries:
+            response = self.client.get(url, {'when': 'next7', 'shard': shard})
+        self.assertEqual(response.status_code, 200)
+        counts = [q['sql'] for q in queries if 'COUNT(' in q['sql'] and 'core_reservation' in q['sql']]
+        self.assertEqual(len(counts), 1)
+        self.assertContains(response, 'D.3')
+
+    def test_estimated_paginator_falls_back_to_exact_count(self):
+        """Without a planner estimate the exact count is returned"""
+        self.add_rows(3)
+        counts = [EstimatedCountPaginator(Reservation.objects.using(db), 50).count for db in all_databases()]
+        self.assertEqual(sum(counts), 3)
+
+    def test_large_table_count_is_cached_without_estimates(self):
+        """SQLite has no planner estimate: a large table's count is cached, filtered counts stay exact"""
+        self.add_rows(3)
+        with mock.patch('core.admin.ESTIMATED_COUNT_THRESHOLD', 2):
+            self.assertEqual(EstimatedCountPaginator(User.objects.all(), 50).count, 4)
+            User.objects.create_user(username='late', employee_id='EMP999')
+            self.assertEqual(EstimatedCountPaginator(User.objects.all(), 50).count, 4)
+            self.assertEqual(EstimatedCountPaginator(User.objects.filter(is_active=True), 50).count, 5)
+
+    def test_truncated_search_is_reported(self):
+        """A user search hitting search_limit says that more matches exist"""
+        self.add_rows(3)
+        url = reverse('admin:core_user_changelist')
+        self.assertNotContains(self.client.get(url, {'q': 'user'}), 'Only the best')
+        with mock.patch.object(CustomUserAdmin, 'search_limit', 2):
+            response = self.client.get(url, {'q': 'user'})
+        self.assertContains(response, 'Only the best 2 matches')
@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from datetime import date, timedelta
+from core.consistency import check_area, check_quota
+from core.models import Area, Room, Desk, Reservation, UserPermission
+from core.sharding import shard_for_area
+
+User = get_user_model()
+
+
+class CheckBookingsTestCase(TestCase):
+    """Test the booking invariant checker and its fixes"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.monday = date(2026, 11, 2)
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        self.db = shard_for_area(self.area.id)
+        self.other_area = Area.objects.create(name="Level 2 - Right Wing")
+        room = Room.objects.create(area=self.area, name="Open Office A")
+        self.desks = [Desk.objects.create(room=room, identifier=f"1.L.{n}") for n in range(4)]
+        self.disabled = Desk.objects.create(room=room, identifier="1.L.90", status='disabled')
+        self.permanent = Desk.objects.create(room=room, identifier="1.L.91", status='permanent')
+        self.foreign = Desk.objects.create(
+            room=Room.objects.create(area=self.other_area, name="Open Office B"), identifier="2.R.1"
+        )
+        self.user = User.objects.create_user(username='user', employee_id='EMP001')
+        UserPermission.objects.create(user=self.user, area=self.area)
+
+    def book(self, desk, day, status='confirmed', **fields):
+        return Reservation.objects.create(user=self.user, desk=desk, date=day, status=status, **fields)
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('check_bookings', '--workers', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_area_checks(self):
+        """Unavailable desks, missing permissions and check-in times are found"""
+        saturday = self.monday + timedelta(days=5)
+        on_disabled = self.book(self.disabled, saturday)
+        self.book(self.permanent, saturday + timedelta(days=7), status='cancelled')  # released: fine
+        self.book(self.desks[0], saturday + timedelta(days=7), status='checked_in', checked_in_at=timezone.now())
+        missing = self.book(self.desks[0], saturday + timedelta(days=14), status='checked_in')
+        stray = self.book(self.desks[0], saturday + timedelta(days=21), checked_in_at=timezone.now())
+        foreign = self.book(self.foreign, saturday)
+
+        result = check_area(self.area.id).merge(check_area(self.other_area.id))
+        self.assertEqual(result.rows, 6)
+        self.assertEqual(list(result.ids['desk_unavailable']), [on_disabled.id])
+        self.assertEqual(list(result.ids['no_permission']), [foreign.id])
+        self.assertEqual(list(result.ids['checked_in_at_missing']), [missing.id])
+        self.assertEqual(list(result.ids['checked_in_at_stray']), [stray.id])
+
+    def test_quota_check(self):
+        """The latest weekday bookings past the quota are flagged unless pending"""
+        bookings = [self.book(self.desks[n], self.monday + timedelta(days=n)) for n in range(4)]
+        self.book(self.desks[0], self.monday + timedelta(days=5))  # Saturday: not counted
+        self.assertEqual(list(check_quota(self.user.id, self.user.id).ids['over_quota']), [bookings[3].id])
+
+        bookings[3].status = 'pending_approval'
+        bookings[3].save()
+        self.assertEqual(len(check_quota(self.user.id, self.user.id).ids['over_quota']), 0)
+
+    def test_command_reports_and_fixes(self):
+        """--fix cancels, marks pending and clears check-in times; a rerun is clean"""
+        bookings = [self.book(self.desks[n], self.monday + timedelta(days=n)) for n in range(3)]
+        over = self.book(self.desks[3], self.monday + timedelta(days=3), checked_in_at=timezone.now())
+        on_disabled = self.book(self.disabled, self.monday + timedelta(days=7))
+
+        output = self.run_command()
+        self.assertIn(f'#{on_disabled.id} user {self.user.id}', output)
+        self.assertRegex(output, r'over_quota\s+1')
+
+        self.run_command('--fix')
+        over.refresh_from_db()
+        on_disabled.refresh_from_db()
+        self.assertEqual((over.status, over.checked_in_at), ('pending_approval', None))
+        self.assertEqual(on_disabled.status, 'cancelled')
+        confirmed = Reservation.objects.using(self.db).filter(id__in=[b.id for b in bookings], status='confirmed')
+        self.assertEqual(confirmed.count(), 3)
+        self.assertIn('No violations found', self.run_command())
+
+    def test_fix_leaves_history_and_approvals(self):
+        """--fix only sends future confirmed bookings back for approval"""
+        past_monday = timezone.localdate() - timedelta(days=timezone.localdate().weekday() + 14)
+        for n in range(3):
+            self.book(self.desks[n], past_monday + timedelta(days=n), 'checked_in', checked_in_at=timezone.now())
+        past = self.book(self.desks[3], past_monday + timedelta(days=3), 'checked_in', checked_in_at=timezone.now())
+        for n in range(3):
+            self.book(self.desks[n], self.monday + timedelta(days=n))
+        approved = self.book(self.desks[3], self.monday + timedelta(days=3), 'pending_approval')
+        approved.status = 'confirmed'
+        approved.save()
+        self.assertRegex(self.run_command(), r'over_quota\s+2')
+
+        output = self.run_command('--fix')
+        self.assertIn('2 over_quota are past, checked in or approved', output)
+        past.refresh_from_db()
+        approved.refresh_from_db()
+        self.assertEqual(past.status, 'checked_in')
+        self.assertEqual(approved.status, 'confirmed')
+
+    def test_since(self):
+        """--since skips older reservations"""
+        self.book(self.disabled, self.monday)
+        self.assertIn('No violations found', self.run_command('--since', '2026-11-03'))
@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from booking_api.cache import get_area_version
+from core.changes import get_change_version
+from core.floor_plans import extract_desk_positions, import_desk_positions, parse_transform
+from core.models import Area, Room, Desk
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+PLAN = b"""<?xml version="1.0"?>
+<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 1000 600">
+  <defs><rect id="1.L.01" x="900" y="900" width="10" height="10"/></defs>
+  <rect id="1.L.01" x="100" y="40" width="40" height="20"/>
+  <g transform="translate(300 100) scale(2)">
+    <g data-desk="1.L.02"><rect width="20" height="10"/><text x="5" y="5">1.L.02</text></g>
+    <circle data-desk="1.L.03" transform="rotate(90)" cx="10" r="5"/>
+  </g>
+  <path data-desk="1.L.04" d="M 500 500 l 20 0 v 20 h -20 z"/>
+  <rect data-desk="9.X.99" width="5" height="5"/>
+</svg>
+"""
+
+
+class FloorPlanParsingTest(TestCase):
+    """Desk positions are the centres of the transformed shapes tagged with desk identifiers"""
+    databases = '__all__'
+
+    def test_transforms_compose_left_to_right(self):
+        """translate then scale maps the origin to the translation"""
+        matrix = parse_transform('translate(10, 20) scale(2)')
+        self.assertEqual(matrix, (2.0, 0.0, 0.0, 2.0, 10.0, 20.0))
+        a, b, c, d, e, f = parse_transform('rotate(90 10 10)')
+        self.assertAlmostEqual(a * 20 + c * 10 + e, 10)
+        self.assertAlmostEqual(b * 20 + d * 10 + f, 20)
+
+    def test_extract_positions(self):
+        """ids and data-desk tags are found, <defs> skipped, unknown tags reported"""
+        identifiers = ['1.L.01', '1.L.02', '1.L.03', '1.L.04', '1.L.05']
+        positions, unknown = extract_desk_positions(BytesIO(PLAN), identifiers)
+        rounded = {identifier: (round(x), round(y)) for identifier, (x, y) in positions.items()}
+        self.assertEqual(rounded, {
+            '1.L.01': (120, 50),
+            '1.L.02': (320, 110),
+            '1.L.03': (300, 120),
+            '1.L.04': (510, 510),
+        })
+        self.assertEqual(unknown, {'9.X.99'})
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class FloorPlanImportTest(TestCase):
+    """Uploading a floor plan moves the area's desks with one bulk update"""
+    databases = '__all__'
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.area = Area.objects.create(name="Level 1 - Left Wing")
+        room = Room.objects.create(area=self.area, name="Open Office A")
+        self.desks = [Desk.objects.create(room=room, identifier=f"1.L.0{n}") for n in range(1, 6)]
+        self.area.map_svg.save('level1.svg', ContentFile(PLAN))
+
+    def test_import_updates_positions_and_invalidates(self):
+        """Positions are written in one UPDATE; clients reload and cached responses expire"""
+        area_version, change_version = get_area_version(self.area.id), get_change_version(self.area.id)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            result = import_desk_positions(self.area)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "core_desk"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual((result.updated, result.located), (4, 4))
+        self.assertEqual(result.missing, ['1.L.05'])
+        self.assertEqual(result.unknown, ['9.X.99'])
+
+        desk = Desk.objects.get(identifier='1.L.02')
+        self.assertEqual((desk.pos_x, desk.pos_y), (320, 110))
+        self.assertNotEqual(get_area_version(self.area.id), area_version)
+        self.assertNotEqual(get_change_version(self.area.id), change_version)
+        self.assertEqual(import_desk_positions(self.area).updated, 0)
+
+    def test_admin_action_reports_unmatched_identifiers(self):
+        """The admin action imports and lists desks missing from the plan and unknown tags"""
+        admin = User.objects.create_superuser(username='admin', employee_id='ADM001', password='x')
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:core_area_changelist'),
+            {'action': 'import_desk_positions', '_selected_action': [self.area.id]},
+            follow=True,
+        )
+        messages = [str(message) for message in response.context['messages']]
+        self.assertTrue(any('4 desks found' in message for message in messages))
+        self.assertTrue(any('1.L.05' in message for message in messages))
+        self.assertTrue(any('9.X.99' in message for message in messages))
+        self.assertEqual(Desk.objects.get(identifier='1.L.04').pos_x, 510)
@@ -3,12 +3,14 @@ from django.contrib.auth import get_user_model
 from django.db import IntegrityError
 from datetime import date, timedelta
 from core.models import Area, Room, Desk, Reservation, UserPermission
+from core.sharding import shard_for_area
 
 User = get_user_model()
 
 
 class AreaModelTest(TestCase):
     """Test Area model functionality"""
+    databases = '__all__'
     
     def test_area_creation_and_str(self):
         """Basic area creation and string representation"""
@@ -22,6 +24,7 @@ class AreaModelTest(TestCase):
 
 class RoomModelTest(TestCase):
     """Test Room model functionality"""
+    databases = '__all__'
     
     def setUp(self):
         self.area = Area.objects.create(name="Level 1 - Test Wing")
@@ -53,6 +56,7 @@ class RoomModelTest(TestCase):
 
 class DeskModelTest(TestCase):
     """Test Desk model functionality"""
+    databases = '__all__'
     
     def setUp(self):
         self.area = Area.objects.create(name="Level 1 - Test Wing")
@@ -95,6 +99,7 @@ class DeskModelTest(TestCase):
 
 class UserModelTest(TestCase):
     """Test custom User model functionality"""
+    databases = '__all__'
     
     def test_user_custom_fields(self):
         """Employee ID, department, is_admin work correctly"""
@@ -132,6 +137,7 @@ class UserModelTest(TestCase):
 
 class ReservationModelTest(TestCase):
     """Test Reservation model functionality"""
+    databases = '__all__'
     
     def setUp(self):
         self.user = User.objects.create_user(
@@ -185,13 +191,24 @@ class ReservationModelTest(TestCase):
             employee_id='EMP002'
         )
         
-        # This should raise IntegrityError due to unique_together constraint
+        # This should raise IntegrityError due to the unique_active_desk_date constraint
         with self.assertRaises(IntegrityError):
             Reservation.objects.create(
                 user=user2,
                 desk=self.desk,
                 date=tomorrow
             )
+
+    def test_released_reservations_free_the_desk(self):
+        """Cancelled and no-show bookings stay on record without blocking the desk"""
+        tomorrow = date.today() + timedelta(days=1)
+        user2 = User.objects.create_user(username='testuser2', employee_id='EMP002')
+        Reservation.objects.create(user=self.user, desk=self.desk, date=tomorrow, status='cancelled')
+        Reservation.objects.create(user=user2, desk=self.desk, date=tomorrow, status='no_show')
+        Reservation.objects.create(user=user2, desk=self.desk, date=tomorrow)
+
+        reservations = Reservation.objects.using(shard_for_area(self.area.id))
+        self.assertEqual(reservations.filter(desk=self.desk, date=tomorrow).count(), 3)
     
     def test_reservation_status_choices(self):
         """Reservation status choices work correctly"""
@@ -213,6 +230,7 @@ class ReservationModelTest(TestCase):
 
 class UserPermissionModelTest(TestCase):
     """Test UserPermission model functionality"""
+    databases = '__all__'
     
     def setUp(self):
         self.user = User.objects.create_user(
@@ -0,0 +1,84 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import IntegrityError, transaction
+from core.models import Area, GroupPermission, UserPermission
+from core.permissions import permitted_area_ids, permitted_user_ids
+
+User = get_user_model()
+
+
+class PermissionResolverTestCase(TestCase):
+    """Test effective area permissions from user, group and department grants"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.left = Area.objects.create(name="Level 1 - Left Wing")
+        self.right = Area.objects.create(name="Level 2 - Right Wing")
+        self.lab = Area.objects.create(name="Level 3 - Lab")
+        self.user = User.objects.create_user(username='user', employee_id='EMP001', department='Engineering')
+        self.other = User.objects.create_user(username='other', employee_id='EMP002', department='Sales')
+        self.group = Group.objects.create(name='Lab access')
+        UserPermission.objects.create(user=self.user, area=self.left)
+
+    def test_department_grant(self):
+        """A department grant reaches everyone in the department"""
+        with self.captureOnCommitCallbacks(execute=True):
+            GroupPermission.objects.create(area=self.right, department='Engineering')
+        self.assertEqual(permitted_area_ids(self.user.id), {self.left.id, self.right.id})
+        self.assertEqual(permitted_area_ids(self.other.id), set())
+
+        # Moving department moves the access with it.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.department = 'Engineering'
+            self.other.save()
+        self.assertEqual(permitted_area_ids(self.other.id), {self.right.id})
+
+    def test_group_membership_changes(self):
+        """Adding or removing a member, from either side, takes effect"""
+        GroupPermission.objects.create(area=self.lab, group=self.group)
+        self.assertNotIn(self.lab.id, permitted_area_ids(self.user.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.group)
+        self.assertIn(self.lab.id, permitted_area_ids(self.user.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.user_set.clear()
+        self.assertNotIn(self.lab.id, permitted_area_ids(self.user.id))
+
+    def test_grant_changes_and_cache(self):
+        """Warm lookups skip the database; grant changes invalidate them"""
+        self.user.groups.add(self.group)
+        with self.captureOnCommitCallbacks(execute=True):
+            grant = GroupPermission.objects.create(area=self.lab, group=self.group)
+        permitted_area_ids(self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(permitted_area_ids(self.user.id), {self.left.id, self.lab.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            grant.group = None
+            grant.department = 'Sales'
+            grant.save()
+        self.assertEqual(permitted_area_ids(self.user.id), {self.left.id})
+        self.assertEqual(permitted_area_ids(self.other.id), {self.lab.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            grant.delete()
+        self.assertEqual(permitted_area_ids(self.other.id), set())
+
+    def test_permitted_user_ids(self):
+        """Bulk resolution unions direct, group and department grants"""
+        member = User.objects.create_user(username='member', employee_id='EMP003')
+        member.groups.add(self.group)
+        GroupPermission.objects.create(area=self.left, group=self.group)
+        GroupPermission.objects.create(area=self.left, department='Sales')
+        self.assertEqual(permitted_user_ids(self.left.id), {self.user.id, self.other.id, member.id})
+
+    def test_exactly_one_grantee(self):
+        """A grant names either a group or a department"""
+        for fields in ({}, {'group': self.group, 'department': 'Sales'}):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                GroupPermission.objects.create(area=self.left, **fields)
@@ -0,0 +1,91 @@
+"""
+Waitlist promotion.
+
+Waiters queue for a specific desk or for any desk in an area on a date.
+When a reservation is cancelled, marked no-show or deleted, the desk's
+queue and its area's queue are read head-first through their
+(desk|area, date, status, created_at) indexes and merged by join time; the
+first waiter allowed to book the desk gets it. Ineligible waiters stay in
+the queue, so a later release can still promote them. The released
+reservation is kept; the promoted one is a new row.
+
+Waiters learn of a promotion by polling their entries (the API's
+?status=promoted); waitlist_promoted is sent once a promotion commits, for
+receivers that notify them instead.
+
+Queues live in the desk's shard, next to its reservations.
+"""
+import functools
+import heapq
+
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .booking_rules import ACTIVE_STATUSES, exceeds_quota, has_area_permission, has_booking_on
+from .models import Desk, Reservation, WaitlistEntry
+from .series import pending_claims
+from .sharding import shard_for_desk
+
+PROMOTION_NOTE = 'Promoted from waitlist'
+
+# Sent after the commit of a promotion, with the promoted entry and the database.
+waitlist_promoted = Signal()
+
+
+def _queue(area_id, desk_id, day, using=None):
+    """Waiting entries for the desk or its whole area, oldest first."""
+    waiting = WaitlistEntry.objects.using(using).select_for_update().filter(date=day, status='waiting')
+    order = ('created_at', 'id')
+    desk_queue = waiting.filter(desk_id=desk_id).order_by(*order)
+    area_queue = waiting.filter(area_id=area_id, desk__isnull=True).order_by(*order)
+    return heapq.merge(
+        desk_queue.iterator(chunk_size=20),
+        area_queue.iterator(chunk_size=20),
+        key=lambda entry: (entry.created_at, entry.id),
+    )
+
+
+def is_eligible(entry, area_id):
+    return (
+        has_area_permission(entry.user_id, area_id)
+        and not has_booking_on(entry.user_id, entry.date)
+        and not exceeds_quota(entry.user_id, entry.date)
+    )
+
+
+def promote_next(desk_id, day):
+    """
+    Hand a released desk/date to the first eligible waiter.
+
+    Returns the promoted entry, or None when nobody could take the desk.
+    """
+    db = shard_for_desk(desk_id)
+    reservations = Reservation.objects.using(db)
+    with transaction.atomic(using=db):
+        desk = Desk.objects.using(db).select_related('room').filter(pk=desk_id, status='available').first()
+        if desk is None:
+            return None
+        if reservations.filter(desk=desk, date=day, status__in=ACTIVE_STATUSES).exists():
+            return None
+        if pending_claims(day, day, using=db, desk_id=desk_id):
+            return None  # held by a recurring booking
+        area_id = desk.room.area_id
+        for entry in _queue(area_id, desk.id, day, using=db):
+            if not is_eligible(entry, area_id):
+                continue
+            entry.reservation = reservations.create(
+                user_id=entry.user_id,
+                desk=desk,
+                date=day,
+                status='confirmed',
+                notes=PROMOTION_NOTE,
+            )
+            entry.status = 'promoted'
+            entry.promoted_at = timezone.now()
+            entry.save(update_fields=['reservation', 'status', 'promoted_at'])
+            transaction.on_commit(
+                functools.partial(waitlist_promoted.send, sender=WaitlistEntry, entry=entry, using=db), using=db
+            )
+            return entry
+    return None
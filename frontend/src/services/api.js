@@ -55,6 +55,70 @@ export const apiService = {
     return response.data
   },
 
+  // Area, rooms, desks and reservation states for one date in a single request.
+  // Pass the previous snapshot's version to get null back when nothing changed.
+  async fetchAreaSnapshot(areaId, date, version = null) {
+    const dateStr = date instanceof Date ?
+      date.toISOString().split('T')[0] :
+      date
+
+    const response = await api.get(`/areas/${areaId}/snapshot/`, {
+      params: { date: dateStr },
+      headers: version ? { 'If-None-Match': `"${version}"` } : {},
+      validateStatus: status => (status >= 200 && status < 300) || status === 304
+    })
+    return response.status === 304 ? null : response.data
+  },
+
+  // Desk states changed since `since` (a previous response's version).
+  // Returns { full: false, desks } with just the changed desks, or a full
+  // snapshot with full: true when since is missing or too old.
+  async fetchAreaChanges(areaId, date, since = null) {
+    const dateStr = date instanceof Date ?
+      date.toISOString().split('T')[0] :
+      date
+
+    const params = { date: dateStr }
+    if (since !== null) params.since = since
+    const response = await api.get(`/areas/${areaId}/changes/`, { params })
+    return response.data
+  },
+
+  // Bookable rooms of an area with their booked and free time slots for a date
+  async fetchAreaRoomSlots(areaId, date) {
+    const dateStr = date instanceof Date ?
+      date.toISOString().split('T')[0] :
+      date
+
+    const response = await api.get(`/areas/${areaId}/room-slots/`, { params: { date: dateStr } })
+    return response.data
+  },
+
+  // Meeting-room booking: { room, date, start_time: 'HH:MM', end_time: 'HH:MM', notes }
+  async createRoomReservation(bookingData) {
+    const response = await api.post('/room-reservations/', bookingData)
+    return response.data
+  },
+
+  async deleteRoomReservation(bookingId) {
+    const response = await api.delete(`/room-reservations/${bookingId}/`)
+    return response.data
+  },
+
+  // Desks, rooms, areas and colleagues matching a partial name or identifier
+  async search(query, types = null) {
+    const params = { q: query }
+    if (types) params.types = types.join(',')
+    const response = await api.get('/search/', { params })
+    return response.data.results
+  },
+
+  // Calendar subscription URL (iCalendar feed of the user's bookings)
+  async fetchCalendarSubscription() {
+    const response = await api.get('/calendar/')
+    return response.data
+  },
+
   // Rooms API
   async fetchRooms() {
     const response = await api.get('/rooms/')